@@ -0,0 +1,277 @@
+# agendador_api.py - agendamento das chamadas à Binance respeitando o peso por minuto
+
+import time
+import heapq
+import logging
+import itertools
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from metricas import REGISTRO, metrica_requisicao_binance
+
+# Peso de cada chamada na Binance (limite REQUEST_WEIGHT por minuto)
+PESOS = {
+    "get_account": 20,
+    "get_symbol_ticker": 2,
+    "get_symbol_ticker_varios": 4,
+    "get_klines": 2,
+    "get_exchange_info": 20,
+    "get_symbol_info": 20,
+    "create_order": 1,
+    "create_oco_order": 1,
+    "cancel_order": 1,
+    "get_order": 4,
+    "get_open_orders": 6,
+    "ping": 1,
+    "get_server_time": 1,
+}
+PESO_DESCONHECIDO = 10
+
+# Prioridades: menor valor é atendido primeiro
+PRIORIDADE_ORDEM = 0
+PRIORIDADE_NORMAL = 1
+PRIORIDADE_DADOS = 2
+NOMES_PRIORIDADES = {PRIORIDADE_ORDEM: "ordem", PRIORIDADE_NORMAL: "normal", PRIORIDADE_DADOS: "dados"}
+
+# Prioridade padrão por endpoint; os ausentes são tratados como PRIORIDADE_NORMAL
+PRIORIDADES = {
+    "create_order": PRIORIDADE_ORDEM,
+    "create_oco_order": PRIORIDADE_ORDEM,
+    "cancel_order": PRIORIDADE_ORDEM,
+    "get_klines": PRIORIDADE_DADOS,
+    "get_exchange_info": PRIORIDADE_DADOS,
+    "get_symbol_info": PRIORIDADE_DADOS,
+}
+
+
+# Métricas por endpoint, expostas pelo servidor de métricas do processo
+_erros_requisicoes = REGISTRO.contador(
+    "binance_requisicao_erros_total", "Chamadas REST à Binance que falharam, por endpoint e código de erro",
+    ("endpoint", "codigo"))
+_espera_requisicoes = REGISTRO.histograma(
+    "binance_requisicao_espera_segundos", "Espera por peso disponível antes de cada chamada", ("prioridade",))
+
+
+def _codigo_erro(erro: Exception) -> str:
+    # Código da Binance (ex.: -1013), senão o status HTTP, senão o tipo da exceção
+    codigo = getattr(erro, "code", None)
+    if codigo is None:
+        codigo = getattr(erro, "status_code", None)
+    return str(codigo) if codigo is not None else type(erro).__name__
+
+
+def peso_chamada(nome: str, parametros: Optional[Dict[str, Any]] = None) -> int:
+    """Peso de uma chamada pelo nome do método do cliente e seus parâmetros."""
+    # Sem `symbol`, o ticker é de vários símbolos (lista em `symbols` ou todos)
+    if nome == "get_symbol_ticker" and not (parametros and parametros.get("symbol")):
+        nome = "get_symbol_ticker_varios"
+    return PESOS.get(nome, PESO_DESCONHECIDO)
+
+
+def peso_dos_cabecalhos(cliente) -> Optional[int]:
+    """Peso usado no minuto informado pela Binance na última resposta do cliente."""
+    resposta = getattr(cliente, "response", None)
+    cabecalhos = getattr(resposta, "headers", None)
+    if not cabecalhos:
+        return None
+    valor = cabecalhos.get("x-mbx-used-weight-1m") or cabecalhos.get("X-MBX-USED-WEIGHT-1M")
+    try:
+        return int(valor) if valor is not None else None
+    except ValueError:
+        return None
+
+
+class AgendadorRequisicoes:
+    """Fila única e com prioridade para as chamadas REST à Binance.
+
+    O peso usado no minuto é estimado localmente (soma dos pesos conhecidos
+    de cada endpoint) e corrigido pelo cabeçalho X-MBX-USED-WEIGHT-1M lido com
+    `ler_peso_usado` após cada resposta. A Binance zera o contador a cada
+    minuto do relógio, e o agendador usa a mesma janela.
+
+    Cada prioridade tem um teto próprio dentro de `limite_peso_minuto * fracao_segura`:
+    - ordens podem usar o teto inteiro;
+    - chamadas normais deixam `reserva_ordens` do teto livre para as ordens;
+    - chamadas de dados (candles, exchangeInfo) ainda são espalhadas pelo
+      minuto: podem usar `rajada` do seu teto de imediato e o restante cresce
+      linearmente até o fim do minuto.
+
+    Após um 429/418 todas as chamadas aguardam o Retry-After informado.
+    """
+
+    def __init__(self, limite_peso_minuto: int = 6000, fracao_segura: float = 0.8,
+                 reserva_ordens: float = 0.1, rajada: float = 0.25,
+                 ler_peso_usado: Optional[Callable[[], Optional[int]]] = None,
+                 relogio: Callable[[], float] = time.time, dormir: Callable[[float], None] = time.sleep,
+                 intervalo_espera: float = 0.25):
+        self.limite_peso_minuto = limite_peso_minuto
+        self.fracao_segura = fracao_segura
+        self.reserva_ordens = reserva_ordens
+        self.rajada = rajada
+        self.ler_peso_usado = ler_peso_usado
+        self.relogio = relogio
+        self.dormir = dormir
+        self.intervalo_espera = intervalo_espera
+        self._trava = threading.Lock()
+        self._condicao = threading.Condition(self._trava)
+        self._fila: list = []  # heap de (prioridade, sequência)
+        self._sequencia = itertools.count()
+        self._minuto = None
+        self._peso_local = 0
+        self._peso_servidor = 0
+        self._bloqueado_ate = 0.0
+        self._chamadas = 0
+        self._espera_total = 0.0
+        self._rejeicoes = 0
+
+    # Contabilidade do minuto atual
+
+    def _virar_minuto(self, agora: float) -> None:
+        minuto = int(agora // 60)
+        if minuto != self._minuto:
+            self._minuto = minuto
+            self._peso_local = 0
+            self._peso_servidor = 0
+
+    def _peso_usado(self) -> int:
+        return max(self._peso_local, self._peso_servidor)
+
+    def _teto(self, prioridade: int, segundos_no_minuto: float) -> float:
+        teto = self.limite_peso_minuto * self.fracao_segura
+        if prioridade == PRIORIDADE_ORDEM:
+            return teto
+        teto *= 1 - self.reserva_ordens
+        if prioridade == PRIORIDADE_DADOS:
+            teto *= self.rajada + (1 - self.rajada) * min(1.0, segundos_no_minuto / 60)
+        return teto
+
+    def _espera_necessaria(self, prioridade: int, peso: int, agora: float) -> float:
+        """Segundos até a chamada caber no teto da sua prioridade (0 = pode seguir)."""
+        if agora < self._bloqueado_ate:
+            return self._bloqueado_ate - agora
+        segundos = agora % 60
+        usado = self._peso_usado() + peso
+        if usado <= self._teto(prioridade, segundos):
+            return 0.0
+        if prioridade == PRIORIDADE_DADOS:
+            # Instante do minuto em que a rampa alcança o peso necessário
+            teto_normal = self._teto(PRIORIDADE_NORMAL, segundos)
+            fracao = usado / teto_normal if teto_normal > 0 else float("inf")
+            if fracao <= 1:
+                return max(0.0, (fracao - self.rajada) / (1 - self.rajada) * 60 - segundos)
+        return 60 - segundos
+
+    # Execução
+
+    def executar(self, funcao: Callable, *args, prioridade: Optional[int] = None,
+                 peso: Optional[int] = None, **kwargs):
+        """Executa `funcao(*args, **kwargs)` quando houver peso disponível e for a vez dela."""
+        nome = getattr(funcao, "__name__", str(funcao))
+        if peso is None:
+            peso = peso_chamada(nome, kwargs)
+        if prioridade is None:
+            prioridade = PRIORIDADES.get(nome, PRIORIDADE_NORMAL)
+
+        inicio = time.perf_counter()
+        avisado = False
+        with self._condicao:
+            ticket = (prioridade, next(self._sequencia))
+            heapq.heappush(self._fila, ticket)
+        try:
+            while True:
+                with self._condicao:
+                    # Só o primeiro da fila disputa o peso; os demais esperam a vez
+                    while self._fila[0] != ticket:
+                        self._condicao.wait(self.intervalo_espera)
+                    agora = self.relogio()
+                    self._virar_minuto(agora)
+                    espera = self._espera_necessaria(prioridade, peso, agora)
+                    if espera <= 0:
+                        heapq.heappop(self._fila)
+                        self._peso_local += peso
+                        self._chamadas += 1
+                        self._condicao.notify_all()
+                        break
+                    usado = self._peso_usado()
+                if not avisado and espera >= 1:
+                    logging.info(f"Aguardando peso da API para {nome} ({NOMES_PRIORIDADES.get(prioridade, prioridade)}): "
+                                 f"{usado}/{self.limite_peso_minuto} usados, espera de {espera:.1f}s")
+                    avisado = True
+                # Fora da trava: uma ordem que chegue agora passa à frente
+                self.dormir(min(espera, self.intervalo_espera))
+        except BaseException:
+            with self._condicao:
+                if ticket in self._fila:
+                    self._fila.remove(ticket)
+                    heapq.heapify(self._fila)
+                    self._condicao.notify_all()
+            raise
+        espera = time.perf_counter() - inicio
+        with self._trava:
+            self._espera_total += espera
+        _espera_requisicoes.observar(espera, prioridade=NOMES_PRIORIDADES.get(prioridade, str(prioridade)))
+
+        inicio = time.perf_counter()
+        try:
+            return funcao(*args, **kwargs)
+        except Exception as e:
+            _erros_requisicoes.inc(endpoint=nome, codigo=_codigo_erro(e))
+            self._registrar_erro(e)
+            raise
+        finally:
+            metrica_requisicao_binance.observar(time.perf_counter() - inicio, endpoint=nome)
+            self._registrar_resposta()
+
+    def _registrar_resposta(self) -> None:
+        if self.ler_peso_usado is None:
+            return
+        try:
+            peso_servidor = self.ler_peso_usado()
+        except Exception:
+            return
+        if peso_servidor is None:
+            return
+        with self._trava:
+            self._virar_minuto(self.relogio())
+            # O servidor conta todo o tráfego do IP, inclusive o de outros processos
+            self._peso_servidor = max(self._peso_servidor, int(peso_servidor))
+
+    def _registrar_erro(self, erro: Exception) -> None:
+        status = getattr(erro, "status_code", None)
+        if status not in (429, 418):
+            return
+        agora = self.relogio()
+        resposta = getattr(erro, "response", None)
+        cabecalhos = getattr(resposta, "headers", None) or {}
+        try:
+            espera = float(cabecalhos.get("Retry-After"))
+        except (TypeError, ValueError):
+            # Sem Retry-After: 429 libera na virada do minuto; 418 (banimento) espera mais
+            espera = 60 - agora % 60 if status == 429 else 120
+        with self._trava:
+            self._rejeicoes += 1
+            self._bloqueado_ate = max(self._bloqueado_ate, agora + espera)
+        logging.warning(f"Binance respondeu {status}: chamadas suspensas por {espera:.0f}s")
+
+    # Monitoramento
+
+    def estatisticas(self) -> dict:
+        """Uso do peso no minuto atual e tamanho da fila, para monitoramento."""
+        with self._trava:
+            agora = self.relogio()
+            self._virar_minuto(agora)
+            usado = self._peso_usado()
+            fila = {nome: 0 for nome in NOMES_PRIORIDADES.values()}
+            for prioridade, _ in self._fila:
+                fila[NOMES_PRIORIDADES.get(prioridade, str(prioridade))] += 1
+            return {
+                "peso_usado": usado,
+                "peso_limite": self.limite_peso_minuto,
+                "uso_percentual": usado / self.limite_peso_minuto * 100 if self.limite_peso_minuto else 0.0,
+                "fila": len(self._fila),
+                "fila_por_prioridade": fila,
+                "chamadas": self._chamadas,
+                "espera_total_s": self._espera_total,
+                "rejeicoes": self._rejeicoes,
+                "bloqueado_por_s": max(0.0, self._bloqueado_ate - agora),
+            }
@@ -0,0 +1,117 @@
+# agendador_ciclos.py - acorda o ciclo do bot logo após o fechamento de cada candle
+
+import time
+import logging
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List
+
+from armazenamento_candles import intervalo_em_ms
+
+# A semana da Binance começa na segunda-feira 00:00 UTC; a época Unix caiu numa quinta
+_DESLOCAMENTO_SEMANA_MS = 4 * 24 * 60 * 60 * 1000
+
+POLITICAS_ATRASO = ("coalescer", "pular")
+
+
+def inicio_candle(intervalo: str, tempo_ms: int) -> int:
+    """open_time do candle de `intervalo` que contém o instante `tempo_ms` (UTC)."""
+    if intervalo.endswith("M"):
+        meses = int(intervalo[:-1])
+        data = datetime.fromtimestamp(tempo_ms / 1000, tz=timezone.utc)
+        indice = (data.year * 12 + data.month - 1) // meses * meses
+        inicio = datetime(indice // 12, indice % 12 + 1, 1, tzinfo=timezone.utc)
+        return int(inicio.timestamp() * 1000)
+    duracao = intervalo_em_ms(intervalo)
+    deslocamento = _DESLOCAMENTO_SEMANA_MS if intervalo.endswith("w") else 0
+    return (tempo_ms - deslocamento) // duracao * duracao + deslocamento
+
+
+def proximo_fechamento(intervalo: str, tempo_ms: int) -> int:
+    """Instante (ms) em que o candle que contém `tempo_ms` fecha e o próximo abre."""
+    if intervalo.endswith("M"):
+        meses = int(intervalo[:-1])
+        data = datetime.fromtimestamp(inicio_candle(intervalo, tempo_ms) / 1000, tz=timezone.utc)
+        indice = data.year * 12 + data.month - 1 + meses
+        return int(datetime(indice // 12, indice % 12 + 1, 1, tzinfo=timezone.utc).timestamp() * 1000)
+    return inicio_candle(intervalo, tempo_ms) + intervalo_em_ms(intervalo)
+
+
+def _formatar(tempo_ms: int) -> str:
+    return datetime.fromtimestamp(tempo_ms / 1000).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class AgendadorCiclos:
+    """Agenda os ciclos nas viradas de candle de um ou mais intervalos.
+
+    `aguardar` dorme até o próximo fechamento entre todos os `intervalos`,
+    mais `atraso` segundos para a Binance consolidar o candle, e retorna os
+    intervalos que fecharam. Se o ciclo anterior passou do fechamento seguinte,
+    a política `ao_atrasar` decide: "coalescer" roda um único ciclo imediato
+    por todos os fechamentos perdidos; "pular" descarta os perdidos e espera
+    o próximo fechamento futuro.
+
+    `relogio` (ms) e `dormir` (s) permitem usar o relógio da exchange simulada.
+    """
+
+    def __init__(self, intervalos: Iterable[str], atraso: float = 2.0, ao_atrasar: str = "coalescer",
+                 relogio: Callable[[], int] = lambda: int(time.time() * 1000),
+                 dormir: Callable[[float], None] = time.sleep):
+        if ao_atrasar not in POLITICAS_ATRASO:
+            raise ValueError(f"Política de atraso desconhecida: {ao_atrasar}")
+        self.intervalos = list(dict.fromkeys(intervalos))
+        if not self.intervalos:
+            raise ValueError("Nenhum intervalo informado para o agendador de ciclos")
+        self.atraso_ms = int(atraso * 1000)
+        self.ao_atrasar = ao_atrasar
+        self.relogio = relogio
+        self.dormir = dormir
+        agora = self.relogio()
+        self._proximos: Dict[str, int] = {i: proximo_fechamento(i, agora) for i in self.intervalos}
+        self.ticks_perdidos = 0
+
+    def proximo(self) -> int:
+        """Instante (ms) em que o próximo ciclo será disparado."""
+        return min(self._proximos.values()) + self.atraso_ms
+
+    def aguardar(self) -> List[str]:
+        """Dorme até o próximo fechamento de candle e retorna os intervalos que fecharam."""
+        agora = self.relogio()
+        if agora >= self.proximo() and self.ao_atrasar == "pular":
+            # O ciclo anterior passou do fechamento: descarta e espera o próximo futuro
+            self._registrar_perdidos(agora, incluir_atual=True)
+            self._proximos = {i: proximo_fechamento(i, agora - self.atraso_ms) for i in self.intervalos}
+
+        alvo = self.proximo()
+        if self.relogio() < alvo:
+            logging.info(f"Próximo ciclo às {_formatar(alvo)} (fechamento do candle + {self.atraso_ms / 1000:g}s)")
+        while True:
+            restante = alvo - self.relogio()
+            if restante <= 0:
+                break
+            # Em fatias, para não acordar cedo demais se o relógio do sistema for ajustado
+            self.dormir(min(restante / 1000, 60.0))
+
+        referencia = self.relogio() - self.atraso_ms
+        self._registrar_perdidos(referencia + self.atraso_ms, incluir_atual=False)
+        fechados = [i for i, proximo in self._proximos.items() if referencia >= proximo]
+        for intervalo in fechados:
+            self._proximos[intervalo] = proximo_fechamento(intervalo, referencia)
+        return fechados
+
+    def _registrar_perdidos(self, agora: int, incluir_atual: bool) -> None:
+        referencia = agora - self.atraso_ms
+        for intervalo, proximo in self._proximos.items():
+            if referencia < proximo:
+                continue
+            # Fechamentos entre o esperado e o mais recente que não terão ciclo próprio
+            perdidos = 0
+            fechamento = proximo_fechamento(intervalo, proximo)
+            while fechamento <= referencia:
+                perdidos += 1
+                fechamento = proximo_fechamento(intervalo, fechamento)
+            if incluir_atual:
+                perdidos += 1
+            if perdidos:
+                self.ticks_perdidos += perdidos
+                acao = "descartado(s)" if incluir_atual else "agrupado(s) em um único ciclo"
+                logging.warning(f"{perdidos} fechamento(s) de {intervalo} perdido(s) pelo ciclo anterior, {acao}")
@@ -0,0 +1,306 @@
+# armazenamento_candles.py - armazenamento local e incremental de candles
+
+import os
+import logging
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# Registro binário de um candle da Binance (mesma ordem das colunas de get_klines)
+DTYPE_CANDLE = np.dtype([
+    ("open_time", "<i8"),
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("volume", "<f8"),
+    ("close_time", "<i8"),
+    ("quote_asset_volume", "<f8"),
+    ("trades", "<i8"),
+    ("taker_buy_base", "<f8"),
+    ("taker_buy_quote", "<f8"),
+])
+
+# Campos de tempo (ms desde a época) expostos como datetime64 nos DataFrames
+_CAMPOS_TEMPO = ("open_time", "close_time")
+
+# Campos mantidos em memória pelo CacheCandles: os usados por indicadores e gráficos
+CAMPOS_CACHE = ("open_time", "close_time", "open", "high", "low", "close", "volume")
+
+# Duração de cada intervalo de candle da Binance em milissegundos
+_UNIDADES_MS = {
+    "m": 60 * 1000,
+    "h": 60 * 60 * 1000,
+    "d": 24 * 60 * 60 * 1000,
+    "w": 7 * 24 * 60 * 60 * 1000,
+}
+
+
+def intervalo_em_ms(intervalo: str) -> int:
+    """Converte um intervalo da Binance (ex.: '1h', '15m', '1d') em milissegundos."""
+    if intervalo.endswith("M"):
+        # Mês não tem duração fixa; usa 30 dias como aproximação
+        return int(intervalo[:-1]) * 30 * _UNIDADES_MS["d"]
+    return int(intervalo[:-1]) * _UNIDADES_MS[intervalo[-1]]
+
+
+def converter_klines(candles: list) -> np.ndarray:
+    """Converte a resposta de get_klines (lista de listas) em um array estruturado.
+
+    A resposta é transposta uma única vez e cada coluna é convertida de uma
+    vez pelo NumPy (os preços chegam como texto), sem tuplas por candle nem
+    colunas de objetos intermediárias. A coluna final "ignore" é descartada.
+    """
+    registros = np.empty(len(candles), dtype=DTYPE_CANDLE)
+    if not candles:
+        return registros
+    for nome, coluna in zip(DTYPE_CANDLE.names, zip(*candles)):
+        registros[nome] = np.array(coluna, dtype=DTYPE_CANDLE[nome])
+    return registros
+
+
+def dataframe_candles(registros: np.ndarray, colunas: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """DataFrame com as `colunas` (todas por padrão) de um array de DTYPE_CANDLE.
+
+    Também aceita um dicionário de colunas (como as janelas do CacheCandles),
+    desde que `colunas` seja informado.
+
+    open_time e close_time viram datetime64[ms] reinterpretando os inteiros,
+    sem passar por pd.to_datetime.
+    """
+    dados = {}
+    for nome in (colunas or DTYPE_CANDLE.names):
+        coluna = registros[nome]
+        dados[nome] = coluna.view("datetime64[ms]") if nome in _CAMPOS_TEMPO else coluna
+    return pd.DataFrame(dados)
+
+
+class _BufferCandles:
+    """Colunas contíguas de um símbolo/intervalo; os candles válidos ficam em [inicio, fim).
+
+    As colunas têm `folga` linhas além da capacidade: os candles novos são
+    escritos em sequência e, quando a folga acaba, a janela atual é movida de
+    volta para o início (uma cópia a cada `folga` candles). Assim os últimos N
+    candles são sempre uma fatia contígua, sem o salto de um buffer circular.
+    """
+
+    def __init__(self, capacidade: int, folga: int, dtype_valores: np.dtype):
+        self.capacidade = capacidade
+        self.colunas = {
+            nome: np.empty(capacidade + folga, dtype=np.int64 if nome in _CAMPOS_TEMPO else dtype_valores)
+            for nome in CAMPOS_CACHE
+        }
+        self.inicio = 0
+        self.fim = 0
+
+    def __len__(self) -> int:
+        return self.fim - self.inicio
+
+    def anexar(self, registros) -> None:
+        n = len(registros)
+        if n == 0:
+            return
+        if n >= self.capacidade:
+            registros = registros[n - self.capacidade:]
+            n = self.capacidade
+            self.inicio = self.fim = 0
+        elif self.fim + n > len(self.colunas["open_time"]):
+            manter = min(len(self), self.capacidade - n)
+            for coluna in self.colunas.values():
+                coluna[:manter] = coluna[self.fim - manter:self.fim]
+            self.inicio, self.fim = 0, manter
+
+        for nome, coluna in self.colunas.items():
+            coluna[self.fim:self.fim + n] = registros[nome]
+        self.fim += n
+        self.inicio = max(self.inicio, self.fim - self.capacidade)
+
+    def ultimos(self, n: Optional[int]) -> Dict[str, np.ndarray]:
+        inicio = self.inicio if n is None else max(self.inicio, self.fim - n)
+        janela = {}
+        for nome, coluna in self.colunas.items():
+            visao = coluna[inicio:self.fim]
+            visao.flags.writeable = False
+            janela[nome] = visao
+        return janela
+
+
+class CacheCandles:
+    """Últimos `capacidade` candles fechados de cada (símbolo, intervalo) em memória.
+
+    Guarda só os campos de CAMPOS_CACHE, em colunas contíguas de capacidade
+    fixa; com `float32=True` preços e volume ocupam metade do espaço (cerca de
+    7 dígitos significativos, suficiente para indicadores e gráficos). Com
+    1000 símbolos x 1000 candles são ~45 MB em float32 e ~70 MB em float64.
+
+    `ultimos` devolve visões somente leitura, sem cópia, válidas até a
+    próxima escrita do mesmo símbolo/intervalo.
+    """
+
+    def __init__(self, capacidade: int = 1000, float32: bool = False, folga: Optional[int] = None):
+        self.capacidade = capacidade
+        self.folga = folga if folga is not None else max(1, capacidade // 4)
+        self.dtype_valores = np.dtype(np.float32 if float32 else np.float64)
+        self._trava = threading.Lock()
+        self._buffers: Dict[Tuple[str, str], _BufferCandles] = {}
+
+    def tamanho(self, symbol: str, intervalo: str) -> int:
+        buffer = self._buffers.get((symbol, intervalo))
+        return len(buffer) if buffer is not None else 0
+
+    def ultimo_open_time(self, symbol: str, intervalo: str) -> Optional[int]:
+        buffer = self._buffers.get((symbol, intervalo))
+        if buffer is None or not len(buffer):
+            return None
+        return int(buffer.colunas["open_time"][buffer.fim - 1])
+
+    def anexar(self, symbol: str, intervalo: str, registros) -> int:
+        """Anexa candles mais novos que o último em memória. Retorna quantos entraram."""
+        with self._trava:
+            ultimo = self.ultimo_open_time(symbol, intervalo)
+            if ultimo is not None:
+                registros = registros[registros["open_time"] > ultimo]
+            buffer = self._buffers.get((symbol, intervalo))
+            if buffer is None:
+                buffer = _BufferCandles(self.capacidade, self.folga, self.dtype_valores)
+                self._buffers[(symbol, intervalo)] = buffer
+            buffer.anexar(registros)
+            return len(registros)
+
+    def substituir(self, symbol: str, intervalo: str, registros) -> None:
+        """Troca o conteúdo do símbolo/intervalo pelos candles informados."""
+        with self._trava:
+            buffer = _BufferCandles(self.capacidade, self.folga, self.dtype_valores)
+            buffer.anexar(registros)
+            self._buffers[(symbol, intervalo)] = buffer
+
+    def descartar(self, symbol: str, intervalo: str) -> None:
+        with self._trava:
+            self._buffers.pop((symbol, intervalo), None)
+
+    def ultimos(self, symbol: str, intervalo: str, n: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Visões dos últimos `n` candles (todos se `n` for None), uma por campo de CAMPOS_CACHE."""
+        with self._trava:
+            buffer = self._buffers.get((symbol, intervalo))
+            if buffer is None:
+                return {nome: np.empty(0, dtype=np.int64 if nome in _CAMPOS_TEMPO else self.dtype_valores)
+                        for nome in CAMPOS_CACHE}
+            return buffer.ultimos(n)
+
+    def bytes_alocados(self) -> int:
+        with self._trava:
+            return sum(coluna.nbytes for buffer in self._buffers.values() for coluna in buffer.colunas.values())
+
+
+class ArmazemCandles:
+    """Armazém append-only de candles fechados, um arquivo binário por símbolo/intervalo.
+
+    Com um `cache`, as escritas também atualizam o CacheCandles e `janela`
+    lê da memória, indo ao disco só quando o símbolo ainda não foi carregado.
+    """
+
+    def __init__(self, pasta: str, cache: Optional[CacheCandles] = None):
+        self.pasta = pasta
+        self.cache = cache
+        os.makedirs(pasta, exist_ok=True)
+        self._trava = threading.Lock()
+        # Cache do último open_time gravado para evitar reabrir o arquivo
+        self._ultimos: Dict[Tuple[str, str], Optional[int]] = {}
+
+    def _caminho(self, symbol: str, intervalo: str) -> str:
+        return os.path.join(self.pasta, f"{symbol}_{intervalo}.bin")
+
+    def ler(self, symbol: str, intervalo: str, limit: Optional[int] = None) -> np.ndarray:
+        """Retorna os últimos `limit` candles gravados (todos se `limit` for None)."""
+        caminho = self._caminho(symbol, intervalo)
+        if not os.path.exists(caminho):
+            return np.empty(0, dtype=DTYPE_CANDLE)
+
+        # Ignora um registro final incompleto (gravação interrompida)
+        total = os.path.getsize(caminho) // DTYPE_CANDLE.itemsize
+        if total == 0:
+            return np.empty(0, dtype=DTYPE_CANDLE)
+
+        inicio = 0 if limit is None else max(0, total - limit)
+        mapa = np.memmap(caminho, dtype=DTYPE_CANDLE, mode="r", shape=(total,))
+        registros = np.array(mapa[inicio:])
+        del mapa
+        return registros
+
+    def janela(self, symbol: str, intervalo: str, limit: int) -> Dict[str, np.ndarray]:
+        """Últimos `limit` candles gravados, uma coluna por campo de CAMPOS_CACHE.
+
+        Com cache, são visões da memória (carregada do disco na primeira
+        leitura do símbolo); sem cache ou acima da capacidade, lê o arquivo.
+        """
+        if self.cache is None or limit > self.cache.capacidade:
+            registros = self.ler(symbol, intervalo, limit=limit)
+            return {nome: registros[nome] for nome in CAMPOS_CACHE}
+        with self._trava:
+            em_memoria = self.cache.tamanho(symbol, intervalo)
+            if em_memoria < limit and self.tamanho(symbol, intervalo) > em_memoria:
+                self.cache.substituir(symbol, intervalo, self.ler(symbol, intervalo, limit=self.cache.capacidade))
+        return self.cache.ultimos(symbol, intervalo, limit)
+
+    def tamanho(self, symbol: str, intervalo: str) -> int:
+        """Quantidade de candles gravados para o símbolo/intervalo."""
+        caminho = self._caminho(symbol, intervalo)
+        if not os.path.exists(caminho):
+            return 0
+        return os.path.getsize(caminho) // DTYPE_CANDLE.itemsize
+
+    def ultimo_open_time(self, symbol: str, intervalo: str) -> Optional[int]:
+        """open_time (ms) do último candle gravado ou None se não houver dados."""
+        chave = (symbol, intervalo)
+        if chave not in self._ultimos:
+            ultimo = self.ler(symbol, intervalo, limit=1)
+            self._ultimos[chave] = int(ultimo["open_time"][-1]) if len(ultimo) else None
+        return self._ultimos[chave]
+
+    def anexar(self, symbol: str, intervalo: str, registros: np.ndarray) -> int:
+        """Anexa candles mais novos que o último gravado. Retorna quantos foram gravados."""
+        with self._trava:
+            ultimo = self.ultimo_open_time(symbol, intervalo)
+            if ultimo is not None:
+                registros = registros[registros["open_time"] > ultimo]
+            if len(registros) == 0:
+                return 0
+
+            caminho = self._caminho(symbol, intervalo)
+            with open(caminho, "ab") as f:
+                # Descarta bytes de um registro incompleto antes de anexar
+                excesso = f.tell() % DTYPE_CANDLE.itemsize
+                if excesso:
+                    f.truncate(f.tell() - excesso)
+                    f.seek(0, os.SEEK_END)
+                f.write(np.ascontiguousarray(registros, dtype=DTYPE_CANDLE).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+            self._ultimos[(symbol, intervalo)] = int(registros["open_time"][-1])
+            if self.cache is not None:
+                # Só continua a janela em memória se ela terminava no mesmo candle do arquivo
+                if self.cache.ultimo_open_time(symbol, intervalo) == ultimo:
+                    self.cache.anexar(symbol, intervalo, registros)
+                else:
+                    self.cache.descartar(symbol, intervalo)
+            return len(registros)
+
+    def substituir(self, symbol: str, intervalo: str, registros: np.ndarray) -> None:
+        """Recria o arquivo com os candles informados (usado quando há lacuna no histórico)."""
+        with self._trava:
+            caminho = self._caminho(symbol, intervalo)
+            temporario = caminho + ".tmp"
+            with open(temporario, "wb") as f:
+                f.write(np.ascontiguousarray(registros, dtype=DTYPE_CANDLE).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporario, caminho)
+
+            self._ultimos[(symbol, intervalo)] = int(registros["open_time"][-1]) if len(registros) else None
+            if self.cache is not None:
+                self.cache.substituir(symbol, intervalo, registros)
+            logging.info(f"Histórico de {symbol} ({intervalo}) recriado com {len(registros)} candles")
@@ -0,0 +1,276 @@
+# backtest.py - backtest vetorizado da estratégia de cruzamento de médias + RSI
+
+import logging
+from dataclasses import dataclass, field
+from functools import reduce
+from typing import Dict, List, Mapping, Optional
+
+import numpy as np
+
+from indicadores import media_movel_matriz, rsi_matriz
+
+
+@dataclass(frozen=True)
+class ParametrosBacktest:
+    """Parâmetros da estratégia, com os mesmos nomes e padrões do CONFIG do bot."""
+    janela_media_curta: int = 7
+    janela_media_longa: int = 40
+    percentual_stop_loss: float = 0.04
+    percentual_take_profit: float = 0.05
+    usar_rsi: bool = True
+    limite_rsi_sobrevenda: float = 30
+    limite_rsi_sobrecompra: float = 70
+    periodo_rsi: int = 14
+    janela_alta_semanal: int = 168  # 7 dias de candles de 1 hora
+    percentual_alta_semanal: float = 0.05
+    taxa: float = 0.001  # Taxa por lado (0,1% na Binance spot)
+    slippage: float = 0.0005  # Deslizamento aplicado contra a operação
+    capital_inicial: float = 1000.0
+
+    @classmethod
+    def de_config(cls, config: Mapping, **extras) -> "ParametrosBacktest":
+        """Lê do CONFIG do bot os parâmetros que existirem nele."""
+        nomes = cls.__dataclass_fields__.keys()
+        valores = {k: v for k, v in config.items() if k in nomes}
+        valores.update(extras)
+        return cls(**valores)
+
+
+@dataclass(frozen=True)
+class OperacaoBacktest:
+    moeda: str
+    indice_entrada: int
+    indice_saida: Optional[int]  # None se a posição ainda estiver aberta no fim dos dados
+    open_time_entrada: int
+    open_time_saida: Optional[int]
+    preco_entrada: float
+    preco_saida: float
+    quantidade: float
+    resultado_usdt: float
+    resultado_percentual: float
+    motivo_entrada: str
+    motivo_saida: str
+
+
+@dataclass
+class ResultadoBacktest:
+    """Curva de patrimônio (soma das carteiras de cada moeda), drawdown e operações."""
+    tempos: np.ndarray
+    patrimonio: np.ndarray
+    drawdown: np.ndarray
+    operacoes: List[OperacaoBacktest]
+    patrimonio_por_moeda: Dict[str, np.ndarray] = field(default_factory=dict)
+
+    def resumo(self) -> dict:
+        fechadas = [op for op in self.operacoes if op.indice_saida is not None]
+        vencedoras = [op for op in fechadas if op.resultado_usdt > 0]
+        inicial = self.patrimonio[0] if len(self.patrimonio) else 0.0
+        final = self.patrimonio[-1] if len(self.patrimonio) else 0.0
+        return {
+            "patrimonio_inicial": float(inicial),
+            "patrimonio_final": float(final),
+            "retorno_percentual": float((final / inicial - 1) * 100) if inicial else 0.0,
+            "drawdown_maximo_percentual": float(self.drawdown.min() * 100) if len(self.drawdown) else 0.0,
+            "operacoes": len(fechadas),
+            "taxa_acerto_percentual": len(vencedoras) / len(fechadas) * 100 if fechadas else 0.0,
+            "posicoes_abertas": len(self.operacoes) - len(fechadas),
+        }
+
+
+def calcular_drawdown(patrimonio: np.ndarray) -> np.ndarray:
+    """Queda relativa em relação ao maior patrimônio anterior (0 a -1)."""
+    if len(patrimonio) == 0:
+        return np.empty(0)
+    pico = np.maximum.accumulate(patrimonio)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(pico > 0, patrimonio / pico - 1, 0.0)
+
+
+def maxima_movel(valores: np.ndarray, janela: int) -> np.ndarray:
+    """Máximo dos últimos `janela` valores (incluindo o atual); usa os disponíveis no início."""
+    n = len(valores)
+    resultado = np.maximum.accumulate(valores) if n else np.empty(0)
+    if n >= janela:
+        janelas = np.lib.stride_tricks.sliding_window_view(valores, janela)
+        resultado[janela - 1:] = janelas.max(axis=1)
+    return resultado
+
+
+def _sinais(fechamento: np.ndarray, p: ParametrosBacktest):
+    # Só os indicadores da estratégia; EMA e MACD não entram nos sinais
+    curta = media_movel_matriz(fechamento, p.janela_media_curta)
+    longa = media_movel_matriz(fechamento, p.janela_media_longa)
+    rsi = rsi_matriz(fechamento, p.periodo_rsi, primeiro_delta_zero=True)
+
+    cruzou_para_cima = np.zeros(len(fechamento), dtype=bool)
+    cruzou_para_baixo = np.zeros(len(fechamento), dtype=bool)
+    with np.errstate(invalid="ignore"):
+        # Comparações com NaN são falsas, como no ciclo do bot
+        cruzou_para_cima[1:] = (curta[:-1] <= longa[:-1]) & (curta[1:] > longa[1:])
+        cruzou_para_baixo[1:] = (curta[:-1] >= longa[:-1]) & (curta[1:] < longa[1:])
+        if p.usar_rsi:
+            rsi_sobrevenda = rsi < p.limite_rsi_sobrevenda
+            entrada = cruzou_para_cima & (rsi_sobrevenda | (rsi < 50))
+            saida = cruzou_para_baixo | (rsi > p.limite_rsi_sobrecompra)
+        else:
+            rsi_sobrevenda = np.zeros(len(fechamento), dtype=bool)
+            entrada = cruzou_para_cima
+            saida = cruzou_para_baixo
+    return entrada, saida, cruzou_para_baixo, rsi_sobrevenda
+
+
+def simular_moeda(moeda: str, candles, p: ParametrosBacktest, capital: float):
+    """Simula uma moeda com capital próprio. Retorna (patrimônio por candle, operações).
+
+    Sinais de compra e de venda são avaliados no fechamento de cada candle,
+    como no ciclo horário. Stop-loss, take-profit e alta semanal +5% são
+    avaliados dentro do candle (mínima/máxima), como o monitor em tempo real;
+    se ambos forem atingidos no mesmo candle, assume-se o stop-loss. Os
+    eventos são localizados com buscas vetorizadas limitadas à duração de
+    cada operação, de modo que o laço em Python executa uma iteração por
+    operação e não por candle.
+    """
+    abertura = np.asarray(candles["open"], dtype=np.float64)
+    maxima = np.asarray(candles["high"], dtype=np.float64)
+    minima = np.asarray(candles["low"], dtype=np.float64)
+    fechamento = np.asarray(candles["close"], dtype=np.float64)
+    open_times = np.asarray(candles["open_time"], dtype=np.int64)
+    n = len(fechamento)
+
+    patrimonio = np.empty(n)
+    operacoes: List[OperacaoBacktest] = []
+    if n == 0:
+        return patrimonio, operacoes
+
+    entrada, saida, cruzou_para_baixo, rsi_sobrevenda = _sinais(fechamento, p)
+    indices_entrada = np.flatnonzero(entrada)
+    indices_saida = np.flatnonzero(saida)
+
+    # Alta semanal sincronizada com o monitor no fim do ciclo anterior
+    alta_anterior = np.full(n, np.inf)
+    alta_anterior[1:] = maxima_movel(maxima, p.janela_alta_semanal)[:-1]
+    alvo_alta = alta_anterior * (1 + p.percentual_alta_semanal)
+
+    caixa = capital
+    cursor = 0
+    while True:
+        k = np.searchsorted(indices_entrada, cursor)
+        if k == len(indices_entrada):
+            break
+        e = int(indices_entrada[k])
+        preco_referencia = fechamento[e]
+        preco_compra = preco_referencia * (1 + p.slippage)
+        quantidade = caixa / (preco_compra * (1 + p.taxa))
+        custo = caixa
+        stop = preco_referencia * (1 - p.percentual_stop_loss)
+        take = preco_referencia * (1 + p.percentual_take_profit)
+        motivo_entrada = "Cruzamento de médias para cima" + (" e RSI em sobrevenda" if rsi_sobrevenda[e] else "")
+
+        patrimonio[cursor:e] = caixa
+
+        # A busca por stop/alvo vai só até o próximo sinal de venda
+        proxima_saida = np.searchsorted(indices_saida, e + 1)
+        fim = int(indices_saida[proxima_saida]) + 1 if proxima_saida < len(indices_saida) else n
+        alvo = np.minimum(take, alvo_alta[e + 1:fim])
+        bateu_stop = minima[e + 1:fim] <= stop
+        bateu_alvo = maxima[e + 1:fim] >= alvo
+        eventos = bateu_stop | bateu_alvo | saida[e + 1:fim]
+
+        if not eventos.any():
+            # Posição aberta até o fim dos dados: avaliada a mercado
+            patrimonio[e:] = quantidade * fechamento[e:]
+            valor = quantidade * fechamento[-1]
+            operacoes.append(OperacaoBacktest(
+                moeda, e, None, int(open_times[e]), None, preco_compra, float(fechamento[-1]),
+                quantidade, valor - custo, (valor / custo - 1) * 100, motivo_entrada, "Em aberto"
+            ))
+            cursor = n
+            break
+
+        j = int(np.argmax(eventos))
+        s = e + 1 + j
+        if bateu_stop[j]:
+            preco_saida = min(abertura[s], stop)
+            motivo_saida = "Stop-Loss"
+        elif bateu_alvo[j]:
+            preco_saida = max(abertura[s], alvo[j])
+            motivo_saida = "Take-Profit" if alvo[j] >= take else "Alta Semanal +5%"
+        else:
+            preco_saida = fechamento[s]
+            motivo_saida = "Cruzamento de médias para baixo" if cruzou_para_baixo[s] else "RSI em sobrecompra"
+
+        preco_venda = preco_saida * (1 - p.slippage)
+        patrimonio[e:s] = quantidade * fechamento[e:s]
+        caixa = quantidade * preco_venda * (1 - p.taxa)
+        operacoes.append(OperacaoBacktest(
+            moeda, e, s, int(open_times[e]), int(open_times[s]), preco_compra, preco_venda,
+            quantidade, caixa - custo, (caixa / custo - 1) * 100, motivo_entrada, motivo_saida
+        ))
+        # O ciclo que vendeu ainda pode comprar no fechamento do mesmo candle
+        cursor = s
+
+    patrimonio[cursor:] = caixa
+    return patrimonio, operacoes
+
+
+def executar_backtest(candles_por_moeda: Mapping[str, np.ndarray],
+                      parametros: ParametrosBacktest = ParametrosBacktest()) -> ResultadoBacktest:
+    """Executa o backtest em várias moedas e soma as curvas de patrimônio.
+
+    `candles_por_moeda` mapeia o símbolo para um array estruturado de candles
+    (ex.: `ArmazemCandles.ler`) ou qualquer objeto indexável pelas colunas
+    open_time, open, high, low e close. O capital é dividido igualmente entre
+    as moedas, como faz a estratégia balanceada quando nenhuma está em posição;
+    cada moeda reinveste apenas o próprio capital.
+    """
+    moedas = list(candles_por_moeda)
+    if not moedas:
+        return ResultadoBacktest(np.empty(0, dtype=np.int64), np.empty(0), np.empty(0), [])
+
+    capital_por_moeda = parametros.capital_inicial / len(moedas)
+    operacoes: List[OperacaoBacktest] = []
+    curvas: Dict[str, np.ndarray] = {}
+    tempos_por_moeda: Dict[str, np.ndarray] = {}
+
+    for moeda in moedas:
+        candles = candles_por_moeda[moeda]
+        curva, operacoes_moeda = simular_moeda(moeda, candles, parametros, capital_por_moeda)
+        curvas[moeda] = curva
+        tempos_por_moeda[moeda] = np.asarray(candles["open_time"], dtype=np.int64)
+        operacoes.extend(operacoes_moeda)
+
+    # Alinha as moedas em um eixo de tempo comum; antes do primeiro candle a carteira é só caixa
+    tempos = reduce(np.union1d, tempos_por_moeda.values())
+    patrimonio = np.zeros(len(tempos))
+    patrimonio_por_moeda = {}
+    for moeda, curva in curvas.items():
+        posicao = np.searchsorted(tempos_por_moeda[moeda], tempos, side="right") - 1
+        alinhada = np.where(posicao >= 0, curva[np.maximum(posicao, 0)] if len(curva) else capital_por_moeda,
+                            capital_por_moeda)
+        patrimonio_por_moeda[moeda] = alinhada
+        patrimonio += alinhada
+
+    operacoes.sort(key=lambda op: op.open_time_entrada)
+    resultado = ResultadoBacktest(tempos, patrimonio, calcular_drawdown(patrimonio), operacoes, patrimonio_por_moeda)
+    logging.info(f"Backtest concluído: {resultado.resumo()}")
+    return resultado
+
+
+def executar_backtest_armazem(armazem, moedas, intervalo: str,
+                              parametros: ParametrosBacktest = ParametrosBacktest(),
+                              limit: Optional[int] = None) -> ResultadoBacktest:
+    """Executa o backtest sobre os candles gravados em um ArmazemCandles."""
+    candles = {moeda: armazem.ler(moeda, intervalo, limit=limit) for moeda in moedas}
+    return executar_backtest(candles, parametros)
+
+
+if __name__ == "__main__":
+    from bot_trading import CONFIG, armazem_candles
+
+    resultado = executar_backtest_armazem(
+        armazem_candles, CONFIG["moedas"], CONFIG["periodo_candle"], ParametrosBacktest.de_config(CONFIG)
+    )
+    for chave, valor in resultado.resumo().items():
+        print(f"{chave}: {valor}")
+    for op in resultado.operacoes:
+        print(f"{op.moeda} {op.motivo_entrada} -> {op.motivo_saida}: {op.resultado_percentual:.2f}%")
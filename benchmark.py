@@ -0,0 +1,446 @@
+# benchmark.py - medição offline dos caminhos quentes com dados de mercado sintéticos
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import tempfile
+import importlib
+import subprocess
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from armazenamento_candles import converter_klines, dataframe_candles
+from exchange_simulada import gerar_candles_sinteticos, simbolos_sinteticos
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Limite padrão para acusar regressão: mediana 15% acima da execução de referência
+LIMITE_REGRESSAO = 0.15
+
+# Tamanhos realistas: janela do ciclo (168), histórico inicial (1000) e volume de registros do estado
+HISTORICO_CANDLES = 1000
+OPERACOES_ESTADO = 5000
+DIAS_PATRIMONIO = 365
+SIMBOLOS_TICKER = 500
+SIMBOLOS_CACHE = 1000
+
+# Vocabulário das manchetes sintéticas; as palavras-chave do bot de tendências aparecem misturadas
+_VOCABULARIO = (
+    "bitcoin ethereum solana market price crypto trader whales chart support resistance "
+    "rally dump weekly daily analysis exchange token altcoin defi nft staking fees volume "
+    "halving miners etf regulation sec wallet ledger bridge layer yield"
+).split()
+
+
+class BenchmarkIndisponivel(Exception):
+    """O benchmark depende de um módulo opcional que não está instalado."""
+
+
+# Fixtures sintéticas (determinísticas pela semente)
+
+def klines_binance(n: int, semente: int = 0, preco_inicial: float = 100.0) -> list:
+    """Resposta de get_klines (lista de listas com números em texto), como a da Binance."""
+    candles = gerar_candles_sinteticos(n, "1h", preco_inicial=preco_inicial, semente=semente)
+    return [
+        [int(c["open_time"]), f"{c['open']:.8f}", f"{c['high']:.8f}", f"{c['low']:.8f}", f"{c['close']:.8f}",
+         f"{c['volume']:.8f}", int(c["close_time"]), f"{c['quote_asset_volume']:.8f}", int(c["trades"]),
+         f"{c['taker_buy_base']:.8f}", f"{c['taker_buy_quote']:.8f}", "0"]
+        for c in candles
+    ]
+
+
+def tabela_candles(n: int, semente: int = 0) -> pd.DataFrame:
+    """DataFrame de candles no formato devolvido por pegar_dados."""
+    return dataframe_candles(converter_klines(klines_binance(n, semente)))
+
+
+def tickers(n: int, semente: int = 0) -> list:
+    """Resposta de get_symbol_ticker para `n` símbolos."""
+    rng = np.random.default_rng(semente)
+    return [{"symbol": simbolo, "price": f"{preco:.8f}"}
+            for simbolo, preco in zip(simbolos_sinteticos(n), rng.lognormal(2, 2, n))]
+
+
+def texto_noticias(palavras_chave: List[str], manchetes: int = 2000, semente: int = 0) -> str:
+    """Manchetes em minúsculas, como o texto do Reddit lido pelo bot de tendências."""
+    rng = np.random.default_rng(semente)
+    vocabulario = _VOCABULARIO + [p.lower() for p in palavras_chave]
+    return " ".join(" ".join(rng.choice(vocabulario, rng.integers(6, 14))) for _ in range(manchetes))
+
+
+def estado_sintetico(caminho: str, moedas: List[str], operacoes: int = OPERACOES_ESTADO,
+                     dias: int = DIAS_PATRIMONIO, semente: int = 0):
+    """EstadoBot com `operacoes` registros e `dias` de patrimônio (horário, bruto na última semana)."""
+    from estado_bot import EstadoBot, dados_padrao
+
+    rng = np.random.default_rng(semente)
+    estado = EstadoBot(caminho, moedas)
+    dados = dados_padrao(moedas)
+    inicio = datetime(2024, 1, 1).timestamp()
+    for i in range(operacoes):
+        moeda = moedas[i % len(moedas)]
+        preco = float(rng.lognormal(3, 1))
+        quantidade = f"{rng.uniform(0.01, 5):.4f}"
+        dados["historico_operacoes"].append({
+            "timestamp": datetime.fromtimestamp(inicio + i * 3600).strftime("%Y-%m-%d %H:%M:%S"),
+            "moeda": moeda, "tipo": "compra" if i % 2 == 0 else "venda", "quantidade": quantidade,
+            "preco": preco, "valor_total": float(quantidade) * preco, "motivo": "benchmark",
+        })
+    estado.salvar(dados)
+
+    agora = int(time.time())
+    saldo = 1000.0
+    # Pontos antigos já na resolução horária e a última semana a cada 5 minutos, como no bot em produção
+    tempos = list(range(agora - dias * 86400, agora - 7 * 86400, 3600)) + list(range(agora - 7 * 86400, agora, 300))
+    for tempo in tempos:
+        saldo *= float(np.exp(rng.normal(0, 0.002)))
+        estado.registrar_patrimonio(saldo, tempo)
+    return estado
+
+
+# Registro dos benchmarks
+
+BENCHMARKS: Dict[str, Callable] = {}
+
+
+def benchmark(nome: str):
+    """Registra uma função de preparo que devolve (chamada_medida, finalizar ou None)."""
+    def registrar(funcao):
+        BENCHMARKS[nome] = funcao
+        return funcao
+    return registrar
+
+
+def _importar(nome: str):
+    try:
+        return importlib.import_module(nome)
+    except ImportError as e:
+        raise BenchmarkIndisponivel(f"{nome} indisponível: {e}")
+
+
+@benchmark("converter_klines_1000")
+def _converter_klines(contexto):
+    brutos = klines_binance(HISTORICO_CANDLES)
+    return lambda: converter_klines(brutos), None
+
+
+@benchmark("pegar_dados_168")
+def _pegar_dados(contexto):
+    from armazenamento_candles import ArmazemCandles
+    from agendador_api import AgendadorRequisicoes
+    from exchange_simulada import criar_exchange
+    bt = _importar("bot_trading")
+    moeda = "BTCUSDT"
+    anteriores = bt.cliente_binance, bt.armazem_candles, bt.agendador_api
+    bt.cliente_binance = criar_exchange([moeda], bt.CONFIG["periodo_candle"], velocidade=None, semente=0)
+    # Sem limite de peso: centenas de chamadas por segundo esgotariam o minuto e a medida viraria espera
+    bt.agendador_api = AgendadorRequisicoes(10 ** 9)
+    bt.armazem_candles = ArmazemCandles(os.path.join(contexto.pasta, "candles"), cache=bt.criar_cache_candles())
+    # Primeira chamada grava o histórico; as medidas cobrem o caminho de cada ciclo (histórico em memória + candle aberto)
+    bt.pegar_dados(moeda, limit=168)
+
+    def finalizar():
+        bt.cliente_binance, bt.armazem_candles, bt.agendador_api = anteriores
+    return lambda: bt.pegar_dados(moeda, limit=168), finalizar
+
+
+@benchmark("cache_candles_1000_simbolos")
+def _cache_candles(contexto):
+    from armazenamento_candles import CacheCandles
+    cache = CacheCandles(HISTORICO_CANDLES, float32=True)
+    simbolos = simbolos_sinteticos(SIMBOLOS_CACHE)
+    base = converter_klines(klines_binance(HISTORICO_CANDLES + 1))
+    for simbolo in simbolos:
+        cache.substituir(simbolo, "1h", base[:-1])
+    novo = base[-1:].copy()
+
+    # Um ciclo em todas as moedas: entra o candle que fechou e a janela de 168 vai para os indicadores
+    def ciclo():
+        novo["open_time"] += 3600000
+        novo["close_time"] += 3600000
+        for simbolo in simbolos:
+            cache.anexar(simbolo, "1h", novo)
+            cache.ultimos(simbolo, "1h", 168)["close"]
+    return ciclo, None
+
+
+@benchmark("indexar_precos_500")
+def _indexar_precos(contexto):
+    bt = _importar("bot_trading")
+    resposta = tickers(SIMBOLOS_TICKER)
+    return lambda: bt.indexar_precos(resposta), None
+
+
+@benchmark("avaliar_carteira_500")
+def _avaliar_carteira(contexto):
+    from carteira import AvaliadorCarteira
+    # Metade dos ativos com par em USDT e metade só com par em BTC (avaliados em duas pernas)
+    precos = {ticker["symbol"]: float(ticker["price"]) for ticker in tickers(SIMBOLOS_TICKER)}
+    ativos = [symbol[:-len("USDT")] for symbol in precos]
+    for ativo in ativos[SIMBOLOS_TICKER // 2:]:
+        precos[f"{ativo}BTC"] = precos.pop(f"{ativo}USDT") / 60000.0
+    precos["BTCUSDT"] = 60000.0
+    rng = np.random.default_rng(0)
+    saldos = dict(zip(ativos + ["USDT"], rng.uniform(0, 10, len(ativos) + 1).tolist()))
+    avaliador = AvaliadorCarteira()
+    return lambda: avaliador.avaliar(saldos, precos), None
+
+
+@benchmark("calcular_indicadores_100")
+def _calcular_indicadores_100(contexto):
+    bt = _importar("bot_trading")
+    df = tabela_candles(100)
+    return lambda: bt.calcular_indicadores(df.copy()), None
+
+
+@benchmark("calcular_indicadores_1000")
+def _calcular_indicadores_1000(contexto):
+    bt = _importar("bot_trading")
+    df = tabela_candles(HISTORICO_CANDLES)
+    return lambda: bt.calcular_indicadores(df.copy()), None
+
+
+@benchmark("adicionar_indicadores_1000")
+def _adicionar_indicadores(contexto):
+    from indicadores import adicionar_indicadores
+    df = tabela_candles(HISTORICO_CANDLES)
+    return lambda: adicionar_indicadores(df), None
+
+
+@benchmark("salvar_dados")
+def _salvar_dados(contexto):
+    bt = _importar("bot_trading")
+    moedas = bt.CONFIG["moedas"]
+    anterior = bt.estado_bot
+    bt.estado_bot = estado_sintetico(os.path.join(contexto.pasta, "salvar.sqlite3"), moedas)
+    dados = bt.estado_bot.carregar()
+    contador = iter(range(10 ** 9))
+
+    # Um ciclo típico: uma posição alterada e uma operação nova
+    def salvar():
+        i = next(contador)
+        moeda = moedas[i % len(moedas)]
+        dados["posicoes"][moeda] = not dados["posicoes"][moeda]
+        dados["precos_compra"][moeda] = 100.0 + i
+        dados["historico_operacoes"].append({
+            "timestamp": "2025-01-01 00:00:00", "moeda": moeda, "tipo": "compra", "quantidade": "1",
+            "preco": 100.0 + i, "valor_total": 100.0 + i, "motivo": "benchmark",
+        })
+        bt.salvar_dados(dados)
+
+    def finalizar():
+        bt.estado_bot.fechar()
+        bt.estado_bot = anterior
+    return salvar, finalizar
+
+
+@benchmark("carregar_dados")
+def _carregar_dados(contexto):
+    bt = _importar("bot_trading")
+    anterior = bt.estado_bot
+    bt.estado_bot = estado_sintetico(os.path.join(contexto.pasta, "carregar.sqlite3"), bt.CONFIG["moedas"])
+
+    def finalizar():
+        bt.estado_bot.fechar()
+        bt.estado_bot = anterior
+    return bt.carregar_dados, finalizar
+
+
+@benchmark("mostrar_grafico_100")
+def _mostrar_grafico(contexto):
+    from graficos import RenderizadorGraficos
+    bt = _importar("bot_trading")
+    moeda = bt.CONFIG["moedas"][0]
+    df = bt.calcular_indicadores(tabela_candles(100))
+    dados = bt.dados_padrao(bt.CONFIG["moedas"])
+    dados["posicoes"][moeda] = True
+    anterior = bt.renderizador_graficos
+    bt.renderizador_graficos = RenderizadorGraficos(
+        os.path.join(contexto.pasta, "graficos"), bt.CONFIG["janela_media_curta"], bt.CONFIG["janela_media_longa"],
+        limites_rsi=(bt.CONFIG["limite_rsi_sobrevenda"], bt.CONFIG["limite_rsi_sobrecompra"]), max_workers=1
+    )
+    contador = iter(range(10 ** 9))
+
+    # Muda a posição a cada chamada para o cache do renderizador não pular o desenho
+    def desenhar():
+        preco = 100.0 + next(contador)
+        dados["precos_compra"][moeda], dados["stop_losses"][moeda], dados["take_profits"][moeda] = preco, preco * 0.96, preco * 1.05
+        bt.mostrar_grafico(df, moeda, dados)
+        bt.renderizador_graficos.aguardar()
+
+    def finalizar():
+        bt.renderizador_graficos.encerrar()
+        bt.renderizador_graficos = anterior
+    return desenhar, finalizar
+
+
+@benchmark("preprocessar_dados_1000")
+def _preprocessar_dados(contexto):
+    bot_ia = _importar("bot_ia")
+    from sklearn.preprocessing import MinMaxScaler
+    df = tabela_candles(HISTORICO_CANDLES)[["open_time", "close"]].rename(columns={"open_time": "timestamp"})
+    # Só o scaler é usado pelo método; evita carregar os modelos do assistente
+    assistente = SimpleNamespace(scaler=MinMaxScaler(feature_range=(0, 1)))
+    return lambda: bot_ia.IA_Assistente.preprocessar_dados(assistente, df), None
+
+
+@benchmark("contar_palavras_chave")
+def _contar_palavras_chave(contexto):
+    bot_tendencias = _importar("bot_tendencias")
+    palavras = bot_tendencias.CONFIG["keywords"]
+    texto = texto_noticias(palavras)
+    return lambda: bot_tendencias.contar_palavras_chave(texto, palavras), None
+
+
+@benchmark("saldo_discord")
+def _saldo_discord(contexto):
+    from estado_bot import EstadoBot
+    moedas = ["BTCUSDT", "SOLUSDT"]
+    caminho = os.path.join(contexto.pasta, "saldo.sqlite3")
+    estado_sintetico(caminho, moedas).fechar()
+    # Mesmo acesso do comando !saldo: estado somente leitura, último ponto e valorizações
+    leitura = EstadoBot(caminho, moedas, somente_leitura=True)
+
+    def saldo():
+        dados = leitura.carregar()
+        ultimo = leitura.ultimo_patrimonio()
+        return dados, ultimo, leitura.valorizacoes()
+    return saldo, leitura.fechar
+
+
+# Execução e comparação
+
+def medir(funcao: Callable, minimo_s: float = 0.5, min_repeticoes: int = 5, max_repeticoes: int = 10000) -> dict:
+    """Executa `funcao` repetidamente (após um aquecimento) e resume os tempos em ms."""
+    funcao()
+    amostras = []
+    inicio = time.perf_counter()
+    while len(amostras) < max_repeticoes and (len(amostras) < min_repeticoes or time.perf_counter() - inicio < minimo_s):
+        t0 = time.perf_counter_ns()
+        funcao()
+        amostras.append((time.perf_counter_ns() - t0) / 1e6)
+    tempos = np.asarray(amostras)
+    return {
+        "repeticoes": len(amostras),
+        "mediana_ms": float(np.median(tempos)),
+        "minimo_ms": float(tempos.min()),
+        "media_ms": float(tempos.mean()),
+        "p95_ms": float(np.percentile(tempos, 95)),
+        "desvio_ms": float(tempos.std()),
+    }
+
+
+def _commit_atual() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def executar(nomes: Optional[List[str]] = None, minimo_s: float = 0.5) -> dict:
+    """Roda os benchmarks escolhidos (todos por padrão) e devolve o resultado serializável."""
+    nomes = nomes or list(BENCHMARKS)
+    resultados = {}
+    with tempfile.TemporaryDirectory(prefix="benchmark_") as pasta:
+        contexto = SimpleNamespace(pasta=pasta)
+        for nome in nomes:
+            try:
+                chamada, finalizar = BENCHMARKS[nome](contexto)
+            except (BenchmarkIndisponivel, ImportError) as e:
+                resultados[nome] = {"ignorado": str(e)}
+                print(f"{nome:<28} ignorado ({e})")
+                continue
+            try:
+                resultados[nome] = medir(chamada, minimo_s=minimo_s)
+            finally:
+                if finalizar is not None:
+                    finalizar()
+            r = resultados[nome]
+            print(f"{nome:<28} mediana {r['mediana_ms']:>10.3f} ms  p95 {r['p95_ms']:>10.3f} ms  ({r['repeticoes']} repetições)")
+    return {
+        "criado_em": datetime.now().isoformat(timespec="seconds"),
+        "commit": _commit_atual(),
+        "ambiente": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "plataforma": platform.platform(),
+            "processador": platform.processor() or platform.machine(),
+        },
+        "resultados": resultados,
+    }
+
+
+def comparar(base: dict, atual: dict, limite: float = LIMITE_REGRESSAO) -> List[dict]:
+    """Compara as medianas de duas execuções; status "regressao" quando passa de (1 + limite) x base."""
+    linhas = []
+    for nome, medida in atual["resultados"].items():
+        anterior = base["resultados"].get(nome)
+        if "mediana_ms" not in medida or not anterior or "mediana_ms" not in anterior:
+            linhas.append({"nome": nome, "base_ms": None, "atual_ms": medida.get("mediana_ms"),
+                           "variacao": None, "status": "sem comparação"})
+            continue
+        variacao = medida["mediana_ms"] / anterior["mediana_ms"] - 1 if anterior["mediana_ms"] else 0.0
+        if variacao > limite:
+            status = "regressao"
+        elif variacao < -limite:
+            status = "melhora"
+        else:
+            status = "ok"
+        linhas.append({"nome": nome, "base_ms": anterior["mediana_ms"], "atual_ms": medida["mediana_ms"],
+                       "variacao": variacao, "status": status})
+    return linhas
+
+
+def formatar_relatorio(linhas: List[dict], base: dict, atual: dict, limite: float) -> str:
+    saida = [f"Comparação {base.get('commit') or base.get('criado_em')} -> {atual.get('commit') or atual.get('criado_em')} "
+             f"(limite {limite:.0%} na mediana)",
+             f"{'benchmark':<28} {'base ms':>10} {'atual ms':>10} {'variação':>9}  status"]
+    for linha in linhas:
+        base_ms = f"{linha['base_ms']:.3f}" if linha["base_ms"] is not None else "-"
+        atual_ms = f"{linha['atual_ms']:.3f}" if linha["atual_ms"] is not None else "-"
+        variacao = f"{linha['variacao']:+.1%}" if linha["variacao"] is not None else "-"
+        saida.append(f"{linha['nome']:<28} {base_ms:>10} {atual_ms:>10} {variacao:>9}  {linha['status']}")
+    return "\n".join(saida)
+
+
+if __name__ == "__main__":
+    argumentos = argparse.ArgumentParser(description="Benchmarks offline dos caminhos quentes do bot")
+    argumentos.add_argument("nomes", nargs="*", help=f"Benchmarks a executar (padrão: todos): {', '.join(BENCHMARKS)}")
+    argumentos.add_argument("--tempo", type=float, default=0.5, help="Segundos mínimos de medição por benchmark")
+    argumentos.add_argument("--saida", default=os.path.join(BASE_DIR, "benchmarks"), help="Pasta dos resultados JSON")
+    argumentos.add_argument("--comparar", help="JSON de uma execução anterior para o relatório de regressão")
+    argumentos.add_argument("--limite", type=float, default=LIMITE_REGRESSAO,
+                            help="Aumento relativo da mediana considerado regressão (0.15 = 15%%)")
+    opcoes = argumentos.parse_args()
+
+    desconhecidos = [nome for nome in opcoes.nomes if nome not in BENCHMARKS]
+    if desconhecidos:
+        argumentos.error(f"benchmark(s) desconhecido(s): {', '.join(desconhecidos)}")
+
+    # Os módulos do bot registram INFO a cada chamada; no benchmark só interessam os erros
+    logging.disable(logging.WARNING)
+    resultado = executar(opcoes.nomes, minimo_s=opcoes.tempo)
+
+    os.makedirs(opcoes.saida, exist_ok=True)
+    arquivo = os.path.join(opcoes.saida, f"benchmark_{datetime.now():%Y%m%d_%H%M%S}_{resultado['commit'] or 'sem_commit'}.json")
+    with open(arquivo, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(f"Resultados gravados em {arquivo}")
+
+    if opcoes.comparar:
+        with open(opcoes.comparar, encoding="utf-8") as f:
+            base = json.load(f)
+        linhas = comparar(base, resultado, opcoes.limite)
+        print(formatar_relatorio(linhas, base, resultado, opcoes.limite))
+        if any(linha["status"] == "regressao" for linha in linhas):
+            sys.exit(1)
@@ -1,6 +1,5 @@
 import discord
 import os
-import json
 import asyncio
 import traceback
 from dotenv import load_dotenv
@@ -8,12 +7,17 @@ import logging
 import sys
 import os
 import sys
+import sqlite3
+import time
+# Mesmo módulo importado pelo bot_ia: um único registro de métricas no processo
+from metricas import REGISTRO, iniciar_servidor_metricas, metrica_envio_discord, metrica_erros_discord
 
 # Adiciona o diretório base ao sys.path
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(BASE_DIR)
 
 from modules.bot_ia import IA_Assistente, gerar_mensagem_personalizada, responder_pergunta
+from modules.estado_bot import EstadoBot
 
 # Obtém o diretório base do projeto
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -60,12 +64,32 @@ CHANNEL_ID = int(os.getenv("DISCORD_CHANNEL_ID", "0"))
 
 # Configurações
 CONFIG = {
-    "arquivo_dados": os.path.join(BASE_DIR, "dados_bot.json"),
+    "arquivo_estado": os.path.join(BASE_DIR, "estado_bot.sqlite3"),
     "moedas": ["BTCUSDT", "SOLUSDT"],
     "percentual_alerta": 0.02,  # 2%
-    "pasta_graficos": os.path.join(BASE_DIR, "graficos")
+    "pasta_graficos": os.path.join(BASE_DIR, "graficos"),
+    "porta_metricas": 9102  # Porta local do endpoint /metrics (None desativa)
 }
 
+# Comandos conhecidos; os demais são contados como "outro" para não multiplicar as séries
+COMANDOS = ("!saldo", "!grafico", "!ajuda", "!operacoes", "!status", "!debug", "!sugestoes", "!pergunta")
+
+# Métricas do módulo (servidas em /metrics na porta_metricas)
+metrica_comandos = REGISTRO.contador("discord_comandos_total", "Comandos recebidos no canal", ("comando",))
+metrica_duracao_comandos = REGISTRO.histograma(
+    "discord_comando_duracao_segundos", "Tempo entre receber um comando e terminar a resposta", ("comando",))
+
+# Envia uma mensagem ao canal medindo a duração do envio
+async def enviar(canal, *args, **kwargs):
+    inicio = time.perf_counter()
+    try:
+        resultado = await canal.send(*args, **kwargs)
+    except Exception:
+        metrica_erros_discord.inc(modulo="discord")
+        raise
+    metrica_envio_discord.observar(time.perf_counter() - inicio, modulo="discord")
+    return resultado
+
 # Cria pastas necessárias
 os.makedirs(CONFIG["pasta_graficos"], exist_ok=True)
 
@@ -79,21 +103,34 @@ bot_trading = None
 
 assistente = IA_Assistente()
 
+# Leitura do estado gravado pelo módulo de trading (nunca vê uma gravação pela metade)
+estado_bot = EstadoBot(CONFIG["arquivo_estado"], CONFIG["moedas"], somente_leitura=True)
+
 def carregar_dados():
     try:
-        if os.path.exists(CONFIG["arquivo_dados"]):
-            with open(CONFIG["arquivo_dados"], "r") as f:
-                dados = json.load(f)
-                logging.info(f"Dados carregados com sucesso de {CONFIG['arquivo_dados']}")
-                return dados
+        if os.path.exists(CONFIG["arquivo_estado"]):
+            dados = estado_bot.carregar()
+            logging.info(f"Dados carregados com sucesso de {CONFIG['arquivo_estado']}")
+            return dados
         else:
-            logging.warning(f"Arquivo de dados não encontrado: {CONFIG['arquivo_dados']}")
+            logging.warning(f"Arquivo de estado não encontrado: {CONFIG['arquivo_estado']}")
             return {}
-    except (FileNotFoundError, json.JSONDecodeError) as e:
+    except sqlite3.Error as e:
         logging.error(f"Erro ao carregar dados: {e}")
         logging.error(traceback.format_exc())
         return {}
 
+def carregar_ultimas_operacoes(quantidade):
+    try:
+        if os.path.exists(CONFIG["arquivo_estado"]):
+            return estado_bot.ultimas_operacoes(quantidade)
+        logging.warning(f"Arquivo de estado não encontrado: {CONFIG['arquivo_estado']}")
+        return []
+    except sqlite3.Error as e:
+        logging.error(f"Erro ao carregar operações: {e}")
+        logging.error(traceback.format_exc())
+        return []
+
 async def verificar_alertas():
     await client.wait_until_ready()
     canal = client.get_channel(CHANNEL_ID)
@@ -135,7 +172,7 @@ async def on_ready():
     try:
         canal = client.get_channel(CHANNEL_ID)
         if canal:
-            await canal.send(f"{emoji('🤖', '[BOT]')} Bot de Trading Cripto iniciado e pronto para operar!")
+            await enviar(canal, f"{emoji('🤖', '[BOT]')} Bot de Trading Cripto iniciado e pronto para operar!")
             logging.info("Mensagem de inicialização enviada para o Discord")
         else:
             logging.error(f"Canal Discord {CHANNEL_ID} não encontrado para envio da mensagem de inicialização")
@@ -153,39 +190,47 @@ async def on_message(message):
     if message.channel.id != CHANNEL_ID:
         return
 
+    if not message.content.startswith("!"):
+        return
+    comando = message.content.split()[0].lower()
+    comando = comando if comando in COMANDOS else "outro"
+    metrica_comandos.inc(comando=comando)
+    with metrica_duracao_comandos.medir(comando=comando):
+        await responder_comando(message)
+
+async def responder_comando(message):
+
     # Comando !saldo
     if message.content.lower() == "!saldo":
         logging.info("Comando !saldo recebido")
         dados = carregar_dados()
         
-        if not dados or "historico_patrimonio" not in dados or not dados["historico_patrimonio"]:
-            await message.channel.send("❌ Não há dados de saldo disponíveis.")
+        try:
+            ultimo = estado_bot.ultimo_patrimonio() if dados else None
+        except sqlite3.Error as e:
+            logging.error(f"Erro ao ler patrimônio: {e}")
+            ultimo = None
+        
+        if not ultimo:
+            await enviar(message.channel, "❌ Não há dados de saldo disponíveis.")
             logging.warning("Dados de saldo não disponíveis para o comando !saldo")
             return
         
-        saldo_atual = dados["historico_patrimonio"][-1]["saldo_total_usdt"]
-        historico = dados["historico_patrimonio"]
-
-        def buscar_antigo(horas):
-            from datetime import datetime, timedelta
-            alvo = datetime.now() - timedelta(hours=horas)
-            for item in reversed(historico):
-                t = datetime.strptime(item["timestamp"], "%Y-%m-%d %H:%M:%S")
-                if t <= alvo:
-                    return item["saldo_total_usdt"]
-            return None
-
-        antigo_24h = buscar_antigo(24)
-        antigo_7d = buscar_antigo(24*7)
-
-        variacao_24h = f"{((saldo_atual - antigo_24h) / antigo_24h) * 100:.2f}%" if antigo_24h else "N/A"
-        variacao_7d = f"{((saldo_atual - antigo_7d) / antigo_7d) * 100:.2f}%" if antigo_7d else "N/A"
+        saldo_atual = ultimo[1]
+        
+        # Busca por instante na série indexada por tempo (24h, 7d, 30d e 1 ano)
+        variacoes = estado_bot.valorizacoes()
+        
+        def formatar(variacao):
+            return f"{variacao:.2f}%" if variacao is not None else "N/A"
 
         resposta = (
             f"📊 **Resumo Atual**:\n"
             f"💰 Saldo Total: **{saldo_atual:.2f} USDT**\n"
-            f"📈 Valorização em 24h: {variacao_24h}\n"
-            f"📈 Valorização em 7 dias: {variacao_7d}\n\n"
+            f"📈 Valorização em 24h: {formatar(variacoes['24h'])}\n"
+            f"📈 Valorização em 7 dias: {formatar(variacoes['7d'])}\n"
+            f"📈 Valorização em 30 dias: {formatar(variacoes['30d'])}\n"
+            f"📈 Valorização em 1 ano: {formatar(variacoes['1a'])}\n\n"
         )
         
         # Adiciona informações sobre posições atuais
@@ -204,7 +249,7 @@ async def on_message(message):
                     resposta += f"  Stop-Loss: {stop_loss:.2f} USDT\n"
                     resposta += f"  Take-Profit: {take_profit:.2f} USDT\n"
         
-        await message.channel.send(resposta)
+        await enviar(message.channel, resposta)
         logging.info("Resposta do comando !saldo enviada")
 
     # Comando !grafico
@@ -219,12 +264,12 @@ async def on_message(message):
             
             if os.path.exists(arquivo):
                 try:
-                    await message.channel.send(f"📊 Gráfico mais recente de {symbol}:", file=discord.File(arquivo))
+                    await enviar(message.channel, f"📊 Gráfico mais recente de {symbol}:", file=discord.File(arquivo))
                     logging.info(f"Gráfico de {symbol} enviado com sucesso")
                 except Exception as e:
                     logging.error(f"Erro ao enviar gráfico de {symbol}: {e}")
                     logging.error(traceback.format_exc())
-                    await message.channel.send(f"❌ Erro ao enviar gráfico de {symbol}. Verifique os logs.")
+                    await enviar(message.channel, f"❌ Erro ao enviar gráfico de {symbol}. Verifique os logs.")
             else:
                 logging.warning(f"Gráfico não encontrado para {symbol} em {arquivo}")
                 
@@ -241,9 +286,9 @@ async def on_message(message):
                 except Exception as e:
                     logging.error(f"Erro ao listar arquivos na pasta de gráficos: {e}")
                 
-                await message.channel.send(f"❌ Nenhum gráfico encontrado para {symbol}.")
+                await enviar(message.channel, f"❌ Nenhum gráfico encontrado para {symbol}.")
         else:
-            await message.channel.send("❌ Uso correto: `!grafico BTCUSDT`")
+            await enviar(message.channel, "❌ Uso correto: `!grafico BTCUSDT`")
     
     # Comando !ajuda
     elif message.content.lower() == "!ajuda":
@@ -256,35 +301,32 @@ async def on_message(message):
             "`!status` - Verifica se o bot está funcionando\n"
             "`!ajuda` - Mostra esta mensagem de ajuda"
         )
-        await message.channel.send(ajuda)
+        await enviar(message.channel, ajuda)
         logging.info("Resposta do comando !ajuda enviada")
     
     # Comando !operacoes
     elif message.content.lower() == "!operacoes":
         logging.info("Comando !operacoes recebido")
-        dados = carregar_dados()
-        operacoes = dados.get("historico_operacoes", [])
+        # Só as 10 operações mais recentes, sem ler o histórico inteiro
+        operacoes_recentes = carregar_ultimas_operacoes(10)
         
-        if not operacoes:
-            await message.channel.send("❌ Nenhuma operação registrada ainda.")
+        if not operacoes_recentes:
+            await enviar(message.channel, "❌ Nenhuma operação registrada ainda.")
             logging.warning("Nenhuma operação registrada para o comando !operacoes")
             return
         
-        # Limita a 10 operações mais recentes
-        operacoes_recentes = operacoes[-10:]
-        
         resposta = "**Últimas operações:**\n"
         for op in reversed(operacoes_recentes):
             emoji_op = "🟢" if op["tipo"] == "compra" else "🔴"
             resposta += f"{emoji_op} {op['timestamp']} - {op['tipo'].upper()} {op['quantidade']} {op['moeda']} a {op['preco']:.2f} USDT ({op['motivo']})\n"
         
-        await message.channel.send(resposta)
+        await enviar(message.channel, resposta)
         logging.info("Resposta do comando !operacoes enviada")
     
     # Comando !status
     elif message.content.lower() == "!status":
         logging.info("Comando !status recebido")
-        await message.channel.send("✅ Bot de Trading está ativo e funcionando!")
+        await enviar(message.channel, "✅ Bot de Trading está ativo e funcionando!")
         logging.info("Resposta do comando !status enviada")
     
     # Comando !debug
@@ -294,7 +336,7 @@ async def on_message(message):
         # Verifica a estrutura de diretórios
         resposta = "**Informações de Debug:**\n"
         resposta += f"Diretório base: {BASE_DIR}\n"
-        resposta += f"Arquivo de dados: {CONFIG['arquivo_dados']} (existe: {os.path.exists(CONFIG['arquivo_dados'])})\n"
+        resposta += f"Arquivo de estado: {CONFIG['arquivo_estado']} (existe: {os.path.exists(CONFIG['arquivo_estado'])})\n"
         resposta += f"Pasta de gráficos: {CONFIG['pasta_graficos']} (existe: {os.path.exists(CONFIG['pasta_graficos'])})\n"
         
         # Lista arquivos na pasta de gráficos
@@ -308,19 +350,19 @@ async def on_message(message):
         except Exception as e:
             resposta += f"Erro ao listar arquivos de gráficos: {str(e)}\n"
         
-        await message.channel.send(resposta)
+        await enviar(message.channel, resposta)
         logging.info("Resposta do comando !debug enviada")
 
     # Comando para sugestões
     if message.content.lower() == "!sugestoes":
         sugestoes = assistente.gerar_sugestoes()
-        await message.channel.send(f"💡 **Sugestões de Mercado**:\n{sugestoes}")
+        await enviar(message.channel, f"💡 **Sugestões de Mercado**:\n{sugestoes}")
 
     # Comando para perguntas
     elif message.content.lower().startswith("!pergunta"):
         pergunta = message.content[len("!pergunta "):]
         resposta = responder_pergunta(pergunta)
-        await message.channel.send(resposta)
+        await enviar(message.channel, resposta)
 
 # Função para iniciar o bot Discord
 def iniciar_bot(modulo_trading=None):
@@ -332,6 +374,7 @@ def iniciar_bot(modulo_trading=None):
         return False
     
     try:
+        iniciar_servidor_metricas(CONFIG["porta_metricas"])
         logging.info(f"Iniciando bot Discord com token: {DISCORD_TOKEN[:5]}...")
         client.run(DISCORD_TOKEN)
         return True
@@ -14,6 +14,8 @@ from tf_keras.models import Sequential, load_model
 from tf_keras.layers import LSTM, Dense
 from sklearn.preprocessing import MinMaxScaler
 from googletrans import Translator  # Adicione esta importação
+from metricas import REGISTRO, iniciar_servidor_metricas, metrica_requisicao_binance, metrica_envio_discord
+from armazenamento_candles import converter_klines, dataframe_candles
 
 # Configuração de logging
 logging.basicConfig(
@@ -34,9 +36,26 @@ CONFIG = {
     "intervalo_previsao": "1h",
     "modelo_path": "modelo_lstm.h5",
     "coingecko_api": "https://api.coingecko.com/api/v3",
-    "cryptopanic_api": "https://cryptopanic.com/api/v1/posts/"
+    "cryptopanic_api": "https://cryptopanic.com/api/v1/posts/",
+    "porta_metricas": 9104  # Porta local do endpoint /metrics quando executado sozinho (None desativa)
 }
 
+# Métricas do módulo; quando importado pelo bot do Discord, saem no /metrics dele
+metrica_inferencia = REGISTRO.histograma(
+    "ia_inferencia_duracao_segundos", "Duração da inferência dos modelos", ("modelo",))
+metrica_fontes = REGISTRO.histograma(
+    "ia_fonte_duracao_segundos", "Duração da busca em fontes externas (notícias, mercado)", ("fonte",))
+metrica_erros_fontes = REGISTRO.contador("ia_fonte_erros_total", "Buscas em fontes externas que falharam", ("fonte",))
+
+# GET em uma fonte externa medindo duração e falhas
+def buscar_fonte(fonte: str, url: str) -> requests.Response:
+    try:
+        with metrica_fontes.medir(fonte=fonte):
+            return requests.get(url)
+    except requests.RequestException:
+        metrica_erros_fontes.inc(fonte=fonte)
+        raise
+
 class IA_Assistente:
     def __init__(self):
         self.client = Client(BINANCE_API_KEY, BINANCE_SECRET_KEY)
@@ -54,14 +73,14 @@ class IA_Assistente:
 
     def coletar_dados_binance(self, symbol: str, limite: int = 100) -> pd.DataFrame:
         """Coleta dados históricos da Binance."""
-        candles = self.client.get_historical_klines(
-            symbol=symbol,
-            interval=CONFIG["intervalo_previsao"],
-            limit=limite
-        )
-        df = pd.DataFrame(candles, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'quote_asset_volume', 'trades', 'taker_buy_base', 'taker_buy_quote', 'ignore'])
-        df['close'] = df['close'].astype(float)
-        return df[['timestamp', 'close']]
+        with metrica_requisicao_binance.medir(endpoint="get_historical_klines"):
+            candles = self.client.get_historical_klines(
+                symbol=symbol,
+                interval=CONFIG["intervalo_previsao"],
+                limit=limite
+            )
+        df = dataframe_candles(converter_klines(candles), colunas=("open_time", "close"))
+        return df.rename(columns={"open_time": "timestamp"})
 
     def preprocessar_dados(self, df: pd.DataFrame) -> np.ndarray:
         """Prepara os dados para o modelo LSTM."""
@@ -90,16 +109,18 @@ class IA_Assistente:
         """Faz uma previsão para a próxima hora."""
         df = self.coletar_dados_binance(symbol)
         X, _ = self.preprocessar_dados(df)
-        previsao = self.modelo.predict(X[-1].reshape(1, -1, 1))
+        with metrica_inferencia.medir(modelo="lstm"):
+            previsao = self.modelo.predict(X[-1].reshape(1, -1, 1))
         return self.scaler.inverse_transform(previsao)[0][0]
 
     def analisar_noticias(self) -> List[Dict]:
         """Analisa notícias do CryptoPanic com NLP e traduz para português."""
-        response = requests.get(f"{CONFIG['cryptopanic_api']}?auth_token={os.getenv('CRYPTOPANIC_API_KEY')}")
+        response = buscar_fonte("cryptopanic", f"{CONFIG['cryptopanic_api']}?auth_token={os.getenv('CRYPTOPANIC_API_KEY')}")
         noticias = []
         translator = Translator()  # Inicializa o tradutor
         for item in response.json().get('results', [])[:5]:
-            sentimento = self.analisador_sentimento(item['title'])[0]
+            with metrica_inferencia.medir(modelo="sentimento"):
+                sentimento = self.analisador_sentimento(item['title'])[0]
             titulo_traduzido = translator.translate(item['title'], src='en', dest='pt').text  # Tradução
             noticias.append({
                 "titulo": titulo_traduzido,
@@ -110,7 +131,7 @@ class IA_Assistente:
 
     def detectar_memecoins(self) -> List[Dict]:
         """Identifica memecoins com alta de +50% em 24h."""
-        response = requests.get(f"{CONFIG['coingecko_api']}/coins/markets?vs_currency=usd&order=volume_desc")
+        response = buscar_fonte("coingecko", f"{CONFIG['coingecko_api']}/coins/markets?vs_currency=usd&order=volume_desc")
         memecoins = []
         for coin in response.json():
             if 'meme' in coin['name'].lower() and coin['price_change_percentage_24h'] > 50:
@@ -126,7 +147,8 @@ class IA_Assistente:
         client = discord.Client(intents=discord.Intents.default())
         await client.login(DISCORD_TOKEN)
         canal = await client.fetch_channel(DISCORD_CHANNEL_ID)
-        await canal.send(mensagem)
+        with metrica_envio_discord.medir(modulo="ia"):
+            await canal.send(mensagem)
         await client.close()
 
     def gerar_relatorio(self) -> str:
@@ -208,6 +230,7 @@ import time
 
 # Uso Exemplo
 if __name__ == "__main__":
+    iniciar_servidor_metricas(CONFIG["porta_metricas"])
     assistente = IA_Assistente()
     evento = "mercado_em_alta"  # Exemplo de evento
     mensagem = gerar_mensagem_personalizada(evento)
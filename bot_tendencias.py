@@ -9,6 +9,7 @@ from dotenv import load_dotenv
 import discord
 import asyncio
 from deep_translator import GoogleTranslator
+from metricas import REGISTRO, iniciar_servidor_metricas, metrica_envio_discord, metrica_erros_discord
 
 # Obtém o diretório base do projeto
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -65,22 +66,33 @@ CONFIG = {
         "ATH", "Binance listing", "moon", "to the moon", "bullish",
         "new token", "presale", "fair launch", "IDO", "ICO",
         "airdrop", "new listing", "just launched"
-    ]
+    ],
+    "porta_metricas": 9103  # Porta local do endpoint /metrics (None desativa)
 }
 
+# Métricas do módulo (servidas em /metrics na porta_metricas)
+metrica_fontes = REGISTRO.histograma(
+    "tendencias_fonte_duracao_segundos", "Duração da busca em cada fonte de notícias e tendências", ("fonte",))
+metrica_erros_fontes = REGISTRO.contador(
+    "tendencias_fonte_erros_total", "Buscas em fontes de notícias e tendências que falharam", ("fonte",))
+metrica_coleta = REGISTRO.histograma("tendencias_coleta_duracao_segundos", "Duração da coleta completa de tendências")
+
 # Intents do Discord
 intents = discord.Intents.default()
 intents.message_content = True
 client = discord.Client(intents=intents)
 
 # Função para fazer requisições com retry
-def fazer_request(url, headers=None, params=None, tentativas=3):
+# `fonte` identifica a origem nas métricas; cada tentativa é medida separadamente
+def fazer_request(url, headers=None, params=None, tentativas=3, fonte="outra"):
     for tentativa in range(1, tentativas + 1):
         try:
-            r = requests.get(url, headers=headers, params=params, timeout=10)
+            with metrica_fontes.medir(fonte=fonte):
+                r = requests.get(url, headers=headers, params=params, timeout=10)
             r.raise_for_status()
             return r
         except requests.RequestException as e:
+            metrica_erros_fontes.inc(fonte=fonte)
             logging.warning(f"Tentativa {tentativa} falhou para {url}: {e}")
             if tentativa == tentativas:
                 logging.error(f"{emoji('❌', '[ERRO]')} Falha definitiva para {url} após {tentativas} tentativas.")
@@ -91,7 +103,7 @@ def fazer_request(url, headers=None, params=None, tentativas=3):
 def buscar_reddit():
     url = "https://www.reddit.com/r/CryptoCurrency/new/"
     headers = {"User-Agent": "Mozilla/5.0"}
-    r = fazer_request(url, headers)
+    r = fazer_request(url, headers, fonte="reddit")
     if r:
         try:
             soup = BeautifulSoup(r.text, 'html.parser')
@@ -112,7 +124,7 @@ def buscar_coinmarketcap_top():
     url = "https://pro-api.coinmarketcap.com/v1/cryptocurrency/listings/latest"
     headers = {"X-CMC_PRO_API_KEY": CMC_API_KEY}
     params = {"start": "1", "limit": "5", "convert": "USD"}
-    r = fazer_request(url, headers, params)
+    r = fazer_request(url, headers, params, fonte="coinmarketcap")
     if r and r.status_code == 200:
         try:
             data = r.json()
@@ -132,7 +144,7 @@ def buscar_cryptopanic_news():
         return []
     
     url = f"https://cryptopanic.com/api/v1/posts/?auth_token={CRYPTOPANIC_API_KEY}&public=true"
-    r = fazer_request(url)
+    r = fazer_request(url, fonte="cryptopanic")
     if r:
         try:
             data = r.json()
@@ -152,6 +164,15 @@ def traduzir_texto(texto):
         logging.error(traceback.format_exc())
         return texto
 
+# Conta as ocorrências de cada palavra-chave no texto (já em minúsculas); omite as ausentes
+def contar_palavras_chave(texto, palavras):
+    contagem = {}
+    for palavra in palavras:
+        count = texto.count(palavra.lower())
+        if count > 0:
+            contagem[palavra] = count
+    return contagem
+
 # Função para buscar tendências e notícias
 def buscar_tendencias():
     try:
@@ -159,11 +180,7 @@ def buscar_tendencias():
         
         # Busca menções no Reddit
         texto_reddit = buscar_reddit()
-        contagem = {}
-        for palavra in CONFIG["keywords"]:
-            count = texto_reddit.count(palavra.lower())
-            if count > 0:
-                contagem[palavra] = count
+        contagem = contar_palavras_chave(texto_reddit, CONFIG["keywords"])
         
         # Busca top moedas por market cap
         moedas_top = buscar_coinmarketcap_top()
@@ -198,7 +215,8 @@ async def monitorar_tendencias():
     while not client.is_closed():
         try:
             # Busca tendências e notícias
-            dados = buscar_tendencias()
+            with metrica_coleta.medir():
+                dados = buscar_tendencias()
             
             if dados:
                 # Envia relatório para o Discord
@@ -242,9 +260,11 @@ async def enviar_relatorio_crypto(channel, mentions, moedas_top, noticias):
         else:
             msg += "\nSem notícias recentes.\n"
         
-        await channel.send(msg)
+        with metrica_envio_discord.medir(modulo="tendencias"):
+            await channel.send(msg)
         logging.info(f"{emoji('✅', '[OK]')} Relatório enviado para o Discord")
     except Exception as e:
+        metrica_erros_discord.inc(modulo="tendencias")
         logging.error(f"{emoji('❌', '[ERRO]')} Erro ao enviar relatório para o Discord: {e}")
         logging.error(traceback.format_exc())
 
@@ -261,6 +281,7 @@ def iniciar_bot():
         return False
     
     logging.info(f"{emoji('🤖', '[BOT]')} Iniciando Bot de Tendências")
+    iniciar_servidor_metricas(CONFIG["porta_metricas"])
     
     try:
         client.run(DISCORD_TOKEN)
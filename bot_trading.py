@@ -1,5 +1,6 @@
 import pandas as pd
 import os
+import io
 import time
 from binance.client import Client
 from binance.enums import *
@@ -7,13 +8,32 @@ from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import logging
 from binance.exceptions import BinanceAPIException
-import json
-import matplotlib.pyplot as plt
+from requests.adapters import HTTPAdapter
 import traceback
 import sys
 import numpy as np
 from typing import Dict, List, Tuple, Optional, Any
 import discord
+import threading
+from armazenamento_candles import ArmazemCandles, CacheCandles, CAMPOS_CACHE, converter_klines, dataframe_candles, intervalo_em_ms
+from snapshot_mercado import construir_snapshot
+from filtros_simbolos import RegistroFiltros, formatar_decimal
+from decimal import Decimal
+from monitor_tempo_real import MotorStopTakeProfit, FonteBinance
+from indicadores import media_movel_matriz, rsi_matriz
+from exchange_simulada import ExchangeSimulada, FonteSimulada, criar_exchange
+from estado_bot import EstadoBot, dados_padrao
+import sqlite3
+from graficos import RenderizadorGraficos
+from agendador_api import AgendadorRequisicoes, peso_dos_cabecalhos
+from agendador_ciclos import AgendadorCiclos
+from execucao_ordens import analisar_ordem, estatisticas_execucao
+from contextlib import contextmanager
+from metricas import REGISTRO, LIMITES_DURACAO, iniciar_servidor_metricas, metrica_envio_discord, metrica_erros_discord
+from perfil_ciclo import PerfilCiclo, ler_opcoes, VARIAVEL_AMBIENTE
+from carteira import AvaliadorCarteira, registrar_simbolo, separar_simbolo
+from notificacoes_discord import (FilaNotificacoes, PRIORIDADE_ORDEM, PRIORIDADE_ALERTA, PRIORIDADE_RESUMO,
+                                  PRIORIDADE_GRAFICO)
 
 # Obtém o diretório base do projeto
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -68,17 +88,41 @@ CONFIG = {
     "janela_media_longa": 40,
     "percentual_stop_loss": 0.04,  # 4% abaixo do preço de compra
     "percentual_take_profit": 0.05,  # 5% acima do preço de compra
-    "intervalo_verificacao": 60 * 60,  # 1 hora em segundos
+    "intervalos_ciclo": None,  # Intervalos cujo fechamento dispara um ciclo (None = só o periodo_candle)
+    "atraso_fechamento_candle": 2.0,  # Segundos após o fechamento do candle antes de iniciar o ciclo
+    "ciclos_atrasados": "coalescer",  # Se um ciclo passar do fechamento seguinte: "coalescer" ou "pular"
     "saldo_minimo_usdt": 20,  # Saldo mínimo para operar
+    "ativos_resumo_discord": 15,  # Ativos listados no resumo de saldo do Discord (os de maior valor)
     "max_tentativas_api": 3,  # Número máximo de tentativas para chamadas de API
+    "limite_peso_api": 6000,  # Peso de requisições por minuto permitido pela Binance (REQUEST_WEIGHT)
+    "fracao_peso_api": 0.8,  # Fração do limite que o bot se permite usar (o IP pode ter outros clientes)
+    "max_requisicoes_simultaneas": 32,  # Requisições em voo na coleta de dados do ciclo
     "modo_simulacao": False,  # Se True, não executa ordens reais
+    "exchange_simulada": False,  # Se True, usa a exchange local (candles gravados ou sintéticos) em vez da Binance
+    "velocidade_simulacao": 1.0,  # Aceleração do relógio da exchange simulada (None = o mais rápido possível)
     "usar_rsi": True,  # Usar RSI como confirmação
     "limite_rsi_sobrevenda": 30,  # Limite de RSI para considerar sobrevenda
     "limite_rsi_sobrecompra": 70,  # Limite de RSI para considerar sobrecompra
-    "arquivo_dados": os.path.join(BASE_DIR, "dados_bot.json"),
+    "arquivo_dados": os.path.join(BASE_DIR, "dados_bot.json"),  # Formato antigo, importado uma vez para o arquivo_estado
+    "arquivo_estado": os.path.join(BASE_DIR, "estado_bot.sqlite3"),  # Posições, operações e patrimônio (SQLite em modo WAL)
     "pasta_graficos": os.path.join(BASE_DIR, "graficos"),
+    "pasta_candles": os.path.join(BASE_DIR, "candles"),  # Histórico local de candles
+    "historico_inicial_candles": 1000,  # Candles baixados quando o histórico local está vazio
+    "cache_candles_float32": False,  # Guarda preços e volume do cache em memória em float32 (metade da memória)
+    "arquivo_filtros": os.path.join(BASE_DIR, "filtros_simbolos.json"),  # Cache do exchangeInfo
+    "ttl_filtros": 6 * 60 * 60,  # Recarrega os filtros de símbolos a cada 6 horas
+    "ordens_oco": False,  # Protege cada compra com uma OCO na Binance (stop-limit + take-profit)
+    "margem_stop_limit": 0.005,  # Preço limite da perna de stop da OCO, abaixo do preço de disparo
+    "monitor_tempo_real": True,  # Avalia stop-loss/take-profit a cada atualização de preço
+    "fonte_precos_tempo_real": "bookTicker",  # "bookTicker" (melhor bid) ou "trade"
     "discord_enabled": True,  # Habilita notificações via Discord
-    "discord_channel_id": int(os.getenv("DISCORD_CHANNEL_ID", "0"))
+    "discord_channel_id": int(os.getenv("DISCORD_CHANNEL_ID", "0")),
+    "fila_discord_max": 200,  # Notificações pendentes no máximo; com a fila cheia saem as menos prioritárias
+    "janela_agrupamento_discord": 2.0,  # Segundos em que notificações comuns são juntadas em uma mensagem
+    "intervalo_repeticao_alertas": 3600,  # Segundos antes de repetir o mesmo alerta de proximidade da mesma moeda
+    "porta_metricas": 9101,  # Porta local do endpoint /metrics (None desativa)
+    "perfil_ciclo": os.getenv(VARIAVEL_AMBIENTE),  # Modo de perfilamento: "1", "cprofile", "tracemalloc" ou "tudo"
+    "pasta_perfil": os.path.join(logs_dir, "perfil")  # Tabelas, .prof e relatórios de memória do modo de perfil
 }
 
 # Cria pastas necessárias
@@ -88,11 +132,134 @@ os.makedirs(logs_dir, exist_ok=True)
 # Variáveis globais para comunicação entre módulos
 cliente_binance = None
 discord_client = None
+motor_stops = None
+# Saldos livres do último ciclo, usados pelo monitor em tempo real sem consultar a conta a cada disparo
+saldo_ultimo_ciclo = {}
+
+# Serializa o acesso aos dados entre o ciclo e o monitor em tempo real
+trava_dados = threading.RLock()
+
+# Estado persistente do bot, aberto por inicializar_estado() na partida e não na importação
+estado_bot = None
+
+# Peso usado no minuto segundo a última resposta da Binance (ou da exchange simulada)
+def peso_usado_api():
+    if isinstance(cliente_binance, ExchangeSimulada):
+        return cliente_binance.peso_usado()
+    return peso_dos_cabecalhos(cliente_binance)
+
+# Todas as chamadas REST passam por aqui: ordens antes de dados, dentro do peso por minuto
+agendador_api = AgendadorRequisicoes(
+    CONFIG["limite_peso_api"],
+    fracao_segura=CONFIG["fracao_peso_api"],
+    ler_peso_usado=peso_usado_api,
+    relogio=lambda: agora_ms() / 1000,
+    dormir=lambda segundos: aguardar(segundos)
+)
+
+# Métricas do módulo (servidas em /metrics na porta_metricas)
+servidor_metricas = None
+metrica_ciclo = REGISTRO.histograma(
+    "bot_ciclo_duracao_segundos", "Duração total do ciclo de verificação", limites=LIMITES_DURACAO + (120.0, 300.0, 600.0))
+metrica_etapa = REGISTRO.histograma(
+    "bot_ciclo_etapa_duracao_segundos", "Duração de cada etapa do ciclo de verificação", ("etapa",),
+    limites=LIMITES_DURACAO + (120.0, 300.0))
+metrica_ciclos = REGISTRO.contador("bot_ciclos_total", "Ciclos de verificação executados, por resultado", ("resultado",))
+metrica_simbolos = REGISTRO.medidor("bot_simbolos", "Quantidade de símbolos avaliados por ciclo")
+metrica_posicoes = REGISTRO.medidor("bot_posicoes_abertas", "Posições abertas")
+metrica_posicoes_oco = REGISTRO.medidor("bot_posicoes_oco", "Posições protegidas por OCO na exchange")
+metrica_patrimonio = REGISTRO.medidor("bot_patrimonio_usdt", "Patrimônio estimado em USDT no último ciclo")
+metrica_peso_usado = REGISTRO.medidor("binance_peso_usado", "Peso de requisições usado no minuto atual")
+metrica_peso_limite = REGISTRO.medidor("binance_peso_limite", "Limite de peso de requisições por minuto")
+metrica_fila_api = REGISTRO.medidor("binance_fila_requisicoes", "Chamadas aguardando peso disponível", ("prioridade",))
+metrica_bloqueio_api = REGISTRO.medidor("binance_bloqueio_segundos", "Tempo restante de suspensão após 429/418")
+
+# Uso do peso da API lido do agendador a cada coleta das métricas
+def coletar_metricas_api():
+    uso = agendador_api.estatisticas()
+    metrica_peso_usado.definir(uso["peso_usado"])
+    metrica_peso_limite.definir(uso["peso_limite"])
+    metrica_bloqueio_api.definir(uso["bloqueado_por_s"])
+    for prioridade, quantidade in uso["fila_por_prioridade"].items():
+        metrica_fila_api.definir(quantidade, prioridade=prioridade)
+
+REGISTRO.ao_coletar(coletar_metricas_api)
+
+# Perfil por etapa do ciclo; None quando o modo de perfilamento está desligado
+perfil_ciclo = None
+
+# Mede uma etapa do ciclo (e a perfila, no modo de perfilamento)
+@contextmanager
+def etapa_ciclo(nome):
+    if perfil_ciclo is None:
+        with metrica_etapa.medir(etapa=nome):
+            yield
+    else:
+        with metrica_etapa.medir(etapa=nome), perfil_ciclo.etapa(nome):
+            yield
+
+def iniciar_perfil():
+    global perfil_ciclo
+    try:
+        opcoes = ler_opcoes(CONFIG["perfil_ciclo"])
+    except ValueError as e:
+        logging.error(f"{emoji('❌', '[ERRO]')} {e}. Modo de perfilamento desativado.")
+        return
+    if opcoes is None or perfil_ciclo is not None:
+        return
+    perfil_ciclo = PerfilCiclo(CONFIG["pasta_perfil"], opcoes)
+    logging.info(f"Modo de perfilamento ativo ({', '.join(sorted(opcoes))}); perfis em {CONFIG['pasta_perfil']}")
+
+# Histórico local de candles (evita baixar a janela completa a cada ciclo), com os
+# últimos candles de cada moeda em memória para não reler o arquivo a cada ciclo
+def criar_cache_candles():
+    return CacheCandles(CONFIG["historico_inicial_candles"], float32=CONFIG["cache_candles_float32"])
+
+armazem_candles = ArmazemCandles(CONFIG["pasta_candles"], cache=criar_cache_candles())
+
+# Filtros de negociação dos símbolos, carregados uma vez do exchangeInfo
+registro_filtros = RegistroFiltros(
+    lambda: chamar_api_com_retry(cliente_binance.get_exchange_info),
+    CONFIG["arquivo_filtros"],
+    ttl=CONFIG["ttl_filtros"]
+)
+
+# Inicializa a exchange local usada no lugar da Binance
+def inicializar_exchange_simulada():
+    global cliente_binance, armazem_candles
+    
+    # A exchange lê o histórico gravado; o bot grava os candles simulados em uma pasta separada
+    cliente_binance = criar_exchange(
+        CONFIG["moedas"],
+        CONFIG["periodo_candle"],
+        armazem=armazem_candles,
+        velocidade=CONFIG["velocidade_simulacao"]
+    )
+    armazem_candles = ArmazemCandles(os.path.join(CONFIG["pasta_candles"], "simulacao"), cache=criar_cache_candles())
+    registro_filtros.arquivo_cache = os.path.join(os.path.dirname(CONFIG["arquivo_filtros"]), "filtros_simbolos_simulacao.json")
+    logging.info(f"{emoji('✅', '[OK]')} Exchange simulada inicializada para {len(CONFIG['moedas'])} moeda(s)")
+    return True
+
+# Instante atual em ms (relógio da exchange simulada, se estiver em uso)
+def agora_ms():
+    if isinstance(cliente_binance, ExchangeSimulada):
+        return cliente_binance.relogio.agora_ms()
+    return int(time.time() * 1000)
+
+# Aguarda no relógio da exchange simulada, se estiver em uso
+def aguardar(segundos):
+    if isinstance(cliente_binance, ExchangeSimulada):
+        cliente_binance.relogio.dormir(segundos)
+    else:
+        time.sleep(segundos)
 
 # Inicializa o cliente Binance
 def inicializar_binance():
     global cliente_binance
     
+    if CONFIG["exchange_simulada"]:
+        return inicializar_exchange_simulada()
+    
     # Verifica se as chaves de API estão definidas
     if not api_key or not secret_key:
         logging.error(f"{emoji('❌', '[ERRO]')} Chaves de API da Binance não encontradas no arquivo .env")
@@ -102,8 +269,11 @@ def inicializar_binance():
     # Inicializa o cliente Binance com tratamento de erros
     try:
         cliente_binance = Client(api_key, secret_key)
+        # O pool padrão do requests guarda só 10 conexões; a coleta concorrente usa mais
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=CONFIG["max_requisicoes_simultaneas"])
+        cliente_binance.session.mount("https://", adaptador)
         # Testa a conexão
-        cliente_binance.get_account()
+        agendador_api.executar(cliente_binance.get_account)
         logging.info(f"{emoji('✅', '[OK]')} Conexão com a Binance estabelecida com sucesso")
         return True
     except BinanceAPIException as e:
@@ -117,50 +287,71 @@ def inicializar_binance():
 def registrar_discord_client(client):
     global discord_client
     discord_client = client
+    fila_discord.iniciar(client.loop)
     logging.info(f"{emoji('✅', '[OK]')} Cliente Discord registrado no módulo de trading")
 
-# Função para enviar mensagem para o Discord
-def enviar_discord(mensagem, arquivo=None):
+# Função para enviar mensagem para o Discord (pela fila de notificações; pode ser chamada de qualquer thread)
+# `conteudo` (bytes) é enviado no lugar do arquivo em disco, com o nome de `arquivo`; `chave` identifica
+# alertas repetidos, descartados dentro de CONFIG["intervalo_repeticao_alertas"]
+def enviar_discord(mensagem, arquivo=None, conteudo=None, prioridade=PRIORIDADE_RESUMO, chave=None):
     if not CONFIG["discord_enabled"] or discord_client is None:
         logging.warning(f"Discord não configurado ou desabilitado. Mensagem não enviada: {mensagem}")
         return
     
-    try:
-        canal = discord_client.get_channel(CONFIG["discord_channel_id"])
-        if canal:
-            # Cria uma tarefa assíncrona para enviar a mensagem
-            discord_client.loop.create_task(enviar_mensagem_async(canal, mensagem, arquivo))
+    anexos = ()
+    if conteudo is not None:
+        anexos = ((os.path.basename(arquivo or "grafico.png"), conteudo),)
+    elif arquivo:
+        if os.path.exists(arquivo):
+            anexos = ((os.path.basename(arquivo), arquivo),)
         else:
-            logging.error(f"Canal Discord {CONFIG['discord_channel_id']} não encontrado")
-    except Exception as e:
-        logging.error(f"{emoji('❌', '[ERRO]')} Erro ao enviar mensagem para o Discord: {e}")
-        logging.error(traceback.format_exc())
+            logging.warning(f"Arquivo não encontrado: {arquivo}")
+    fila_discord.notificar(CONFIG["discord_channel_id"], mensagem, anexos, prioridade=prioridade, chave=chave)
 
-# Função assíncrona para enviar mensagem
-async def enviar_mensagem_async(canal, mensagem, arquivo=None):
+# Função assíncrona que envia um lote da fila (uma ou mais notificações agrupadas)
+async def enviar_mensagem_async(canal_id, mensagem, anexos=()):
+    canal = discord_client.get_channel(canal_id)
+    if canal is None:
+        logging.error(f"Canal Discord {canal_id} não encontrado")
+        return
+    
+    inicio = time.perf_counter()
+    arquivos = [discord.File(io.BytesIO(origem) if isinstance(origem, bytes) else origem, filename=nome)
+                for nome, origem in anexos]
     try:
-        if arquivo and os.path.exists(arquivo):
-            await canal.send(mensagem, file=discord.File(arquivo))
-            logging.info(f"Arquivo enviado para Discord: {arquivo}")
+        if arquivos:
+            await canal.send(mensagem, files=arquivos)
+            logging.info(f"Arquivo(s) enviado(s) para Discord: {', '.join(nome for nome, _ in anexos)}")
         else:
-            if arquivo:
-                logging.warning(f"Arquivo não encontrado: {arquivo}")
             await canal.send(mensagem)
-    except Exception as e:
-        logging.error(f"{emoji('❌', '[ERRO]')} Erro ao enviar mensagem assíncrona: {e}")
-        logging.error(traceback.format_exc())
+        metrica_envio_discord.observar(time.perf_counter() - inicio, modulo="trading")
+    except Exception:
+        metrica_erros_discord.inc(modulo="trading")
+        logging.debug(traceback.format_exc())
+        # A fila registra o erro e, se for limite do Discord (429), reenvia depois da pausa
+        raise
+
+# Notificações do Discord: fila com prioridade, agrupamento e limite de envios por canal
+fila_discord = FilaNotificacoes(
+    enviar_mensagem_async,
+    capacidade=CONFIG["fila_discord_max"],
+    janela_agrupamento=CONFIG["janela_agrupamento_discord"],
+    intervalo_repeticao=CONFIG["intervalo_repeticao_alertas"]
+)
 
 # Função para chamar API com retry
 def chamar_api_com_retry(funcao, *args, **kwargs):
     for tentativa in range(1, CONFIG["max_tentativas_api"] + 1):
         try:
-            return funcao(*args, **kwargs)
+            return agendador_api.executar(funcao, *args, **kwargs)
         except BinanceAPIException as e:
             logging.warning(f"Tentativa {tentativa}/{CONFIG['max_tentativas_api']}: Erro na API Binance: {e}")
             if tentativa == CONFIG["max_tentativas_api"]:
                 logging.error(f"{emoji('❌', '[ERRO]')} Falha após {CONFIG['max_tentativas_api']} tentativas: {e}")
                 raise
-            time.sleep(2 ** tentativa)  # Espera exponencial
+            # Em 429/418 o agendador já segura as chamadas até o Retry-After
+            if getattr(e, "status_code", None) not in (429, 418):
+                time.sleep(2 ** tentativa)  # Espera exponencial
         except Exception as e:
             logging.error(f"{emoji('❌', '[ERRO]')} Erro inesperado: {e}")
             logging.debug(traceback.format_exc())
@@ -169,158 +360,190 @@ def chamar_api_com_retry(funcao, *args, **kwargs):
 # Funções para manipulação de dados
 def salvar_dados(dados):
     try:
-        with open(CONFIG["arquivo_dados"], "w") as f:
-            json.dump(dados, f, indent=4)
-        logging.debug(f"{emoji('✅', '[OK]')} Dados salvos com sucesso em {CONFIG['arquivo_dados']}")
+        # Grava só as posições alteradas e os registros novos, em uma transação
+        estado_bot.salvar(dados)
+        metrica_posicoes.definir(sum(1 for aberta in dados["posicoes"].values() if aberta))
+        metrica_posicoes_oco.definir(sum(1 for oco in dados["ordens_oco"].values() if oco))
+        logging.debug(f"{emoji('✅', '[OK]')} Dados salvos com sucesso em {CONFIG['arquivo_estado']}")
     except Exception as e:
         logging.error(f"{emoji('❌', '[ERRO]')} Erro ao salvar dados: {e}")
         logging.error(traceback.format_exc())
 
+# Abre o estado persistente (uma vez por processo); importa o dados_bot.json antigo na primeira execução
+def inicializar_estado():
+    global estado_bot
+    if estado_bot is not None:
+        return estado_bot
+    estado_bot = EstadoBot(CONFIG["arquivo_estado"], CONFIG["moedas"])
+    try:
+        estado_bot.migrar_json(CONFIG["arquivo_dados"])
+    except (OSError, ValueError, sqlite3.Error) as e:
+        logging.error(f"{emoji('❌', '[ERRO]')} Erro ao importar {CONFIG['arquivo_dados']}: {e}")
+    return estado_bot
+
 def carregar_dados():
-    dados_padrao = {
-        "posicoes": {moeda: False for moeda in CONFIG["moedas"]},
-        "precos_compra": {moeda: 0 for moeda in CONFIG["moedas"]},
-        "stop_losses": {moeda: 0 for moeda in CONFIG["moedas"]},
-        "take_profits": {moeda: 0 for moeda in CONFIG["moedas"]},
-        "ultima_alta_semanal": {moeda: 0 for moeda in CONFIG["moedas"]},
-        "historico_operacoes": [],
-        "historico_patrimonio": []
-    }
     try:
-        if os.path.exists(CONFIG["arquivo_dados"]):
-            with open(CONFIG["arquivo_dados"], "r") as f:
-                dados = json.load(f)
-                # Garante que todas as chaves necessárias existam
-                for chave, valor in dados_padrao.items():
-                    if chave not in dados:
-                        dados[chave] = valor
-                    # Para dicionários aninhados, verifica cada moeda
-                    if isinstance(valor, dict) and all(isinstance(k, str) for k in valor.keys()):
-                        for moeda in CONFIG["moedas"]:
-                            if moeda not in dados[chave]:
-                                dados[chave][moeda] = dados_padrao[chave].get(moeda, 0 if chave != "posicoes" else False)
-                return dados
-        else:
-            logging.info(f"Arquivo de dados não encontrado em {CONFIG['arquivo_dados']}. Criando novo arquivo.")
-            salvar_dados(dados_padrao)
-            return dados_padrao
-    except (FileNotFoundError, json.JSONDecodeError) as e:
+        return estado_bot.carregar()
+    except sqlite3.Error as e:
         logging.warning(f"Erro ao carregar dados: {e}. Usando dados padrão.")
-        return dados_padrao
+        return dados_padrao(CONFIG["moedas"])
+
+# Indexa os saldos da conta por ativo, descartando os zerados: os livres (para
+# dimensionar ordens) e os totais, livre + bloqueado em ordens (para o patrimônio)
+def indexar_saldos(conta):
+    livres = {}
+    totais = {}
+    for ativo in conta['balances']:
+        livre = float(ativo['free'])
+        total = livre + float(ativo['locked'])
+        if livre > 0:
+            livres[ativo['asset']] = livre
+        if total > 0:
+            totais[ativo['asset']] = total
+    return livres, totais
+
+# Indexa a resposta de get_symbol_ticker por símbolo
+def indexar_precos(tickers):
+    return {ticker['symbol']: float(ticker['price']) for ticker in tickers}
+
+# Avalia a conta inteira em USDT (pares diretos, via BTC ou stablecoin 1:1)
+avaliador_carteira = AvaliadorCarteira()
+
+# Ativo negociado e ativo de cotação de um símbolo (ex.: ETHBTC -> ETH e BTC)
+def ativo_base(moeda):
+    partes = separar_simbolo(moeda)
+    return partes[0] if partes else moeda
 
+def ativo_quote(moeda):
+    partes = separar_simbolo(moeda)
+    return partes[1] if partes else avaliador_carteira.moeda
+
+# Símbolos que o ciclo precisa precificar: os negociados e os pares que convertem seus quotes para USDT
+def simbolos_precificados():
+    return CONFIG["moedas"] + avaliador_carteira.simbolos_necessarios(CONFIG["moedas"])
+
+def avaliar_carteira(snapshot):
+    avaliacao = avaliador_carteira.avaliar(snapshot.saldo_total, snapshot.precos)
+    if avaliacao.sem_preco:
+        logging.warning(f"{emoji('⚠️', '[AVISO]')} Ativos sem preço em {avaliacao.moeda}, fora do total: "
+                        f"{', '.join(avaliacao.sem_preco)}")
+    return avaliacao
+
+# Retorna (saldos livres, saldos totais) por ativo
 def pegar_saldo():
     if cliente_binance is None:
         logging.error(f"{emoji('❌', '[ERRO]')} Cliente Binance não inicializado")
-        return {"USDT": 0, "BTC": 0, "SOL": 0}
-    
-    saldo = {"USDT": 0}
-    # Adiciona as moedas base (sem USDT)
-    for moeda in CONFIG["moedas"]:
-        moeda_base = moeda.replace("USDT", "")
-        saldo[moeda_base] = 0
+        return {}, {}
     
     try:
-        conta = chamar_api_com_retry(cliente_binance.get_account)
-        for ativo in conta['balances']:
-            if ativo['asset'] in saldo:
-                saldo[ativo['asset']] = float(ativo['free'])
+        # Uma única chamada; a Binance omite os ativos zerados da resposta
+        conta = chamar_api_com_retry(cliente_binance.get_account, omitZeroBalances="true")
+        return indexar_saldos(conta)
     except Exception as e:
         logging.error(f"{emoji('❌', '[ERRO]')} Erro ao obter saldo: {e}")
-    
-    return saldo
+        return {}, {}
 
 def pegar_precos():
     if cliente_binance is None:
         logging.error(f"{emoji('❌', '[ERRO]')} Cliente Binance não inicializado")
-        return {moeda: 0 for moeda in CONFIG["moedas"]}
+        return {moeda: 0 for moeda in simbolos_precificados()}
     
-    precos = {}
-    for moeda in CONFIG["moedas"]:
-        try:
-            ticker = chamar_api_com_retry(cliente_binance.get_symbol_ticker, symbol=moeda)
-            precos[moeda] = float(ticker['price'])
-        except Exception as e:
-            logging.error(f"{emoji('❌', '[ERRO]')} Erro ao obter preço de {moeda}: {e}")
+    # Busca os preços de todos os pares em uma única requisição (peso 4): assim qualquer
+    # ativo da conta tem preço para a avaliação, não só os negociados
+    simbolos = simbolos_precificados()
+    try:
+        indexados = indexar_precos(chamar_api_com_retry(cliente_binance.get_symbol_ticker))
+    except Exception as e:
+        # Sem o lote, busca ao menos os símbolos usados pelo ciclo, moeda a moeda
+        logging.error(f"{emoji('❌', '[ERRO]')} Erro ao obter preços em lote: {e}")
+        indexados = {}
+        for moeda in simbolos:
+            try:
+                ticker = chamar_api_com_retry(cliente_binance.get_symbol_ticker, symbol=moeda)
+                indexados[moeda] = float(ticker['price'])
+            except Exception as e:
+                logging.error(f"{emoji('❌', '[ERRO]')} Erro ao obter preço de {moeda}: {e}")
+    
+    precos = indexados
+    for moeda in simbolos:
+        if moeda not in precos:
+            logging.error(f"{emoji('❌', '[ERRO]')} Preço de {moeda} não retornado pela Binance")
             precos[moeda] = 0
     return precos
 
-def atualizar_historico(dados):
-    saldo = pegar_saldo()
-    precos = pegar_precos()
+def atualizar_historico(dados, snapshot, avaliacao=None):
+    # Valor total da conta em USDT
+    total_usdt = (avaliacao or avaliar_carteira(snapshot)).total
     
-    # Calcula o valor total em USDT
-    total_usdt = saldo["USDT"]
-    for moeda in CONFIG["moedas"]:
-        moeda_base = moeda.replace("USDT", "")
-        total_usdt += saldo[moeda_base] * precos[moeda]
+    metrica_patrimonio.definir(total_usdt)
     
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    dados.setdefault("historico_patrimonio", []).append({
-        "timestamp": timestamp, 
-        "saldo_total_usdt": total_usdt
-    })
-    
-    # Mantém apenas os últimos 7 dias (168 horas)
-    dados["historico_patrimonio"] = dados["historico_patrimonio"][-168:]
+    # Série indexada por epoch: bruta por 7 dias, horária por 1 ano e diária depois disso
+    try:
+        estado_bot.registrar_patrimonio(total_usdt)
+    except sqlite3.Error as e:
+        logging.error(f"{emoji('❌', '[ERRO]')} Erro ao registrar patrimônio: {e}")
     return dados
 
-def mostrar_valorizacao(dados):
-    historico = dados.get("historico_patrimonio", [])
-    if len(historico) < 2:
-        logging.info("Histórico insuficiente para calcular valorização")
-        return None, None
-    
-    atual = historico[-1]["saldo_total_usdt"]
-    
-    def buscar_antigo(horas):
-        alvo = datetime.now() - timedelta(hours=horas)
-        for item in reversed(historico):
-            t = datetime.strptime(item["timestamp"], "%Y-%m-%d %H:%M:%S")
-            if t <= alvo:
-                return item["saldo_total_usdt"]
-        return None
-    
-    antigo_24h = buscar_antigo(24)
-    antigo_7d = buscar_antigo(24 * 7)
-    
-    variacao_24h = None
-    variacao_7d = None
+# Nomes exibidos para cada período de PERIODOS_VALORIZACAO
+NOMES_PERIODOS = {"24h": "24h", "7d": "7 dias", "30d": "30 dias", "1a": "1 ano"}
+
+def mostrar_valorizacao():
+    try:
+        variacoes = estado_bot.valorizacoes()
+    except sqlite3.Error as e:
+        logging.error(f"{emoji('❌', '[ERRO]')} Erro ao calcular valorização: {e}")
+        return {}
     
-    if antigo_24h:
-        variacao_24h = ((atual - antigo_24h) / antigo_24h) * 100
-        logging.info(f"{emoji('📈', '[VALORIZACAO]')} Valorização em 24h: {variacao_24h:.2f}%")
+    if all(variacao is None for variacao in variacoes.values()):
+        logging.info("Histórico insuficiente para calcular valorização")
     
-    if antigo_7d:
-        variacao_7d = ((atual - antigo_7d) / antigo_7d) * 100
-        logging.info(f"{emoji('📊', '[VALORIZACAO]')} Valorização em 7 dias: {variacao_7d:.2f}%")
+    for periodo, variacao in variacoes.items():
+        if variacao is not None:
+            logging.info(f"{emoji('📈', '[VALORIZACAO]')} Valorização em {NOMES_PERIODOS[periodo]}: {variacao:.2f}%")
     
-    return variacao_24h, variacao_7d
+    return variacoes
 
 def pegar_dados(codigo, limit=100):
     if cliente_binance is None:
         logging.error(f"{emoji('❌', '[ERRO]')} Cliente Binance não inicializado")
         return pd.DataFrame()
     
+    intervalo = CONFIG["periodo_candle"]
+    
     try:
-        candles = chamar_api_com_retry(
-            cliente_binance.get_klines,
-            symbol=codigo,
-            interval=CONFIG["periodo_candle"],
-            limit=limit
-        )
-        
-        df = pd.DataFrame(candles)
-        df.columns = ["open_time", "open", "high", "low", "close", "volume", "close_time",
-                      "quote_asset_volume", "trades", "taker_buy_base", "taker_buy_quote", "ignore"]
+        agora = agora_ms()
+        ultimo = armazem_candles.ultimo_open_time(codigo, intervalo)
+        armazenados = armazem_candles.tamanho(codigo, intervalo)
         
-        # Converte tipos de dados
-        for col in ["open", "high", "low", "close", "volume"]:
-            df[col] = df[col].astype(float)
-        
-        df["open_time"] = pd.to_datetime(df["open_time"], unit="ms")
-        df["close_time"] = pd.to_datetime(df["close_time"], unit="ms")
+        # O último candle retornado pela Binance ainda está aberto, por isso limit - 1
+        if (ultimo is None or armazenados < limit - 1 or
+                (agora - ultimo) // intervalo_em_ms(intervalo) >= 1000):
+            # Histórico local vazio, curto ou com lacuna: baixa a janela completa
+            candles = chamar_api_com_retry(
+                cliente_binance.get_klines,
+                symbol=codigo,
+                interval=intervalo,
+                limit=max(limit, CONFIG["historico_inicial_candles"])
+            )
+            registros = converter_klines(candles)
+            armazem_candles.substituir(codigo, intervalo, registros[registros["close_time"] < agora])
+        else:
+            # Baixa apenas os candles posteriores ao último gravado
+            candles = chamar_api_com_retry(
+                cliente_binance.get_klines,
+                symbol=codigo,
+                interval=intervalo,
+                startTime=ultimo + 1,
+                limit=1000
+            )
+            registros = converter_klines(candles)
+            armazem_candles.anexar(codigo, intervalo, registros[registros["close_time"] < agora])
         
-        return df
+        # Junta o histórico gravado com o candle ainda em formação
+        abertos = registros[registros["close_time"] >= agora]
+        historico = armazem_candles.janela(codigo, intervalo, limit - len(abertos))
+        colunas = {nome: np.concatenate([historico[nome], abertos[nome]]) for nome in CAMPOS_CACHE}
+        return dataframe_candles(colunas, colunas=CAMPOS_CACHE)
     except Exception as e:
         logging.error(f"{emoji('❌', '[ERRO]')} Erro ao obter dados de {codigo}: {e}")
         return pd.DataFrame()
@@ -329,130 +552,96 @@ def calcular_indicadores(df):
     if df.empty:
         return df
     
+    fechamentos = df["close"].to_numpy(dtype=np.float64)
+    
     # Médias móveis
-    df["media_curta"] = df["close"].rolling(window=CONFIG["janela_media_curta"]).mean()
-    df["media_longa"] = df["close"].rolling(window=CONFIG["janela_media_longa"]).mean()
+    df["media_curta"] = media_movel_matriz(fechamentos, CONFIG["janela_media_curta"])
+    df["media_longa"] = media_movel_matriz(fechamentos, CONFIG["janela_media_longa"])
     
-    # RSI (Relative Strength Index)
+    # RSI (Relative Strength Index); o primeiro candle conta como variação zero
     if CONFIG["usar_rsi"]:
-        delta = df['close'].diff()
-        ganho = delta.where(delta > 0, 0)
-        perda = -delta.where(delta < 0, 0)
-        
-        media_ganho = ganho.rolling(window=14).mean()
-        media_perda = perda.rolling(window=14).mean()
-        
-        rs = media_ganho / media_perda
-        df['rsi'] = 100 - (100 / (1 + rs))
+        df['rsi'] = rsi_matriz(fechamentos, 14, primeiro_delta_zero=True)
     
     return df
 
-def obter_lot_size(symbol):
+def obter_filtros(symbol):
     if cliente_binance is None:
         logging.error(f"{emoji('❌', '[ERRO]')} Cliente Binance não inicializado")
-        return 0, 0, 0
+        return None
     
-    try:
-        info = chamar_api_com_retry(cliente_binance.get_symbol_info, symbol=symbol)
-        lot = next(f for f in info['filters'] if f['filterType'] == 'LOT_SIZE')
-        notional = next(f for f in info['filters'] if f['filterType'] in ['MIN_NOTIONAL', 'NOTIONAL'])
-        return float(lot['minQty']), float(lot['stepSize']), float(notional['minNotional'])
-    except Exception as e:
-        logging.error(f"{emoji('❌', '[ERRO]')} Erro ao obter lot_size para {symbol}: {e}")
+    filtros = registro_filtros.obter(symbol)
+    if filtros is None:
+        logging.error(f"{emoji('❌', '[ERRO]')} Filtros de negociação não encontrados para {symbol}")
+    else:
+        registrar_simbolo(symbol, filtros.base, filtros.quote)
+    return filtros
+
+def obter_lot_size(symbol):
+    filtros = obter_filtros(symbol)
+    if filtros is None:
         return 0, 0, 0
+    return float(filtros.min_qty), float(filtros.step_size), float(filtros.min_notional)
 
-def ajustar_quantidade(symbol, quantidade, saldo_disponivel, preco):
-    min_qty, step, min_notional = obter_lot_size(symbol)
+def ajustar_quantidade(symbol, quantidade, saldo_disponivel, preco, filtros=None):
+    if filtros is None:
+        filtros = obter_filtros(symbol)
     
-    if min_qty == 0 or step == 0:
+    if filtros is None or filtros.min_qty == 0 or filtros.step_size == 0:
         return "0"
     
-    quantidade = float(quantidade)
+    preco = Decimal(str(preco))
     
-    # Ajusta para o step size
-    quantidade = max(min_qty, round(quantidade // step * step, 8))
+    # Limita ao saldo disponível (em USDT: nas vendas, quantidade * preço) e ajusta para o step size
+    quantidade = min(Decimal(str(quantidade)), Decimal(str(saldo_disponivel)) / preco)
+    quantidade = filtros.quantizar_quantidade(quantidade)
     
-    # Limita ao saldo disponível
-    quantidade = min(quantidade, saldo_disponivel / preco)
+    if quantidade < filtros.min_qty:
+        logging.warning(f"Quantidade {formatar_decimal(quantidade)} abaixo do mínimo ({formatar_decimal(filtros.min_qty)}) para {symbol}")
+        return "0"
     
     # Verifica valor mínimo da ordem
-    if quantidade * preco < min_notional:
-        logging.warning(f"Valor da ordem ({quantidade * preco:.2f} USDT) abaixo do mínimo ({min_notional} USDT)")
+    if quantidade * preco < filtros.min_notional:
+        logging.warning(f"Valor da ordem ({quantidade * preco:.2f} USDT) abaixo do mínimo ({filtros.min_notional} USDT)")
         return "0"
     
-    return f"{quantidade:.8f}".rstrip('0').rstrip('.')
+    return formatar_decimal(quantidade)
+
+# Publica no Discord o gráfico recém-gerado, direto dos bytes em memória
+def publicar_grafico(symbol, caminho, png):
+    if CONFIG["discord_enabled"]:
+        enviar_discord(f"📊 **Gráfico atualizado de {symbol}**", caminho, conteudo=png, prioridade=PRIORIDADE_GRAFICO)
+
+# Desenha os gráficos em segundo plano, fora do caminho das ordens
+renderizador_graficos = RenderizadorGraficos(
+    CONFIG["pasta_graficos"],
+    CONFIG["janela_media_curta"],
+    CONFIG["janela_media_longa"],
+    limites_rsi=(CONFIG["limite_rsi_sobrevenda"], CONFIG["limite_rsi_sobrecompra"]) if CONFIG["usar_rsi"] else None,
+    ao_renderizar=publicar_grafico
+)
 
-def mostrar_grafico(df, symbol):
+# Agenda o gráfico do símbolo; retorna o caminho do PNG (gravado em segundo plano)
+def mostrar_grafico(df, symbol, dados):
     if df.empty:
         logging.warning(f"Sem dados para gerar gráfico de {symbol}")
         return None
     
-    try:
-        plt.figure(figsize=(12, 8))
-        
-        # Subplot principal para preço e médias
-        ax1 = plt.subplot(2, 1, 1)
-        ax1.plot(df['close_time'], df['close'], label='Preço', color='blue')
-        ax1.plot(df['close_time'], df['media_curta'], label=f'Média {CONFIG["janela_media_curta"]}', linestyle='--', color='green')
-        ax1.plot(df['close_time'], df['media_longa'], label=f'Média {CONFIG["janela_media_longa"]}', linestyle='--', color='red')
-        
-        # Adiciona linhas para stop-loss e take-profit se estiver em posição
-        dados = carregar_dados()
-        if dados["posicoes"][symbol]:
-            preco_compra = dados["precos_compra"][symbol]
-            stop_loss = dados["stop_losses"][symbol]
-            take_profit = dados["take_profits"][symbol]
-            
-            ax1.axhline(y=preco_compra, color='black', linestyle='-', alpha=0.5, label=f'Preço de Compra: {preco_compra:.2f}')
-            ax1.axhline(y=stop_loss, color='red', linestyle=':', alpha=0.5, label=f'Stop-Loss: {stop_loss:.2f}')
-            ax1.axhline(y=take_profit, color='green', linestyle=':', alpha=0.5, label=f'Take-Profit: {take_profit:.2f}')
-        
-        ax1.set_title(f'{symbol} - Análise Técnica')
-        ax1.set_ylabel('Preço (USDT)')
-        ax1.grid(True)
-        ax1.legend()
-        
-        # Subplot para RSI
-        if CONFIG["usar_rsi"] and 'rsi' in df.columns:
-            ax2 = plt.subplot(2, 1, 2, sharex=ax1)
-            ax2.plot(df['close_time'], df['rsi'], label='RSI', color='purple')
-            ax2.axhline(y=CONFIG["limite_rsi_sobrecompra"], color='red', linestyle='--', alpha=0.5)
-            ax2.axhline(y=CONFIG["limite_rsi_sobrevenda"], color='green', linestyle='--', alpha=0.5)
-            ax2.set_ylabel('RSI')
-            ax2.set_ylim(0, 100)
-            ax2.grid(True)
-            ax2.legend()
-        
-        plt.tight_layout()
-        
-        # Usa caminho absoluto para salvar o gráfico
-        nome_arquivo = os.path.join(CONFIG["pasta_graficos"], f'grafico_{symbol}.png')
-        plt.savefig(nome_arquivo)
-        logging.info(f"{emoji('✅', '[OK]')} Gráfico salvo como {os.path.abspath(nome_arquivo)}")
-        plt.close()
-        
-        # Verifica se o arquivo foi criado
-        if os.path.exists(nome_arquivo):
-            logging.info(f"Arquivo de gráfico confirmado: {nome_arquivo}")
-        else:
-            logging.error(f"Falha ao criar arquivo de gráfico: {nome_arquivo}")
-        
-        # Envia o gráfico para o Discord se habilitado
-        if CONFIG["discord_enabled"]:
-            mensagem = f"📊 **Gráfico atualizado de {symbol}**"
-            enviar_discord(mensagem, nome_arquivo)
-        
-        return nome_arquivo
-    except Exception as e:
-        logging.error(f"{emoji('❌', '[ERRO]')} Erro ao gerar gráfico para {symbol}: {e}")
-        logging.error(traceback.format_exc())
-        return None
+    # Linhas de stop-loss e take-profit se estiver em posição
+    posicao = None
+    if dados["posicoes"][symbol]:
+        posicao = (dados["precos_compra"][symbol], dados["stop_losses"][symbol], dados["take_profits"][symbol])
+    
+    if renderizador_graficos.agendar(symbol, df, posicao):
+        logging.debug(f"Gráfico de {symbol} agendado")
+    else:
+        logging.debug(f"Gráfico de {symbol} já está atualizado")
+    return renderizador_graficos.caminho(symbol)
 
-def atualizar_ultima_alta_semanal(dados):
+def atualizar_ultima_alta_semanal(dados, snapshot):
     for moeda in CONFIG["moedas"]:
         try:
-            # Obtém dados da última semana
-            df = pegar_dados(moeda, limit=168)  # 7 dias * 24 horas
+            # Candles da última semana (7 dias * 24 horas) já presentes no snapshot
+            df = snapshot.candles[moeda]
             if not df.empty:
                 # Encontra o preço mais alto da semana
                 preco_mais_alto = df['high'].max()
@@ -462,7 +651,7 @@ def atualizar_ultima_alta_semanal(dados):
             logging.error(f"{emoji('❌', '[ERRO]')} Erro ao atualizar última alta semanal para {moeda}: {e}")
     return dados
 
-def registrar_operacao(dados, moeda, tipo, quantidade, preco, motivo=""):
+def registrar_operacao(dados, moeda, tipo, quantidade, preco, motivo="", execucao=None):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     operacao = {
         "timestamp": timestamp,
@@ -473,6 +662,8 @@ def registrar_operacao(dados, moeda, tipo, quantidade, preco, motivo=""):
         "valor_total": float(quantidade) * preco,
         "motivo": motivo
     }
+    if execucao:
+        operacao["execucao"] = execucao
     dados.setdefault("historico_operacoes", []).append(operacao)
     
     # Envia notificação para o Discord
@@ -485,28 +676,59 @@ def registrar_operacao(dados, moeda, tipo, quantidade, preco, motivo=""):
             f"Valor Total: {float(quantidade) * preco:.2f} USDT\n"
             f"Motivo: {motivo}"
         )
-        enviar_discord(mensagem)
+        if execucao and execucao["slippage_bps"] is not None:
+            mensagem += f"\nSlippage: {execucao['slippage_bps']:.1f} bps"
+        enviar_discord(mensagem, prioridade=PRIORIDADE_ORDEM)
     
     return dados
 
-def executar_compra(moeda, quantidade, preco_atual, dados, motivo=""):
+# Executa a ordem a mercado e mede a execução; retorna (ordem, execucao)
+def enviar_ordem_mercado(moeda, lado, quantidade, preco_referencia, tempo_sinal=None):
+    tempo_envio = agora_ms()
+    ordem = chamar_api_com_retry(
+        cliente_binance.create_order,
+        symbol=moeda,
+        side=lado,
+        type=ORDER_TYPE_MARKET,
+        quantity=quantidade
+    )
+    execucao = analisar_ordem(
+        ordem, "compra" if lado == SIDE_BUY else "venda", preco_referencia,
+        ativo_base(moeda), ativo_quote(moeda),
+        tempo_sinal=tempo_sinal, tempo_envio=tempo_envio, tempo_resposta=agora_ms()
+    )
+    return ordem, execucao
+
+# Texto curto com preço médio, slippage e latência da execução, para o log
+def descrever_execucao(execucao):
+    if not execucao or execucao["preco_medio"] is None:
+        return ""
+    partes = [f"preço médio {execucao['preco_medio']:.2f}"]
+    if execucao["slippage_bps"] is not None:
+        partes.append(f"slippage {execucao['slippage_bps']:.1f} bps")
+    if execucao["latencia_ms"] is not None:
+        partes.append(f"latência {execucao['latencia_ms']} ms")
+    if execucao["taxa_quote"]:
+        partes.append(f"taxa {execucao['taxa_quote']:.4f} USDT")
+    return f" ({', '.join(partes)})"
+
+def executar_compra(moeda, quantidade, preco_atual, dados, motivo="", tempo_sinal=None):
     if cliente_binance is None:
         logging.error(f"{emoji('❌', '[ERRO]')} Cliente Binance não inicializado")
         return False, dados
     
-    if CONFIG["modo_simulacao"]:
+    ordem = None
+    execucao = None
+    
+    # Com a exchange simulada a ordem é enviada a ela, que atualiza os saldos
+    if CONFIG["modo_simulacao"] and not CONFIG["exchange_simulada"]:
         logging.info(f"{emoji('🔸', '[SIMULACAO]')} Compra de {quantidade} {moeda} a {preco_atual:.2f} USDT")
         sucesso = True
     else:
         try:
-            ordem = chamar_api_com_retry(
-                cliente_binance.create_order,
-                symbol=moeda,
-                side=SIDE_BUY,
-                type=ORDER_TYPE_MARKET,
-                quantity=quantidade
-            )
-            logging.info(f"{emoji('✅', '[OK]')} Compra de {quantidade} {moeda} executada a {preco_atual:.2f} USDT")
+            ordem, execucao = enviar_ordem_mercado(moeda, SIDE_BUY, quantidade, preco_atual, tempo_sinal)
+            logging.info(f"{emoji('✅', '[OK]')} Compra de {quantidade} {moeda} executada a {preco_atual:.2f} USDT"
+                         f"{descrever_execucao(execucao)}")
             logging.debug(f"Detalhes da ordem: {ordem}")
             sucesso = True
         except Exception as e:
@@ -514,6 +736,11 @@ def executar_compra(moeda, quantidade, preco_atual, dados, motivo=""):
             sucesso = False
     
     if sucesso:
+        # Stop e alvo partem do preço médio realmente executado, não do ticker do sinal
+        if execucao and execucao["preco_medio"] is not None:
+            preco_atual = execucao["preco_medio"]
+            quantidade = execucao["quantidade"]
+        
         # Atualiza dados da posição
         dados["posicoes"][moeda] = True
         dados["precos_compra"][moeda] = preco_atual
@@ -521,33 +748,43 @@ def executar_compra(moeda, quantidade, preco_atual, dados, motivo=""):
         dados["take_profits"][moeda] = preco_atual * (1 + CONFIG["percentual_take_profit"])
         
         # Registra a operação
-        dados = registrar_operacao(dados, moeda, "compra", quantidade, preco_atual, motivo)
+        dados = registrar_operacao(dados, moeda, "compra", quantidade, preco_atual, motivo, execucao)
+        
+        # Protege a posição na própria exchange assim que a compra é executada
+        if CONFIG["ordens_oco"] and ordem is not None:
+            colocar_oco(moeda, quantidade_recebida(ordem, ativo_base(moeda)), dados)
         
         # Salva os dados atualizados
         salvar_dados(dados)
     
     return sucesso, dados
 
-def executar_venda(moeda, quantidade, preco_atual, dados, motivo=""):
+def executar_venda(moeda, quantidade, preco_atual, dados, motivo="", tempo_sinal=None):
     if cliente_binance is None:
         logging.error(f"{emoji('❌', '[ERRO]')} Cliente Binance não inicializado")
         return False, dados
     
-    moeda_base = moeda.replace("USDT", "")
-    
-    if CONFIG["modo_simulacao"]:
+    execucao = None
+    if CONFIG["modo_simulacao"] and not CONFIG["exchange_simulada"]:
         logging.info(f"{emoji('🔸', '[SIMULACAO]')} Venda de {quantidade} {moeda} a {preco_atual:.2f} USDT")
         sucesso = True
     else:
+        # O saldo da posição fica bloqueado na OCO: cancela antes de vender a mercado
+        oco = dados["ordens_oco"].get(moeda)
+        if oco:
+            try:
+                if not cancelar_oco(moeda, dados):
+                    # A OCO foi executada antes do cancelamento; a posição já está encerrada
+                    return False, dados
+            except Exception as e:
+                logging.error(f"{emoji('❌', '[ERRO]')} Erro ao cancelar a OCO de {moeda}: {e}")
+                return False, dados
+            quantidade = oco["quantidade"]
+        
         try:
-            ordem = chamar_api_com_retry(
-                cliente_binance.create_order,
-                symbol=moeda,
-                side=SIDE_SELL,
-                type=ORDER_TYPE_MARKET,
-                quantity=quantidade
-            )
-            logging.info(f"{emoji('✅', '[OK]')} Venda de {quantidade} {moeda} executada a {preco_atual:.2f} USDT")
+            ordem, execucao = enviar_ordem_mercado(moeda, SIDE_SELL, quantidade, preco_atual, tempo_sinal)
+            logging.info(f"{emoji('✅', '[OK]')} Venda de {quantidade} {moeda} executada a {preco_atual:.2f} USDT"
+                         f"{descrever_execucao(execucao)}")
             logging.debug(f"Detalhes da ordem: {ordem}")
             sucesso = True
         except Exception as e:
@@ -555,43 +792,216 @@ def executar_venda(moeda, quantidade, preco_atual, dados, motivo=""):
             sucesso = False
     
     if sucesso:
-        # Atualiza dados da posição
-        dados["posicoes"][moeda] = False
+        if execucao and execucao["preco_medio"] is not None:
+            preco_atual = execucao["preco_medio"]
+            quantidade = execucao["quantidade"]
+        dados = concluir_venda(moeda, quantidade, preco_atual, dados, motivo, execucao)
+    
+    return sucesso, dados
+
+# Encerra a posição nos dados após uma venda executada (a mercado ou pela OCO)
+def concluir_venda(moeda, quantidade, preco_atual, dados, motivo="", execucao=None):
+    # Atualiza dados da posição
+    dados["posicoes"][moeda] = False
+    
+    # Registra a operação
+    dados = registrar_operacao(dados, moeda, "venda", quantidade, preco_atual, motivo, execucao)
+    
+    # Calcula lucro/prejuízo
+    preco_compra = dados["precos_compra"][moeda]
+    if preco_compra > 0:
+        variacao_percentual = ((preco_atual - preco_compra) / preco_compra) * 100
+        resultado = "LUCRO" if variacao_percentual >= 0 else "PREJUIZO"
+        logging.info(f"{emoji('📈' if variacao_percentual >= 0 else '📉', '['+resultado+']')} Resultado: {variacao_percentual:.2f}% ({preco_atual - preco_compra:.2f} USDT)")
         
-        # Registra a operação
-        dados = registrar_operacao(dados, moeda, "venda", quantidade, preco_atual, motivo)
-        
-        # Calcula lucro/prejuízo
-        preco_compra = dados["precos_compra"][moeda]
-        if preco_compra > 0:
-            variacao_percentual = ((preco_atual - preco_compra) / preco_compra) * 100
-            resultado = "LUCRO" if variacao_percentual >= 0 else "PREJUIZO"
-            logging.info(f"{emoji('📈' if variacao_percentual >= 0 else '📉', '['+resultado+']')} Resultado: {variacao_percentual:.2f}% ({preco_atual - preco_compra:.2f} USDT)")
+        # Envia resultado para o Discord
+        if CONFIG["discord_enabled"]:
+            emoji_resultado = "📈" if variacao_percentual >= 0 else "📉"
+            mensagem = (
+                f"{emoji_resultado} **Resultado da operação {moeda}**\n"
+                f"{'Lucro' if variacao_percentual >= 0 else 'Prejuízo'}: {variacao_percentual:.2f}%\n"
+                f"Valor: {preco_atual - preco_compra:.2f} USDT"
+            )
+            enviar_discord(mensagem, prioridade=PRIORIDADE_ORDEM)
+    
+    # Salva os dados atualizados
+    salvar_dados(dados)
+    return dados
+
+# Stop-loss e alvo de saída da posição; o alvo é o menor entre o take-profit e a alta semanal +5%
+def limites_saida(dados, moeda):
+    stop_loss = dados["stop_losses"][moeda]
+    alvo, motivo = dados["take_profits"][moeda], "Take-Profit"
+    ultima_alta = dados["ultima_alta_semanal"][moeda]
+    if ultima_alta > 0 and ultima_alta * 1.05 < alvo:
+        alvo, motivo = ultima_alta * 1.05, "Alta Semanal +5%"
+    return stop_loss, alvo, motivo
+
+# Preços da OCO ajustados ao tickSize: (disparo do stop, limite do stop, alvo)
+def precos_oco(stop_loss, alvo, filtros):
+    return (
+        filtros.quantizar_preco(Decimal(repr(stop_loss))),
+        filtros.quantizar_preco(Decimal(repr(stop_loss * (1 - CONFIG["margem_stop_limit"])))),
+        filtros.quantizar_preco(Decimal(repr(alvo)))
+    )
+
+# Quantidade recebida numa compra a mercado (a taxa é descontada do ativo comprado)
+def quantidade_recebida(ordem, moeda_base):
+    total = Decimal(0)
+    for fill in ordem.get("fills", []):
+        total += Decimal(fill["qty"])
+        if fill.get("commissionAsset") == moeda_base:
+            total -= Decimal(fill["commission"])
+    return total if total > 0 else Decimal(ordem.get("executedQty", "0"))
+
+# Quantidade da posição disponível para venda (a protegida por OCO está bloqueada no saldo)
+def quantidade_em_posicao(moeda, saldo, dados):
+    oco = dados["ordens_oco"].get(moeda)
+    if oco:
+        return float(oco["quantidade"])
+    return saldo.get(ativo_base(moeda), 0.0)
+
+# Coloca a OCO de venda da posição; retorna True se a posição ficou protegida na exchange
+def colocar_oco(moeda, quantidade, dados, filtros=None):
+    filtros = filtros or obter_filtros(moeda)
+    if filtros is None:
+        logging.error(f"{emoji('❌', '[ERRO]')} Filtros de {moeda} indisponíveis; OCO não colocada")
+        return False
+    
+    stop_loss, alvo, motivo = limites_saida(dados, moeda)
+    disparo, limite_stop, preco_alvo = precos_oco(stop_loss, alvo, filtros)
+    quantidade = filtros.quantizar_quantidade(Decimal(str(quantidade)))
+    try:
+        resposta = chamar_api_com_retry(
+            cliente_binance.create_oco_order,
+            symbol=moeda,
+            side=SIDE_SELL,
+            quantity=formatar_decimal(quantidade),
+            aboveType="LIMIT_MAKER",
+            abovePrice=formatar_decimal(preco_alvo),
+            belowType="STOP_LOSS_LIMIT",
+            belowStopPrice=formatar_decimal(disparo),
+            belowPrice=formatar_decimal(limite_stop),
+            belowTimeInForce=TIME_IN_FORCE_GTC
+        )
+    except Exception as e:
+        logging.error(f"{emoji('❌', '[ERRO]')} Erro ao colocar OCO de {moeda}: {e}. A posição segue protegida pelo bot.")
+        return False
+    
+    dados["ordens_oco"][moeda] = {
+        "id_lista": resposta["orderListId"],
+        "ordens": [ordem["orderId"] for ordem in resposta["orders"]],
+        "quantidade": formatar_decimal(quantidade),
+        "stop": float(disparo),
+        "alvo": float(preco_alvo),
+        "motivo_alvo": motivo
+    }
+    logging.info(f"{emoji('🛡️', '[OCO]')} OCO de {moeda} colocada: {formatar_decimal(quantidade)} com stop em "
+                 f"{formatar_decimal(disparo)} e {motivo} em {formatar_decimal(preco_alvo)} USDT")
+    return True
+
+# Situação da OCO na exchange: "aberta", "executada" (com a ordem executada) ou "cancelada"
+def consultar_oco(moeda, oco):
+    abertas = chamar_api_com_retry(cliente_binance.get_open_orders, symbol=moeda)
+    if any(ordem.get("orderListId") == oco["id_lista"] for ordem in abertas):
+        return "aberta", None
+    for id_ordem in oco["ordens"]:
+        ordem = chamar_api_com_retry(cliente_binance.get_order, symbol=moeda, orderId=id_ordem)
+        if ordem["status"] == "FILLED":
+            return "executada", ordem
+    return "cancelada", None
+
+# Cancela a OCO da posição; retorna False se ela já havia sido executada (posição encerrada)
+def cancelar_oco(moeda, dados):
+    oco = dados["ordens_oco"].get(moeda)
+    if not oco:
+        return True
+    try:
+        # Cancelar uma perna cancela a lista inteira; sem retry, um erro aqui tem causa definida
+        agendador_api.executar(cliente_binance.cancel_order, symbol=moeda, orderId=oco["ordens"][0])
+    except BinanceAPIException as e:
+        if e.code != -2011:
+            raise
+        # A OCO não está mais aberta: pode ter sido executada desde a última conferência
+        situacao, ordem = consultar_oco(moeda, oco)
+        if situacao == "executada":
+            registrar_saida_oco(moeda, ordem, dados)
+            return False
+    dados["ordens_oco"][moeda] = None
+    logging.info(f"OCO de {moeda} cancelada")
+    return True
+
+# Registra a venda feita pela OCO na exchange
+def registrar_saida_oco(moeda, ordem, dados):
+    oco = dados["ordens_oco"][moeda]
+    quantidade = ordem["executedQty"]
+    preco = float(ordem["cummulativeQuoteQty"]) / float(quantidade)
+    if ordem["type"].startswith("STOP_LOSS"):
+        motivo, icone, referencia = "Stop-Loss", emoji('🔴', '[STOP-LOSS]'), oco["stop"]
+    else:
+        motivo, icone, referencia = oco.get("motivo_alvo", "Take-Profit"), emoji('🟢', '[TAKE-PROFIT]'), oco["alvo"]
+    # Referência é o preço de disparo/alvo; o sinal e o envio aconteceram na exchange
+    execucao = analisar_ordem(ordem, "venda", referencia, ativo_base(moeda), ativo_quote(moeda))
+    logging.info(f"{icone} {motivo} executado pela OCO de {moeda} a {preco:.2f} USDT{descrever_execucao(execucao)}")
+    dados["ordens_oco"][moeda] = None
+    return concluir_venda(moeda, quantidade, preco, dados, motivo=f"{motivo} (OCO)", execucao=execucao)
+
+# Confere as OCOs na exchange: registra as executadas, recoloca as canceladas
+# e substitui as que ficaram com limites diferentes dos atuais (ex.: nova alta semanal)
+def reconciliar_ordens_oco(dados, snapshot):
+    if CONFIG["modo_simulacao"] and not CONFIG["exchange_simulada"]:
+        return dados
+    
+    for moeda in CONFIG["moedas"]:
+        oco = dados["ordens_oco"].get(moeda)
+        try:
+            if not dados["posicoes"][moeda]:
+                # Posição encerrada por fora da OCO (ex.: venda manual): libera o saldo
+                if oco:
+                    cancelar_oco(moeda, dados)
+                continue
             
-            # Envia resultado para o Discord
-            if CONFIG["discord_enabled"]:
-                emoji_resultado = "📈" if variacao_percentual >= 0 else "📉"
-                mensagem = (
-                    f"{emoji_resultado} **Resultado da operação {moeda}**\n"
-                    f"{'Lucro' if variacao_percentual >= 0 else 'Prejuízo'}: {variacao_percentual:.2f}%\n"
-                    f"Valor: {preco_atual - preco_compra:.2f} USDT"
-                )
-                enviar_discord(mensagem)
-        
-        # Salva os dados atualizados
-        salvar_dados(dados)
+            filtros = snapshot.filtros[moeda] or obter_filtros(moeda)
+            if oco:
+                situacao, ordem = consultar_oco(moeda, oco)
+                if situacao == "executada":
+                    dados = registrar_saida_oco(moeda, ordem, dados)
+                    continue
+                if situacao == "aberta":
+                    stop_loss, alvo, _ = limites_saida(dados, moeda)
+                    disparo, _, preco_alvo = precos_oco(stop_loss, alvo, filtros)
+                    if float(disparo) == oco["stop"] and float(preco_alvo) == oco["alvo"]:
+                        continue
+                    logging.info(f"Limites de saída de {moeda} mudaram: substituindo a OCO")
+                    if not cancelar_oco(moeda, dados):
+                        continue
+                else:
+                    logging.warning(f"OCO de {moeda} cancelada fora do bot: colocando uma nova")
+                    dados["ordens_oco"][moeda] = None
+                quantidade = oco["quantidade"]
+            elif CONFIG["ordens_oco"]:
+                # Posição sem proteção (aberta antes da opção ou após falha ao colocar a OCO)
+                quantidade = snapshot.saldo.get(ativo_base(moeda), 0.0)
+            else:
+                continue
+            
+            colocar_oco(moeda, quantidade, dados, filtros)
+        except Exception as e:
+            logging.error(f"{emoji('❌', '[ERRO]')} Erro ao conferir a OCO de {moeda}: {e}")
+            logging.debug(traceback.format_exc())
     
-    return sucesso, dados
+    salvar_dados(dados)
+    return dados
 
-def verificar_stop_loss_take_profit(dados):
-    precos = pegar_precos()
-    saldo = pegar_saldo()
+def verificar_stop_loss_take_profit(dados, snapshot):
+    precos = snapshot.precos
+    saldo = snapshot.saldo
     
     for moeda in CONFIG["moedas"]:
-        moeda_base = moeda.replace("USDT", "")
+        moeda_base = ativo_base(moeda)
         
-        # Verifica se está em posição
-        if dados["posicoes"][moeda]:
+        # Verifica se está em posição (as protegidas por OCO saem pela própria exchange)
+        if dados["posicoes"][moeda] and not dados["ordens_oco"].get(moeda):
             preco_atual = precos[moeda]
             preco_compra = dados["precos_compra"][moeda]
             stop_loss = dados["stop_losses"][moeda]
@@ -600,11 +1010,12 @@ def verificar_stop_loss_take_profit(dados):
             
             # Verifica se o preço atual está abaixo do stop-loss
             if preco_atual <= stop_loss:
+                tempo_sinal = agora_ms()
                 logging.info(f"{emoji('🔴', '[STOP-LOSS]')} Stop-Loss atingido para {moeda} a {preco_atual:.2f} USDT")
                 
                 # Calcula a quantidade disponível para venda
-                quantidade = saldo[moeda_base]
-                quantidade_ajustada = ajustar_quantidade(moeda, quantidade, quantidade, preco_atual)
+                quantidade = saldo.get(moeda_base, 0.0)
+                quantidade_ajustada = ajustar_quantidade(moeda, quantidade, quantidade * preco_atual, preco_atual, snapshot.filtros[moeda])
                 
                 if float(quantidade_ajustada) > 0:
                     # Executa a venda
@@ -613,7 +1024,8 @@ def verificar_stop_loss_take_profit(dados):
                         quantidade_ajustada, 
                         preco_atual, 
                         dados, 
-                        motivo="Stop-Loss"
+                        motivo="Stop-Loss",
+                        tempo_sinal=tempo_sinal
                     )
             
             # Verifica se o preço atual está acima do take-profit
@@ -622,11 +1034,12 @@ def verificar_stop_loss_take_profit(dados):
                   (ultima_alta > 0 and preco_atual >= ultima_alta * 1.05)):
                 
                 motivo = "Take-Profit" if preco_atual >= take_profit else "Alta Semanal +5%"
+                tempo_sinal = agora_ms()
                 logging.info(f"{emoji('🟢', '[TAKE-PROFIT]')} {motivo} atingido para {moeda} a {preco_atual:.2f} USDT")
                 
                 # Calcula a quantidade disponível para venda
-                quantidade = saldo[moeda_base]
-                quantidade_ajustada = ajustar_quantidade(moeda, quantidade, quantidade, preco_atual)
+                quantidade = saldo.get(moeda_base, 0.0)
+                quantidade_ajustada = ajustar_quantidade(moeda, quantidade, quantidade * preco_atual, preco_atual, snapshot.filtros[moeda])
                 
                 if float(quantidade_ajustada) > 0:
                     # Executa a venda
@@ -635,7 +1048,8 @@ def verificar_stop_loss_take_profit(dados):
                         quantidade_ajustada, 
                         preco_atual, 
                         dados, 
-                        motivo=motivo
+                        motivo=motivo,
+                        tempo_sinal=tempo_sinal
                     )
             
             # Verifica se está próximo do stop-loss ou take-profit para alertar
@@ -646,25 +1060,23 @@ def verificar_stop_loss_take_profit(dados):
                 diff_sl = (preco_atual - stop_loss) / preco_atual
                 if 0 < diff_sl <= percentual_alerta:
                     mensagem = f"⚠️ **Alerta de proximidade de Stop-Loss**\n{moeda} está a {diff_sl*100:.2f}% do Stop-Loss ({stop_loss:.2f} USDT). Preço atual: {preco_atual:.2f} USDT"
-                    enviar_discord(mensagem)
+                    enviar_discord(mensagem, prioridade=PRIORIDADE_ALERTA, chave=("proximidade_stop_loss", moeda))
                 
                 # Verifica proximidade do take-profit
                 diff_tp = (take_profit - preco_atual) / preco_atual
                 if 0 < diff_tp <= percentual_alerta:
                     mensagem = f"📈 **Alerta de proximidade de Take-Profit**\n{moeda} está a {diff_tp*100:.2f}% do Take-Profit ({take_profit:.2f} USDT). Preço atual: {preco_atual:.2f} USDT"
-                    enviar_discord(mensagem)
+                    enviar_discord(mensagem, prioridade=PRIORIDADE_ALERTA, chave=("proximidade_take_profit", moeda))
     
     return dados
 
-def verificar_sinais_venda(dados):
+def verificar_sinais_venda(dados, snapshot):
     for moeda in CONFIG["moedas"]:
         # Verifica se está em posição
         if dados["posicoes"][moeda]:
-            df = pegar_dados(moeda)
+            df = snapshot.indicadores[moeda]
             if df.empty:
                 continue
-                
-            df = calcular_indicadores(df)
             
             # Verifica cruzamento de médias para baixo
             cruzou_para_baixo = (df["media_curta"].iloc[-2] >= df["media_longa"].iloc[-2] and 
@@ -676,16 +1088,17 @@ def verificar_sinais_venda(dados):
                 rsi_sobrecompra = df['rsi'].iloc[-1] > CONFIG["limite_rsi_sobrecompra"]
             
             if cruzou_para_baixo:
+                tempo_sinal = agora_ms()
                 logging.info(f"{emoji('🔴', '[VENDA]')} Sinal de venda detectado para {moeda} (cruzamento de médias para baixo)")
                 
-                # Obtém saldo e preço atual
-                saldo = pegar_saldo()
-                moeda_base = moeda.replace("USDT", "")
-                preco_atual = float(cliente_binance.get_symbol_ticker(symbol=moeda)['price'])
+                # Saldo e preço atual do snapshot do ciclo
+                saldo = snapshot.saldo
+                moeda_base = ativo_base(moeda)
+                preco_atual = snapshot.precos[moeda]
                 
                 # Calcula a quantidade disponível para venda
-                quantidade = saldo[moeda_base]
-                quantidade_ajustada = ajustar_quantidade(moeda, quantidade, quantidade, preco_atual)
+                quantidade = quantidade_em_posicao(moeda, saldo, dados)
+                quantidade_ajustada = ajustar_quantidade(moeda, quantidade, quantidade * preco_atual, preco_atual, snapshot.filtros[moeda])
                 
                 if float(quantidade_ajustada) > 0:
                     # Executa a venda
@@ -694,20 +1107,22 @@ def verificar_sinais_venda(dados):
                         quantidade_ajustada, 
                         preco_atual, 
                         dados, 
-                        motivo="Cruzamento de médias para baixo"
+                        motivo="Cruzamento de médias para baixo",
+                        tempo_sinal=tempo_sinal
                     )
             
             elif rsi_sobrecompra:
+                tempo_sinal = agora_ms()
                 logging.info(f"{emoji('🔴', '[VENDA]')} Sinal de venda detectado para {moeda} (RSI em sobrecompra: {df['rsi'].iloc[-1]:.2f})")
                 
-                # Obtém saldo e preço atual
-                saldo = pegar_saldo()
-                moeda_base = moeda.replace("USDT", "")
-                preco_atual = float(cliente_binance.get_symbol_ticker(symbol=moeda)['price'])
+                # Saldo e preço atual do snapshot do ciclo
+                saldo = snapshot.saldo
+                moeda_base = ativo_base(moeda)
+                preco_atual = snapshot.precos[moeda]
                 
                 # Calcula a quantidade disponível para venda
-                quantidade = saldo[moeda_base]
-                quantidade_ajustada = ajustar_quantidade(moeda, quantidade, quantidade, preco_atual)
+                quantidade = quantidade_em_posicao(moeda, saldo, dados)
+                quantidade_ajustada = ajustar_quantidade(moeda, quantidade, quantidade * preco_atual, preco_atual, snapshot.filtros[moeda])
                 
                 if float(quantidade_ajustada) > 0:
                     # Executa a venda
@@ -716,12 +1131,13 @@ def verificar_sinais_venda(dados):
                         quantidade_ajustada, 
                         preco_atual, 
                         dados, 
-                        motivo="RSI em sobrecompra"
+                        motivo="RSI em sobrecompra",
+                        tempo_sinal=tempo_sinal
                     )
     
     return dados
 
-def executar_estrategia_balanceada(dados, saldo_usdt):
+def executar_estrategia_balanceada(dados, saldo_usdt, snapshot):
     # Calcula o saldo disponível para cada moeda
     moedas_disponiveis = [m for m in CONFIG["moedas"] if not dados["posicoes"][m]]
     
@@ -738,13 +1154,12 @@ def executar_estrategia_balanceada(dados, saldo_usdt):
         if dados["posicoes"][moeda]:
             continue
         
-        # Obtém dados e calcula indicadores
-        df = pegar_dados(moeda)
+        # Candles com indicadores e preço atual do snapshot do ciclo
+        df = snapshot.indicadores[moeda]
         if df.empty:
             continue
             
-        df = calcular_indicadores(df)
-        preco_atual = float(cliente_binance.get_symbol_ticker(symbol=moeda)['price'])
+        preco_atual = snapshot.precos[moeda]
         
         logging.info(f"{moeda} - Média {CONFIG['janela_media_curta']}: {df['media_curta'].iloc[-1]:.2f} | " +
                     f"Média {CONFIG['janela_media_longa']}: {df['media_longa'].iloc[-1]:.2f}")
@@ -765,11 +1180,12 @@ def executar_estrategia_balanceada(dados, saldo_usdt):
             sinal_compra = sinal_compra and (rsi_sobrevenda or df['rsi'].iloc[-1] < 50)
         
         if sinal_compra:
+            tempo_sinal = agora_ms()
             logging.info(f"{emoji('🟢', '[COMPRA]')} Sinal de compra detectado para {moeda}!")
             
             # Calcula a quantidade a ser comprada
             quantidade = saldo_por_moeda / preco_atual
-            quantidade_ajustada = ajustar_quantidade(moeda, quantidade, saldo_por_moeda, preco_atual)
+            quantidade_ajustada = ajustar_quantidade(moeda, quantidade, saldo_por_moeda, preco_atual, snapshot.filtros[moeda])
             
             if float(quantidade_ajustada) > 0:
                 # Executa a compra
@@ -779,7 +1195,8 @@ def executar_estrategia_balanceada(dados, saldo_usdt):
                     preco_atual, 
                     dados, 
                     motivo="Cruzamento de médias para cima" + 
-                           (" e RSI em sobrevenda" if rsi_sobrevenda else "")
+                           (" e RSI em sobrevenda" if rsi_sobrevenda else ""),
+                    tempo_sinal=tempo_sinal
                 )
                 
                 if sucesso:
@@ -787,10 +1204,6 @@ def executar_estrategia_balanceada(dados, saldo_usdt):
             else:
                 logging.info(f"Valor de {saldo_por_moeda:.2f} USDT abaixo do mínimo para {moeda}")
         
-        # Gera o gráfico com os indicadores
-        grafico_path = mostrar_grafico(df, moeda)
-        if grafico_path:
-            logging.info(f"Gráfico gerado com sucesso: {grafico_path}")
     
     if compras_realizadas == 0:
         logging.info("Nenhum sinal de compra válido detectado neste ciclo.")
@@ -799,18 +1212,16 @@ def executar_estrategia_balanceada(dados, saldo_usdt):
     
     return dados
 
-def mostrar_resumo_operacoes(dados):
-    operacoes = dados.get("historico_operacoes", [])
-    if not operacoes:
+# Lê do estado gravado: deve ser chamada depois de salvar_dados
+def mostrar_resumo_operacoes():
+    totais = estado_bot.totais_operacoes()
+    if not totais:
         logging.info("Nenhuma operação registrada ainda.")
         return
     
-    # Filtra operações das últimas 24 horas
-    agora = datetime.now()
-    operacoes_recentes = [
-        op for op in operacoes 
-        if (agora - datetime.strptime(op["timestamp"], "%Y-%m-%d %H:%M:%S")).total_seconds() < 24*60*60
-    ]
+    # Operações das últimas 24 horas (consulta pelo índice de timestamp)
+    inicio = (datetime.now() - timedelta(hours=24)).strftime("%Y-%m-%d %H:%M:%S")
+    operacoes_recentes = estado_bot.operacoes_desde(inicio)
     
     if operacoes_recentes:
         logging.info(f"{emoji('📋', '[RESUMO]')} Operações nas últimas 24 horas: {len(operacoes_recentes)}")
@@ -819,106 +1230,260 @@ def mostrar_resumo_operacoes(dados):
             logging.info(f"{tipo_emoji} {op['timestamp']} - {op['tipo'].upper()} {op['quantidade']} {op['moeda']} a {op['preco']:.2f} USDT ({op['motivo']})")
     
     # Calcula resultado total
-    compras = [op for op in operacoes if op["tipo"] == "compra"]
-    vendas = [op for op in operacoes if op["tipo"] == "venda"]
-    
-    total_compras = sum(op["valor_total"] for op in compras)
-    total_vendas = sum(op["valor_total"] for op in vendas)
+    total_compras = totais.get("compra", (0, 0.0))[1]
+    total_vendas = totais.get("venda", (0, 0.0))[1]
     
     if total_compras > 0:
         resultado = ((total_vendas - total_compras) / total_compras) * 100
         logging.info(f"{emoji('💰', '[RESULTADO]')} Resultado total: {resultado:.2f}% ({total_vendas - total_compras:.2f} USDT)")
+    
+    # Qualidade de execução por moeda (operações que registraram tempos e preço médio)
+    for moeda, estatisticas in estatisticas_execucao(estado_bot.execucoes()).items():
+        partes = []
+        for chave, rotulo, unidade in (("latencia_ms", "latência", "ms"), ("ida_e_volta_ms", "ida e volta", "ms"),
+                                       ("slippage_bps", "slippage", "bps")):
+            percentis = estatisticas[chave]
+            if percentis:
+                partes.append(f"{rotulo} " + "/".join(f"{v:.1f}" for v in percentis.values()) + f" {unidade}")
+        logging.info(f"{emoji('⏱️', '[EXECUCAO]')} {moeda}: {estatisticas['ordens']} ordem(ns), p50/p95/p99 "
+                     f"{' | '.join(partes) or 'sem medidas'} | taxas {estatisticas['taxas_quote']:.4f} USDT")
+
+def construir_snapshot_ciclo():
+    return construir_snapshot(
+        CONFIG["moedas"],
+        pegar_saldo,
+        pegar_precos,
+        pegar_dados,
+        calcular_indicadores,
+        obter_filtros,
+        limite_candles=168,  # Maior janela do ciclo: alta semanal (7 dias * 24 horas)
+        limite_indicadores=100,
+        max_concorrencia=CONFIG["max_requisicoes_simultaneas"],
+        medir_etapa=etapa_ciclo
+    )
+
+# Gera um novo snapshot com saldos atualizados se alguma ordem foi executada na etapa
+def renovar_snapshot_apos_ordens(snapshot, dados, operacoes_antes):
+    if len(dados.get("historico_operacoes", [])) == operacoes_antes:
+        return snapshot
+    logging.info("Ordem executada: atualizando saldos do snapshot do ciclo")
+    return snapshot.com_saldo(*pegar_saldo())
 
 def executar_ciclo():
+    global saldo_ultimo_ciclo
+    # Impede que o monitor em tempo real venda enquanto o ciclo altera os mesmos dados
+    trava_dados.acquire()
+    inicio_ciclo = time.perf_counter()
+    metrica_simbolos.definir(len(CONFIG["moedas"]))
+    if perfil_ciclo is not None:
+        perfil_ciclo.iniciar_ciclo()
     try:
         # Carrega dados salvos
-        dados_salvos = carregar_dados()
-        
-        # Obtém saldo e preços atuais
-        saldo = pegar_saldo()
-        precos = pegar_precos()
+        with etapa_ciclo("carregar_estado"):
+            dados_salvos = carregar_dados()
         
-        # Calcula valor total em USDT
-        total_usdt = saldo["USDT"]
-        for moeda in CONFIG["moedas"]:
-            moeda_base = moeda.replace("USDT", "")
-            total_usdt += saldo[moeda_base] * precos[moeda]
+        # Busca saldo, preços, candles e filtros uma única vez para todo o ciclo
+        # (etapas "coleta_dados" e "indicadores")
+        snapshot = construir_snapshot_ciclo()
+        # Saldos totais: as posições protegidas por OCO ficam bloqueadas e continuam no patrimônio
+        saldo = snapshot.saldo_total
         
-        # Exibe resumo do saldo
-        logging.info(f"{emoji('📊', '[RESUMO]')} Resumo do saldo:")
-        logging.info(f"USDT: {saldo['USDT']:.2f}")
-        for moeda in CONFIG["moedas"]:
-            moeda_base = moeda.replace("USDT", "")
-            logging.info(f"{moeda_base}: {saldo[moeda_base]} (aprox. {saldo[moeda_base] * precos[moeda]:.2f} USDT)")
-        logging.info(f"Total estimado em USDT: {total_usdt:.2f}")
-        
-        # Atualiza histórico de patrimônio
-        dados_salvos = atualizar_historico(dados_salvos)
-        
-        # Mostra valorização
-        variacao_24h, variacao_7d = mostrar_valorizacao(dados_salvos)
-        
-        # Envia resumo para o Discord
-        if CONFIG["discord_enabled"]:
-            mensagem = (
-                f"📊 **Resumo do Saldo**\n"
-                f"💰 Total: {total_usdt:.2f} USDT\n"
-            )
+        with etapa_ciclo("patrimonio"):
+            # Valor de cada ativo da conta e total em USDT
+            avaliacao = avaliar_carteira(snapshot)
+            total_usdt = avaliacao.total
             
-            for moeda in CONFIG["moedas"]:
-                moeda_base = moeda.replace("USDT", "")
-                mensagem += f"{moeda_base}: {saldo[moeda_base]} (≈ {saldo[moeda_base] * precos[moeda]:.2f} USDT)\n"
-            
-            if variacao_24h is not None:
-                mensagem += f"📈 Valorização 24h: {variacao_24h:.2f}%\n"
+            # Exibe resumo do saldo
+            logging.info(f"{emoji('📊', '[RESUMO]')} Resumo do saldo:")
+            logging.info(f"USDT: {saldo.get('USDT', 0.0):.2f}")
+            for ativo, valor in avaliacao.maiores():
+                if ativo != "USDT":
+                    logging.info(f"{ativo}: {saldo[ativo]} (aprox. {valor:.2f} USDT)")
+            logging.info(f"Total estimado em USDT: {total_usdt:.2f}")
             
-            if variacao_7d is not None:
-                mensagem += f"📊 Valorização 7d: {variacao_7d:.2f}%\n"
+            # Atualiza histórico de patrimônio
+            dados_salvos = atualizar_historico(dados_salvos, snapshot, avaliacao)
             
-            enviar_discord(mensagem)
+            # Mostra valorização
+            variacoes = mostrar_valorizacao()
+        
+        # Envia resumo para o Discord
+        if CONFIG["discord_enabled"]:
+            with etapa_ciclo("discord"):
+                mensagem = (
+                    f"📊 **Resumo do Saldo**\n"
+                    f"💰 Total: {total_usdt:.2f} USDT\n"
+                )
+                
+                # Maiores posições primeiro; contas com centenas de ativos não cabem numa mensagem
+                maiores = [(ativo, valor) for ativo, valor in avaliacao.maiores() if ativo != "USDT"]
+                for ativo, valor in maiores[:CONFIG["ativos_resumo_discord"]]:
+                    mensagem += f"{ativo}: {saldo[ativo]} (≈ {valor:.2f} USDT)\n"
+                if len(maiores) > CONFIG["ativos_resumo_discord"]:
+                    mensagem += f"… e mais {len(maiores) - CONFIG['ativos_resumo_discord']} ativo(s)\n"
+                if avaliacao.sem_preco:
+                    mensagem += f"⚠️ Sem preço em USDT (fora do total): {', '.join(avaliacao.sem_preco)}\n"
+                
+                for periodo, variacao in variacoes.items():
+                    if variacao is not None:
+                        mensagem += f"📈 Valorização {periodo}: {variacao:.2f}%\n"
+                
+                enviar_discord(mensagem, prioridade=PRIORIDADE_RESUMO)
         
         # Atualiza última alta semanal
-        dados_salvos = atualizar_ultima_alta_semanal(dados_salvos)
+        with etapa_ciclo("alta_semanal"):
+            dados_salvos = atualizar_ultima_alta_semanal(dados_salvos, snapshot)
+        
+        # Confere as OCOs de proteção na exchange (executadas, canceladas ou com limites desatualizados)
+        with etapa_ciclo("ordens_oco"):
+            operacoes_antes = len(dados_salvos["historico_operacoes"])
+            dados_salvos = reconciliar_ordens_oco(dados_salvos, snapshot)
+            snapshot = renovar_snapshot_apos_ordens(snapshot, dados_salvos, operacoes_antes)
         
         # Verifica stop-loss e take-profit
-        dados_salvos = verificar_stop_loss_take_profit(dados_salvos)
+        with etapa_ciclo("stops"):
+            operacoes_antes = len(dados_salvos["historico_operacoes"])
+            dados_salvos = verificar_stop_loss_take_profit(dados_salvos, snapshot)
+            snapshot = renovar_snapshot_apos_ordens(snapshot, dados_salvos, operacoes_antes)
         
         # Verifica sinais de venda
-        dados_salvos = verificar_sinais_venda(dados_salvos)
+        with etapa_ciclo("sinais_venda"):
+            operacoes_antes = len(dados_salvos["historico_operacoes"])
+            dados_salvos = verificar_sinais_venda(dados_salvos, snapshot)
+            snapshot = renovar_snapshot_apos_ordens(snapshot, dados_salvos, operacoes_antes)
         
         # Executa estratégia de compra se tiver saldo suficiente
-        if saldo['USDT'] > CONFIG["saldo_minimo_usdt"]:
-            dados_salvos = executar_estrategia_balanceada(dados_salvos, saldo['USDT'])
-        
-        # Mostra resumo das operações
-        mostrar_resumo_operacoes(dados_salvos)
+        saldo_usdt = snapshot.saldo.get('USDT', 0.0)
+        if saldo_usdt > CONFIG["saldo_minimo_usdt"]:
+            with etapa_ciclo("compras"):
+                operacoes_antes = len(dados_salvos["historico_operacoes"])
+                dados_salvos = executar_estrategia_balanceada(dados_salvos, saldo_usdt, snapshot)
+                # O monitor em tempo real vende a partir destes saldos se a OCO da compra falhar
+                snapshot = renovar_snapshot_apos_ordens(snapshot, dados_salvos, operacoes_antes)
         
         # Salva dados atualizados
-        salvar_dados(dados_salvos)
+        with etapa_ciclo("persistencia"):
+            salvar_dados(dados_salvos)
         
-        # Gera gráficos para todas as moedas
-        for moeda in CONFIG["moedas"]:
-            df = pegar_dados(moeda)
-            if not df.empty:
-                df = calcular_indicadores(df)
-                grafico_path = mostrar_grafico(df, moeda)
-                logging.info(f"Gráfico gerado para {moeda}: {grafico_path}")
+        # Mostra resumo das operações (já com as do ciclo, lidas do estado gravado)
+        with etapa_ciclo("resumo_operacoes"):
+            mostrar_resumo_operacoes()
+        
+        # Agenda os gráficos de todas as moedas (desenhados em segundo plano)
+        with etapa_ciclo("graficos"):
+            for moeda in CONFIG["moedas"]:
+                df = snapshot.indicadores[moeda]
+                if not df.empty:
+                    mostrar_grafico(df, moeda, dados_salvos)
+            # No modo de perfilamento o desenho em segundo plano entra no tempo da etapa
+            if perfil_ciclo is not None:
+                renderizador_graficos.aguardar(timeout=120)
+        
+        # Atualiza os limites avaliados pelo monitor em tempo real
+        saldo_ultimo_ciclo = dict(snapshot.saldo)
+        sincronizar_motor_stops(dados_salvos)
         
+        uso_api = agendador_api.estatisticas()
+        logging.info(f"Peso da API no minuto: {uso_api['peso_usado']}/{uso_api['peso_limite']} "
+                     f"({uso_api['uso_percentual']:.1f}%), fila: {uso_api['fila']}")
+        
+        metrica_ciclos.inc(resultado="ok")
         logging.info(f"{emoji('✅', '[OK]')} Ciclo de verificação concluído")
         return True
     except Exception as e:
+        metrica_ciclos.inc(resultado="erro")
         logging.error(f"{emoji('❌', '[ERRO]')} Erro durante o ciclo de verificação: {e}")
         logging.error(traceback.format_exc())
         return False
+    finally:
+        metrica_ciclo.observar(time.perf_counter() - inicio_ciclo)
+        if perfil_ciclo is not None:
+            perfil_ciclo.finalizar_ciclo()
+        trava_dados.release()
+
+# Arma no motor os limites das posições abertas e desarma as encerradas
+# e as protegidas por OCO, que a própria exchange executa
+def sincronizar_motor_stops(dados):
+    if motor_stops is None:
+        return
+    for moeda in CONFIG["moedas"]:
+        if dados["posicoes"][moeda] and not dados["ordens_oco"].get(moeda):
+            motor_stops.definir(
+                moeda,
+                dados["stop_losses"][moeda],
+                dados["take_profits"][moeda],
+                dados["ultima_alta_semanal"][moeda]
+            )
+        else:
+            motor_stops.remover(moeda)
+
+# Executa a venda disparada pelo monitor em tempo real
+def vender_por_gatilho(moeda, preco_atual, motivo):
+    # O sinal é o tick do monitor; a espera pela trava entra na latência
+    tempo_sinal = agora_ms()
+    with trava_dados:
+        dados = carregar_dados()
+        # Com OCO aberta a saída fica a cargo da exchange
+        if not dados["posicoes"][moeda] or dados["ordens_oco"].get(moeda):
+            return
+        
+        icone = emoji('🔴', '[STOP-LOSS]') if motivo == "Stop-Loss" else emoji('🟢', '[TAKE-PROFIT]')
+        logging.info(f"{icone} {motivo} atingido para {moeda} a {preco_atual:.2f} USDT (tempo real)")
+        
+        # Saldo do snapshot do último ciclo: uma consulta à conta (peso 20) por tick esgotaria o peso da API
+        quantidade = saldo_ultimo_ciclo.get(ativo_base(moeda), 0.0)
+        quantidade_ajustada = ajustar_quantidade(moeda, quantidade, quantidade * preco_atual, preco_atual)
+        
+        if float(quantidade_ajustada) > 0:
+            sucesso, dados = executar_venda(moeda, quantidade_ajustada, preco_atual, dados, motivo=motivo,
+                                            tempo_sinal=tempo_sinal)
+        else:
+            sucesso = False
+        
+        # Sem venda (poeira, posição fechada à mão ou erro) o símbolo fica desarmado até o próximo
+        # ciclo; rearmar agora faria o tick seguinte disparar de novo com o preço ainda além do limite
+        if not sucesso:
+            logging.warning(f"{motivo} de {moeda} não executado; o monitor volta a avaliar o símbolo no próximo ciclo")
+
+def iniciar_monitor_tempo_real():
+    global motor_stops
+    
+    if not CONFIG["monitor_tempo_real"] or motor_stops is not None:
+        return
+    
+    try:
+        motor_stops = MotorStopTakeProfit(vender_por_gatilho)
+        sincronizar_motor_stops(carregar_dados())
+        if isinstance(cliente_binance, ExchangeSimulada):
+            fonte = FonteSimulada(cliente_binance, CONFIG["moedas"])
+        else:
+            fonte = FonteBinance(CONFIG["moedas"], api_key, secret_key, tipo=CONFIG["fonte_precos_tempo_real"])
+        motor_stops.iniciar(fonte)
+        logging.info(f"{emoji('✅', '[OK]')} Monitor de stop-loss/take-profit em tempo real iniciado")
+    except Exception as e:
+        logging.error(f"{emoji('❌', '[ERRO]')} Erro ao iniciar monitor em tempo real: {e}")
+        logging.error(traceback.format_exc())
+        motor_stops = None
+
+# Expõe as métricas do módulo em /metrics (uma vez por processo)
+def iniciar_metricas():
+    global servidor_metricas
+    if servidor_metricas is None:
+        servidor_metricas = iniciar_servidor_metricas(CONFIG["porta_metricas"])
 
 def iniciar_bot():
     logging.info(f"{emoji('🤖', '[BOT]')} Iniciando Bot de Trading de Criptomoedas")
     logging.info(f"Modo de simulação: {'ATIVADO' if CONFIG['modo_simulacao'] else 'DESATIVADO'}")
+    logging.info(f"Exchange simulada: {'ATIVADA' if CONFIG['exchange_simulada'] else 'DESATIVADA'}")
     logging.info(f"Moedas monitoradas: {', '.join(CONFIG['moedas'])}")
     
     # Cria pastas necessárias
     os.makedirs(CONFIG["pasta_graficos"], exist_ok=True)
     
+    iniciar_metricas()
+    iniciar_perfil()
+    inicializar_estado()
+    
     # Inicializa a conexão com a Binance
     if not inicializar_binance():
         logging.error("Falha ao inicializar conexão com a Binance. Encerrando.")
@@ -929,22 +1494,46 @@ def iniciar_bot():
 
 # Função para execução contínua (usada pelo main.py)
 def executar_continuamente():
+    # Stop-loss e take-profit passam a ser avaliados a cada tick entre os ciclos
+    iniciar_monitor_tempo_real()
+    
+    # Os ciclos acompanham as viradas de candle em vez de um intervalo fixo após cada ciclo
+    agendador_ciclos = AgendadorCiclos(
+        CONFIG["intervalos_ciclo"] or [CONFIG["periodo_candle"]],
+        atraso=CONFIG["atraso_fechamento_candle"],
+        ao_atrasar=CONFIG["ciclos_atrasados"],
+        relogio=agora_ms,
+        dormir=aguardar
+    )
+    
     try:
         while True:
             executar_ciclo()
             
-            # Aguarda até o próximo ciclo
-            logging.info(f"{emoji('⏳', '[AGUARDANDO]')} Aguardando {CONFIG['intervalo_verificacao'] // 60} minutos até o próximo ciclo...")
-            time.sleep(CONFIG['intervalo_verificacao'])
+            # Aguarda o fechamento do próximo candle
+            logging.info(f"{emoji('⏳', '[AGUARDANDO]')} Aguardando o fechamento do próximo candle...")
+            fechados = agendador_ciclos.aguardar()
+            logging.info(f"Candle(s) fechado(s): {', '.join(fechados)}")
     except KeyboardInterrupt:
         logging.info(f"{emoji('👋', '[ENCERRADO]')} Bot encerrado pelo usuário")
     except Exception as e:
         logging.error(f"{emoji('❌', '[ERRO FATAL]')} Erro fatal: {e}")
         logging.error(traceback.format_exc())
         return False
+    finally:
+        if motor_stops is not None:
+            motor_stops.parar()
     return True
 
 # Para execução direta deste módulo
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Bot de trading de criptomoedas")
+    parser.add_argument("--perfil", nargs="?", const="1", default=None,
+                        help="Perfila cada etapa do ciclo: tempo (padrão), cprofile, tracemalloc ou tudo, "
+                             f"separados por vírgula. Equivale à variável {VARIAVEL_AMBIENTE}.")
+    argumentos = parser.parse_args()
+    if argumentos.perfil is not None:
+        CONFIG["perfil_ciclo"] = argumentos.perfil
     iniciar_bot()
     executar_continuamente()
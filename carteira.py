@@ -0,0 +1,185 @@
+# carteira.py - avaliação vetorizada do patrimônio em uma moeda de referência (USDT)
+
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+MOEDA_AVALIACAO = "USDT"
+
+# Stablecoins de dólar avaliadas 1:1 quando não há par direto com a moeda de avaliação
+ESTAVEIS = ("USDT", "USDC", "FDUSD", "TUSD", "BUSD", "DAI", "USDP")
+
+# Ativos de cotação reconhecidos no fim dos símbolos (os mais longos são testados antes)
+QUOTES_CONHECIDAS = ESTAVEIS + ("BTC", "ETH", "BNB", "EUR", "BRL", "TRY", "JPY")
+
+# Intermediárias preferidas quando o ativo não tem par com a moeda de avaliação
+INTERMEDIARIAS = ("BTC", "ETH", "BNB")
+
+# Ativos informados pelo exchangeInfo, usados antes da separação pelo sufixo
+_simbolos_registrados: Dict[str, Tuple[str, str]] = {}
+
+
+def registrar_simbolo(symbol: str, base: str, quote: str) -> None:
+    """Registra base/quote de um símbolo vindos do exchangeInfo (ex.: dos filtros)."""
+    if base and quote and _simbolos_registrados.get(symbol) != (base, quote):
+        _simbolos_registrados[symbol] = (base, quote)
+        separar_simbolo.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def separar_simbolo(symbol: str) -> Optional[Tuple[str, str]]:
+    """(base, quote) de um símbolo da Binance, ex.: "ETHBTC" -> ("ETH", "BTC"); None se não reconhecido."""
+    if symbol in _simbolos_registrados:
+        return _simbolos_registrados[symbol]
+    for quote in sorted(QUOTES_CONHECIDAS, key=len, reverse=True):
+        if symbol.endswith(quote) and len(symbol) > len(quote):
+            return symbol[:-len(quote)], quote
+    return None
+
+
+@dataclass(frozen=True)
+class AvaliacaoCarteira:
+    """Resultado de uma avaliação: total e valor de cada ativo na moeda de avaliação.
+
+    `sem_preco` lista os ativos sem caminho de conversão ou com preço zero;
+    eles valem zero em `valores` e ficam fora do total e de `maiores`.
+    """
+    moeda: str
+    total: float
+    valores: Mapping[str, float]
+    sem_preco: Tuple[str, ...]
+
+    def maiores(self, quantidade: Optional[int] = None, minimo: float = 0.0) -> List[Tuple[str, float]]:
+        """Ativos com valor ordenados do maior para o menor, ignorando os abaixo de `minimo`."""
+        itens = sorted(((ativo, valor) for ativo, valor in self.valores.items() if valor > 0 and valor >= minimo),
+                       key=lambda item: item[1], reverse=True)
+        return itens if quantidade is None else itens[:quantidade]
+
+
+@dataclass(frozen=True)
+class _PlanoAvaliacao:
+    """Caminho de conversão de cada ativo como até duas pernas sobre o vetor de preços.
+
+    Os índices apontam para o vetor de preços acrescido de duas posições:
+    `identidade` (1.0, perna vazia) e `sem_caminho` (0.0, ativo sem preço).
+    """
+    perna1: np.ndarray
+    inverso1: np.ndarray
+    perna2: np.ndarray
+    inverso2: np.ndarray
+
+
+class AvaliadorCarteira:
+    """Avalia saldos de qualquer ativo em `moeda` a partir de um snapshot de preços.
+
+    Cada ativo recebe um caminho de conversão, na ordem de preferência: a
+    própria moeda, par direto (ATIVOUSDT), par invertido (USDTATIVO),
+    stablecoin 1:1, ou duas pernas por uma intermediária (ATIVOBTC x BTCUSDT,
+    preferindo INTERMEDIARIAS e depois qualquer quote com preço em `moeda`).
+    O plano só é recalculado quando mudam os ativos ou os símbolos com
+    preço; a avaliação em si é uma única passada vetorizada.
+    """
+
+    def __init__(self, moeda: str = MOEDA_AVALIACAO, estaveis: Iterable[str] = ESTAVEIS,
+                 intermediarias: Iterable[str] = INTERMEDIARIAS):
+        self.moeda = moeda
+        self.estaveis = frozenset(estaveis)
+        self.intermediarias = tuple(intermediarias)
+        self._trava = threading.Lock()
+        self._plano: Optional[Tuple[tuple, _PlanoAvaliacao]] = None
+
+    def simbolos_necessarios(self, simbolos: Iterable[str]) -> List[str]:
+        """Pares com `moeda` necessários para avaliar os quotes de `simbolos` (ex.: BTCUSDT para ETHBTC)."""
+        necessarios = []
+        for symbol in simbolos:
+            partes = separar_simbolo(symbol)
+            if partes is None:
+                continue
+            quote = partes[1]
+            par = f"{quote}{self.moeda}"
+            if quote != self.moeda and quote not in self.estaveis and par not in necessarios:
+                necessarios.append(par)
+        return necessarios
+
+    def _montar_plano(self, ativos: Tuple[str, ...], simbolos: Tuple[str, ...]) -> _PlanoAvaliacao:
+        indices = {symbol: i for i, symbol in enumerate(simbolos)}
+        identidade, sem_caminho = len(simbolos), len(simbolos) + 1
+        moeda = self.moeda
+
+        def perna_direta(ativo: str) -> Optional[Tuple[int, bool]]:
+            if ativo == moeda:
+                return identidade, False
+            if f"{ativo}{moeda}" in indices:
+                return indices[f"{ativo}{moeda}"], False
+            if f"{moeda}{ativo}" in indices:
+                return indices[f"{moeda}{ativo}"], True
+            if ativo in self.estaveis:
+                return identidade, False
+            return None
+
+        # Pares de cada ativo com outros quotes, para o caminho por intermediária
+        pares: Dict[str, List[Tuple[str, int, bool]]] = {}
+        for symbol, i in indices.items():
+            partes = separar_simbolo(symbol)
+            if partes is None:
+                continue
+            base, quote = partes
+            pares.setdefault(base, []).append((quote, i, False))
+            pares.setdefault(quote, []).append((base, i, True))
+        preferencia = {ativo: ordem for ordem, ativo in enumerate(self.intermediarias)}
+
+        n = len(ativos)
+        perna1 = np.full(n, sem_caminho, dtype=np.intp)
+        inverso1 = np.zeros(n, dtype=bool)
+        perna2 = np.full(n, identidade, dtype=np.intp)
+        inverso2 = np.zeros(n, dtype=bool)
+        for j, ativo in enumerate(ativos):
+            direta = perna_direta(ativo)
+            if direta is not None:
+                perna1[j], inverso1[j] = direta
+                continue
+            candidatos = sorted(pares.get(ativo, ()), key=lambda par: preferencia.get(par[0], len(preferencia)))
+            for intermediaria, i, inverso in candidatos:
+                segunda = perna_direta(intermediaria)
+                if segunda is not None:
+                    perna1[j], inverso1[j] = i, inverso
+                    perna2[j], inverso2[j] = segunda
+                    break
+        return _PlanoAvaliacao(perna1, inverso1, perna2, inverso2)
+
+    def plano(self, ativos: Tuple[str, ...], simbolos: Tuple[str, ...]) -> _PlanoAvaliacao:
+        chave = (ativos, simbolos)
+        with self._trava:
+            if self._plano is not None and self._plano[0] == chave:
+                return self._plano[1]
+        plano = self._montar_plano(ativos, simbolos)
+        with self._trava:
+            self._plano = (chave, plano)
+        return plano
+
+    def avaliar(self, saldos: Mapping[str, float], precos: Mapping[str, float]) -> AvaliacaoCarteira:
+        """Valor de cada ativo de `saldos` e o total, em `moeda`. Sem preço (zero ou ausente) vale zero."""
+        ativos = tuple(saldos)
+        simbolos = tuple(precos)
+        plano = self.plano(ativos, simbolos)
+
+        # Vetor de preços + identidade (1.0) + sem caminho (0.0)
+        vetor = np.empty(len(simbolos) + 2, dtype=np.float64)
+        vetor[:len(simbolos)] = np.fromiter(precos.values(), dtype=np.float64, count=len(simbolos))
+        vetor[len(simbolos):] = (1.0, 0.0)
+        validos = vetor > 0
+        vetor[~validos] = 0.0
+        inversos = np.divide(1.0, vetor, out=np.zeros_like(vetor), where=validos)
+
+        fatores = (np.where(plano.inverso1, inversos[plano.perna1], vetor[plano.perna1]) *
+                   np.where(plano.inverso2, inversos[plano.perna2], vetor[plano.perna2]))
+        valores = np.fromiter(saldos.values(), dtype=np.float64, count=len(ativos)) * fatores
+        return AvaliacaoCarteira(
+            moeda=self.moeda,
+            total=float(valores.sum()),
+            valores=dict(zip(ativos, valores.tolist())),
+            sem_preco=tuple(ativos[j] for j in np.flatnonzero(fatores == 0)),
+        )
@@ -0,0 +1,405 @@
+# estado_bot.py - estado do bot em SQLite (modo WAL), gravado registro a registro
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS posicoes (
+    moeda TEXT PRIMARY KEY,
+    em_posicao INTEGER NOT NULL DEFAULT 0,
+    preco_compra REAL NOT NULL DEFAULT 0,
+    stop_loss REAL NOT NULL DEFAULT 0,
+    take_profit REAL NOT NULL DEFAULT 0,
+    ultima_alta_semanal REAL NOT NULL DEFAULT 0,
+    ordem_oco TEXT NOT NULL DEFAULT ''  -- JSON da OCO de proteção aberta na exchange ('' = nenhuma)
+);
+CREATE TABLE IF NOT EXISTS operacoes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    moeda TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    quantidade TEXT NOT NULL,
+    preco REAL NOT NULL,
+    valor_total REAL NOT NULL,
+    motivo TEXT NOT NULL DEFAULT '',
+    execucao TEXT NOT NULL DEFAULT ''  -- JSON com tempos, preço médio, taxas e slippage da ordem
+);
+CREATE INDEX IF NOT EXISTS operacoes_timestamp ON operacoes (timestamp);
+CREATE TABLE IF NOT EXISTS serie_patrimonio (
+    tempo INTEGER PRIMARY KEY,  -- epoch em segundos
+    saldo_total_usdt REAL NOT NULL,
+    nivel INTEGER NOT NULL DEFAULT 0  -- 0 = bruto, 1 = horário, 2 = diário
+);
+CREATE INDEX IF NOT EXISTS serie_patrimonio_nivel ON serie_patrimonio (nivel, tempo);
+"""
+
+# Janelas usadas para calcular a valorização do patrimônio, em segundos
+PERIODOS_VALORIZACAO = {
+    "24h": 24 * 60 * 60,
+    "7d": 7 * 24 * 60 * 60,
+    "30d": 30 * 24 * 60 * 60,
+    "1a": 365 * 24 * 60 * 60,
+}
+
+# Retenção em camadas: (nível de origem, idade mínima em s, agrupamento em s)
+# Pontos brutos viram 1 por hora após 7 dias; pontos horários viram 1 por dia após 1 ano
+_RETENCAO = (
+    (0, 7 * 24 * 60 * 60, 60 * 60),
+    (1, 365 * 24 * 60 * 60, 24 * 60 * 60),
+)
+
+# Colunas de `posicoes` e as chaves correspondentes no dicionário de dados do bot
+_CAMPOS_POSICAO = (
+    ("em_posicao", "posicoes"),
+    ("preco_compra", "precos_compra"),
+    ("stop_loss", "stop_losses"),
+    ("take_profit", "take_profits"),
+    ("ultima_alta_semanal", "ultima_alta_semanal"),
+    ("ordem_oco", "ordens_oco"),
+)
+_COLUNAS_POSICAO = ", ".join(coluna for coluna, _ in _CAMPOS_POSICAO)
+
+
+def dados_padrao(moedas: Iterable[str]) -> dict:
+    moedas = list(moedas)
+    return {
+        "posicoes": {moeda: False for moeda in moedas},
+        "precos_compra": {moeda: 0 for moeda in moedas},
+        "stop_losses": {moeda: 0 for moeda in moedas},
+        "take_profits": {moeda: 0 for moeda in moedas},
+        "ultima_alta_semanal": {moeda: 0 for moeda in moedas},
+        "ordens_oco": {moeda: None for moeda in moedas},
+        "historico_operacoes": []
+    }
+
+
+def _epoch_de_texto(timestamp: str) -> int:
+    # Formato antigo: "%Y-%m-%d %H:%M:%S" no horário local
+    return int(time.mktime(datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S").timetuple()))
+
+
+def _valor_coluna(coluna: str, valor):
+    # Converte um valor do dicionário de dados para o formato gravado na coluna
+    if coluna == "em_posicao":
+        return int(bool(valor))
+    if coluna == "ordem_oco":
+        return _json_ou_vazio(valor)
+    return float(valor or 0)
+
+
+# Colunas acrescentadas depois da criação das tabelas: (tabela, coluna, definição)
+_COLUNAS_ACRESCENTADAS = (
+    ("posicoes", "ordem_oco", "TEXT NOT NULL DEFAULT ''"),
+    ("operacoes", "execucao", "TEXT NOT NULL DEFAULT ''"),
+)
+
+
+_COLUNAS_OPERACAO = "id, timestamp, moeda, tipo, quantidade, preco, valor_total, motivo, execucao"
+
+
+def _operacao_de_linha(linha: tuple) -> dict:
+    id_operacao, timestamp, moeda, tipo, quantidade, preco, valor_total, motivo, execucao = linha
+    operacao = {
+        "id": id_operacao, "timestamp": timestamp, "moeda": moeda, "tipo": tipo, "quantidade": quantidade,
+        "preco": preco, "valor_total": valor_total, "motivo": motivo
+    }
+    if execucao:
+        operacao["execucao"] = json.loads(execucao)
+    return operacao
+
+
+def _json_ou_vazio(valor) -> str:
+    return json.dumps(valor, sort_keys=True, separators=(",", ":")) if valor else ""
+
+
+def _migrar_colunas(conexao: sqlite3.Connection) -> None:
+    # Bancos criados por versões anteriores não têm as colunas acrescentadas depois
+    for tabela, coluna, definicao in _COLUNAS_ACRESCENTADAS:
+        colunas = {linha[1] for linha in conexao.execute(f"PRAGMA table_info({tabela})")}
+        if coluna not in colunas:
+            conexao.execute(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {definicao}")
+
+
+def _migrar_tabela_patrimonio(conexao: sqlite3.Connection) -> None:
+    # Converte a tabela `patrimonio` (timestamps em texto) para a série indexada por epoch
+    existe = conexao.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'patrimonio'"
+    ).fetchone()
+    if not existe:
+        return
+    linhas = conexao.execute("SELECT timestamp, saldo_total_usdt FROM patrimonio ORDER BY id").fetchall()
+    conexao.execute("BEGIN IMMEDIATE")
+    try:
+        conexao.executemany(
+            "INSERT OR REPLACE INTO serie_patrimonio (tempo, saldo_total_usdt, nivel) VALUES (?, ?, 0)",
+            [(_epoch_de_texto(timestamp), saldo) for timestamp, saldo in linhas]
+        )
+        conexao.execute("DROP TABLE patrimonio")
+        conexao.execute("COMMIT")
+    except Exception:
+        conexao.execute("ROLLBACK")
+        raise
+    logging.info(f"{len(linhas)} pontos de patrimônio convertidos para a série indexada por tempo")
+
+
+def _compactar_patrimonio(conexao: sqlite3.Connection, agora: int) -> None:
+    # Mantém só o último ponto de cada hora (ou dia) entre os que passaram da idade da camada.
+    # O limite é alinhado ao agrupamento para que um grupo nunca fique dividido entre camadas.
+    for nivel, idade, agrupamento in _RETENCAO:
+        limite = (agora - idade) // agrupamento * agrupamento
+        conexao.execute(
+            "DELETE FROM serie_patrimonio WHERE nivel = :nivel AND tempo < :limite AND tempo NOT IN ("
+            "SELECT MAX(tempo) FROM serie_patrimonio WHERE nivel = :nivel AND tempo < :limite "
+            "GROUP BY tempo / :agrupamento)",
+            {"nivel": nivel, "limite": limite, "agrupamento": agrupamento}
+        )
+        conexao.execute(
+            "UPDATE serie_patrimonio SET nivel = :proximo WHERE nivel = :nivel AND tempo < :limite",
+            {"nivel": nivel, "proximo": nivel + 1, "limite": limite}
+        )
+
+
+class EstadoBot:
+    """Posições, operações e série de patrimônio em tabelas SQLite separadas.
+
+    `carregar` e `salvar` usam o mesmo dicionário que o bot sempre usou
+    (antes gravado em dados_bot.json). `carregar` lê só as posições: o
+    `historico_operacoes` devolvido começa vazio e recebe as operações
+    registradas depois do carregamento; o histórico gravado é lido pelas
+    consultas `ultimas_operacoes`, `operacoes_desde`, `totais_operacoes` e
+    `execucoes`. `salvar` grava em uma única transação apenas as posições
+    alteradas e as operações ainda sem `id`. O patrimônio é uma série indexada por epoch, gravada com
+    `registrar_patrimonio` e consultada por instante com `patrimonio_em`.
+    O modo WAL permite que outros processos leiam enquanto o bot grava,
+    sempre vendo a última transação completa.
+    """
+
+    def __init__(self, caminho: str, moedas: Iterable[str], somente_leitura: bool = False):
+        self.caminho = caminho
+        self.moedas = list(moedas)
+        self.somente_leitura = somente_leitura
+        self._trava = threading.Lock()
+        self._conexao: Optional[sqlite3.Connection] = None
+        # O que já está gravado, para que `salvar` escreva só as diferenças
+        self._posicoes_salvas: Dict[str, Tuple] = {}
+        # Execuções já lidas, buscadas de forma incremental (id > _ultima_execucao)
+        self._execucoes: List[dict] = []
+        self._ultima_execucao = 0
+
+    def _conectar(self) -> sqlite3.Connection:
+        if self._conexao is not None:
+            return self._conexao
+        if self.somente_leitura:
+            conexao = sqlite3.connect(f"file:{self.caminho}?mode=ro", uri=True,
+                                      isolation_level=None, check_same_thread=False)
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(self.caminho)), exist_ok=True)
+            conexao = sqlite3.connect(self.caminho, isolation_level=None, check_same_thread=False)
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute("PRAGMA synchronous=FULL")
+            conexao.executescript(_ESQUEMA)
+            _migrar_colunas(conexao)
+            _migrar_tabela_patrimonio(conexao)
+        self._conexao = conexao
+        self._ler_marcadores()
+        return conexao
+
+    def _ler_marcadores(self) -> None:
+        conexao = self._conexao
+        self._posicoes_salvas = {
+            linha[0]: tuple(linha[1:])
+            for linha in conexao.execute(f"SELECT moeda, {_COLUNAS_POSICAO} FROM posicoes")
+        }
+
+    def vazio(self) -> bool:
+        with self._trava:
+            conexao = self._conectar()
+            sem_patrimonio = conexao.execute("SELECT 1 FROM serie_patrimonio LIMIT 1").fetchone() is None
+            sem_operacoes = conexao.execute("SELECT 1 FROM operacoes LIMIT 1").fetchone() is None
+            return not self._posicoes_salvas and sem_operacoes and sem_patrimonio
+
+    def carregar(self) -> dict:
+        """Monta o dicionário de dados do bot com as posições gravadas (sem o histórico de operações)."""
+        dados = dados_padrao(self.moedas)
+        with self._trava:
+            self._ler_posicoes(self._conectar(), dados)
+        return dados
+
+    def _ler_posicoes(self, conexao: sqlite3.Connection, dados: dict) -> None:
+        for moeda, em_posicao, preco_compra, stop_loss, take_profit, ultima_alta, ordem_oco in conexao.execute(
+                f"SELECT moeda, {_COLUNAS_POSICAO} FROM posicoes"):
+            dados["posicoes"][moeda] = bool(em_posicao)
+            dados["precos_compra"][moeda] = preco_compra
+            dados["stop_losses"][moeda] = stop_loss
+            dados["take_profits"][moeda] = take_profit
+            dados["ultima_alta_semanal"][moeda] = ultima_alta
+            dados["ordens_oco"][moeda] = json.loads(ordem_oco) if ordem_oco else None
+
+    def ultimas_operacoes(self, quantidade: int) -> List[dict]:
+        """As `quantidade` operações mais recentes, em ordem cronológica."""
+        with self._trava:
+            linhas = self._conectar().execute(
+                f"SELECT {_COLUNAS_OPERACAO} FROM operacoes ORDER BY id DESC LIMIT ?", (int(quantidade),)
+            ).fetchall()
+        return [_operacao_de_linha(linha) for linha in reversed(linhas)]
+
+    def operacoes_desde(self, timestamp: str) -> List[dict]:
+        """Operações com timestamp ("%Y-%m-%d %H:%M:%S") a partir de `timestamp`, em ordem cronológica."""
+        with self._trava:
+            linhas = self._conectar().execute(
+                f"SELECT {_COLUNAS_OPERACAO} FROM operacoes WHERE timestamp >= ? ORDER BY id", (timestamp,)
+            ).fetchall()
+        return [_operacao_de_linha(linha) for linha in linhas]
+
+    def totais_operacoes(self) -> Dict[str, Tuple[int, float]]:
+        """(quantidade, soma de valor_total) das operações gravadas, por tipo."""
+        with self._trava:
+            return {
+                tipo: (quantidade, total)
+                for tipo, quantidade, total in self._conectar().execute(
+                    "SELECT tipo, COUNT(*), SUM(valor_total) FROM operacoes GROUP BY tipo")
+            }
+
+    def execucoes(self) -> List[dict]:
+        """Operações que registraram `execucao`, só com `moeda` e `execucao`.
+
+        Cada linha é lida e decodificada uma única vez; as chamadas seguintes
+        buscam apenas as operações gravadas depois da última leitura.
+        """
+        with self._trava:
+            for id_operacao, moeda, execucao in self._conectar().execute(
+                    "SELECT id, moeda, execucao FROM operacoes WHERE id > ? AND execucao != '' ORDER BY id",
+                    (self._ultima_execucao,)):
+                self._execucoes.append({"moeda": moeda, "execucao": json.loads(execucao)})
+                self._ultima_execucao = id_operacao
+            return list(self._execucoes)
+
+    def salvar(self, dados: dict) -> None:
+        """Grava, em uma transação, só o que mudou desde a última gravação.
+
+        As operações gravadas recebem o `id` da tabela; só as do fim de
+        `historico_operacoes` que ainda não têm `id` são inseridas.
+        """
+        if self.somente_leitura:
+            raise sqlite3.OperationalError("Estado aberto somente para leitura")
+
+        moedas = set(self.moedas).union(*(dados.get(chave, {}) for _, chave in _CAMPOS_POSICAO))
+        with self._trava:
+            conexao = self._conectar()
+            posicoes = {}
+            for moeda in moedas:
+                linha = tuple(
+                    _valor_coluna(coluna, dados.get(chave, {}).get(moeda))
+                    for coluna, chave in _CAMPOS_POSICAO
+                )
+                if self._posicoes_salvas.get(moeda) != linha:
+                    posicoes[moeda] = linha
+
+            operacoes = []
+            for operacao in reversed(dados.get("historico_operacoes", [])):
+                if "id" in operacao:
+                    break
+                operacoes.append(operacao)
+            operacoes.reverse()
+
+            if not posicoes and not operacoes:
+                return
+
+            conexao.execute("BEGIN IMMEDIATE")
+            try:
+                conexao.executemany(
+                    f"INSERT INTO posicoes (moeda, {_COLUNAS_POSICAO}) "
+                    f"VALUES (?, {', '.join('?' for _ in _CAMPOS_POSICAO)}) ON CONFLICT(moeda) DO UPDATE SET "
+                    + ", ".join(f"{coluna}=excluded.{coluna}" for coluna, _ in _CAMPOS_POSICAO),
+                    [(moeda, *linha) for moeda, linha in posicoes.items()]
+                )
+                ids = [
+                    conexao.execute(
+                        "INSERT INTO operacoes (timestamp, moeda, tipo, quantidade, preco, valor_total, motivo, execucao) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (op["timestamp"], op["moeda"], op["tipo"], str(op["quantidade"]), float(op["preco"]),
+                         float(op["valor_total"]), op.get("motivo", ""), _json_ou_vazio(op.get("execucao")))
+                    ).lastrowid
+                    for op in operacoes
+                ]
+                conexao.execute("COMMIT")
+            except Exception:
+                conexao.execute("ROLLBACK")
+                raise
+
+            self._posicoes_salvas.update(posicoes)
+            for operacao, id_operacao in zip(operacoes, ids):
+                operacao["id"] = id_operacao
+
+    def registrar_patrimonio(self, saldo_total_usdt: float, tempo: Optional[int] = None) -> None:
+        """Acrescenta um ponto à série e compacta os pontos que mudaram de camada."""
+        if self.somente_leitura:
+            raise sqlite3.OperationalError("Estado aberto somente para leitura")
+        tempo = int(time.time()) if tempo is None else int(tempo)
+        with self._trava:
+            conexao = self._conectar()
+            conexao.execute("BEGIN IMMEDIATE")
+            try:
+                conexao.execute(
+                    "INSERT OR REPLACE INTO serie_patrimonio (tempo, saldo_total_usdt, nivel) VALUES (?, ?, 0)",
+                    (tempo, float(saldo_total_usdt))
+                )
+                _compactar_patrimonio(conexao, tempo)
+                conexao.execute("COMMIT")
+            except Exception:
+                conexao.execute("ROLLBACK")
+                raise
+
+    def ultimo_patrimonio(self) -> Optional[Tuple[int, float]]:
+        """(tempo, saldo) do ponto mais recente da série."""
+        with self._trava:
+            return self._conectar().execute(
+                "SELECT tempo, saldo_total_usdt FROM serie_patrimonio ORDER BY tempo DESC LIMIT 1"
+            ).fetchone()
+
+    def patrimonio_em(self, tempo: int) -> Optional[float]:
+        """Saldo do último ponto registrado até `tempo` (busca O(log n) na chave primária)."""
+        with self._trava:
+            linha = self._conectar().execute(
+                "SELECT saldo_total_usdt FROM serie_patrimonio WHERE tempo <= ? ORDER BY tempo DESC LIMIT 1",
+                (int(tempo),)
+            ).fetchone()
+        return linha[0] if linha else None
+
+    def valorizacoes(self, periodos: Dict[str, int] = PERIODOS_VALORIZACAO) -> Dict[str, Optional[float]]:
+        """Variação percentual do patrimônio atual em relação a cada período (None sem histórico)."""
+        ultimo = self.ultimo_patrimonio()
+        resultado = {nome: None for nome in periodos}
+        if ultimo is None:
+            return resultado
+        atual = ultimo[1]
+        agora = int(time.time())
+        for nome, segundos in periodos.items():
+            antigo = self.patrimonio_em(agora - segundos)
+            if antigo:
+                resultado[nome] = ((atual - antigo) / antigo) * 100
+        return resultado
+
+    def migrar_json(self, arquivo_json: str) -> bool:
+        """Importa um dados_bot.json antigo se o banco ainda estiver vazio."""
+        if not os.path.exists(arquivo_json) or not self.vazio():
+            return False
+        with open(arquivo_json, "r") as f:
+            dados = json.load(f)
+        self.salvar(dados)
+        for item in dados.get("historico_patrimonio", []):
+            self.registrar_patrimonio(item["saldo_total_usdt"], _epoch_de_texto(item["timestamp"]))
+        logging.info(f"Estado importado de {arquivo_json} para {self.caminho}")
+        return True
+
+    def fechar(self) -> None:
+        with self._trava:
+            if self._conexao is not None:
+                self._conexao.close()
+                self._conexao = None
@@ -0,0 +1,699 @@
+# exchange_simulada.py - exchange local que imita o subconjunto do cliente Binance usado pelo bot
+
+import json
+import math
+import time
+import random
+import logging
+import threading
+from collections import deque
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+from urllib.parse import parse_qsl, urlparse
+
+import numpy as np
+
+from agendador_api import PESOS
+from armazenamento_candles import DTYPE_CANDLE, intervalo_em_ms
+from filtros_simbolos import FiltrosSimbolo, formatar_decimal
+from monitor_tempo_real import CallbackPreco, FontePrecos
+
+try:
+    from binance.exceptions import BinanceAPIException
+except ImportError:
+    # O servidor HTTP pode rodar em uma máquina sem python-binance
+    BinanceAPIException = Exception
+
+class ErroExchangeSimulada(BinanceAPIException):
+    """Erro no mesmo formato da BinanceAPIException (status HTTP, código e mensagem)."""
+
+    def __init__(self, status_code: int, code: int, message: str):
+        Exception.__init__(self, f"APIError(code={code}): {message}")
+        self.status_code = status_code
+        self.code = code
+        self.message = message
+        self.response = None
+        self.request = None
+
+    def __str__(self) -> str:
+        return f"APIError(code={self.code}): {self.message}"
+
+
+class RelogioSimulado:
+    """Relógio da exchange simulada.
+
+    Com `velocidade` > 0 o tempo avança `velocidade` vezes mais rápido que o
+    relógio real. Com `velocidade=None` o tempo só avança por `avancar` ou
+    `dormir`, que retorna imediatamente (simulação o mais rápido possível).
+    """
+
+    def __init__(self, inicio_ms: int, velocidade: Optional[float] = 1.0):
+        self.velocidade = velocidade
+        self._inicio_ms = inicio_ms
+        self._inicio_real = time.monotonic()
+        self._deslocamento_ms = 0
+        self._trava = threading.Lock()
+
+    def agora_ms(self) -> int:
+        decorrido = 0.0
+        if self.velocidade:
+            decorrido = (time.monotonic() - self._inicio_real) * 1000 * self.velocidade
+        return int(self._inicio_ms + self._deslocamento_ms + decorrido)
+
+    def avancar(self, ms: int) -> None:
+        with self._trava:
+            self._deslocamento_ms += ms
+
+    def dormir(self, segundos: float) -> None:
+        if self.velocidade:
+            time.sleep(segundos / self.velocidade)
+        else:
+            self.avancar(int(segundos * 1000))
+
+
+def gerar_candles_sinteticos(n: int, intervalo: str = "1h", preco_inicial: float = 100.0,
+                             volatilidade: float = 0.01, tendencia: float = 0.0,
+                             inicio_ms: Optional[int] = None, semente: Optional[int] = None) -> np.ndarray:
+    """Candles em passeio aleatório geométrico, no formato de DTYPE_CANDLE."""
+    rng = np.random.default_rng(semente)
+    duracao = intervalo_em_ms(intervalo)
+    if inicio_ms is None:
+        inicio_ms = (int(time.time() * 1000) // duracao - n) * duracao
+
+    retornos = rng.normal(tendencia, volatilidade, n)
+    fechamento = preco_inicial * np.exp(np.cumsum(retornos))
+    abertura = np.concatenate([[preco_inicial], fechamento[:-1]])
+    amplitude = np.abs(rng.normal(0, volatilidade / 2, (2, n)))
+    maxima = np.maximum(abertura, fechamento) * (1 + amplitude[0])
+    minima = np.minimum(abertura, fechamento) * (1 - amplitude[1])
+    volume = rng.gamma(2.0, 50.0, n)
+
+    candles = np.empty(n, dtype=DTYPE_CANDLE)
+    candles["open_time"] = inicio_ms + np.arange(n, dtype=np.int64) * duracao
+    candles["open"] = abertura
+    candles["high"] = maxima
+    candles["low"] = minima
+    candles["close"] = fechamento
+    candles["volume"] = volume
+    candles["close_time"] = candles["open_time"] + duracao - 1
+    candles["quote_asset_volume"] = volume * fechamento
+    candles["trades"] = rng.integers(10, 1000, n)
+    candles["taker_buy_base"] = volume / 2
+    candles["taker_buy_quote"] = volume * fechamento / 2
+    return candles
+
+
+def simbolos_sinteticos(quantidade: int, quote: str = "USDT") -> List[str]:
+    return [f"SIM{i:03d}{quote}" for i in range(quantidade)]
+
+
+def filtros_padrao(symbol: str, preco: float, quote: str = "USDT") -> FiltrosSimbolo:
+    """Filtros plausíveis para um símbolo sem filtros reais conhecidos."""
+    passo = Decimal(1).scaleb(math.floor(math.log10(1 / preco)))
+    tick = Decimal(1).scaleb(math.floor(math.log10(preco)) - 6)
+    return FiltrosSimbolo(
+        symbol=symbol, base=symbol[:-len(quote)], quote=quote,
+        min_qty=passo, max_qty=Decimal(9000000), step_size=passo,
+        min_notional=Decimal(5), tick_size=tick, min_price=tick, max_price=Decimal(1000000),
+    )
+
+
+def _info_simbolo(filtros: FiltrosSimbolo) -> dict:
+    """Item de `exchangeInfo['symbols']` correspondente aos filtros."""
+    return {
+        "symbol": filtros.symbol,
+        "status": "TRADING",
+        "baseAsset": filtros.base,
+        "quoteAsset": filtros.quote,
+        "filters": [
+            {"filterType": "PRICE_FILTER", "minPrice": str(filtros.min_price),
+             "maxPrice": str(filtros.max_price), "tickSize": str(filtros.tick_size)},
+            {"filterType": "LOT_SIZE", "minQty": str(filtros.min_qty),
+             "maxQty": str(filtros.max_qty), "stepSize": str(filtros.step_size)},
+            {"filterType": "NOTIONAL", "minNotional": str(filtros.min_notional)},
+        ],
+    }
+
+
+def _formatar(valor: float) -> str:
+    return formatar_decimal(Decimal(repr(float(valor))))
+
+
+class ExchangeSimulada:
+    """Substituto local do `binance.client.Client` para o modo de simulação e testes de carga.
+
+    Os preços seguem os candles informados (gravados ou sintéticos): dentro de
+    um candle o preço é interpolado linearmente entre a abertura e o
+    fechamento. Ordens a mercado são executadas no preço corrente e atualizam
+    os saldos, descontando a taxa do ativo recebido como na Binance.
+
+    Ordens OCO de venda bloqueiam o saldo do ativo base e são avaliadas a
+    cada chamada contra o caminho de preços desde a última avaliação; se o
+    stop e o alvo forem atingidos no mesmo trecho, vale o stop.
+    """
+
+    def __init__(self, candles_por_simbolo: Mapping[str, np.ndarray], intervalo: str = "1h",
+                 saldos: Optional[Mapping[str, float]] = None, relogio: Optional[RelogioSimulado] = None,
+                 filtros: Optional[Mapping[str, FiltrosSimbolo]] = None, taxa: float = 0.001,
+                 slippage: float = 0.0, latencia: float = 0.0, variacao_latencia: float = 0.0,
+                 limite_peso_minuto: Optional[int] = 6000, quote: str = "USDT"):
+        self.intervalo = intervalo
+        self._duracao = intervalo_em_ms(intervalo)
+        self._candles = {s: np.ascontiguousarray(c, dtype=DTYPE_CANDLE) for s, c in candles_por_simbolo.items()}
+        self._tempos = {s: c["open_time"] for s, c in self._candles.items()}
+        if relogio is None:
+            # Começa depois de 1000 candles (ou do último disponível) para haver histórico
+            inicio = min(int(c["open_time"][min(1000, len(c) - 1)]) for c in self._candles.values() if len(c))
+            relogio = RelogioSimulado(inicio)
+        self.relogio = relogio
+        self.saldos: Dict[str, Decimal] = {k: Decimal(str(v)) for k, v in (saldos or {"USDT": 10000}).items()}
+        self.taxa = Decimal(str(taxa))
+        self.slippage = slippage
+        self.latencia = latencia
+        self.variacao_latencia = variacao_latencia
+        self.limite_peso_minuto = limite_peso_minuto
+        self.filtros = dict(filtros or {})
+        for simbolo, candles in self._candles.items():
+            if simbolo not in self.filtros and len(candles):
+                self.filtros[simbolo] = filtros_padrao(simbolo, float(candles["close"][0]), quote)
+        self.ordens: List[dict] = []
+        self.bloqueados: Dict[str, Decimal] = {}
+        self._ordens_por_id: Dict[int, dict] = {}
+        self._listas_oco: Dict[int, dict] = {}  # listas abertas: id -> {"symbol", "ordens", "verificado_ate"}
+        self._proximo_id_lista = 1
+        self._pesos: deque = deque()
+        self._peso_minuto = 0
+        self._proximo_id = 1
+        self._trava = threading.RLock()
+
+    # Infraestrutura comum às chamadas
+
+    def _chamada(self, nome: str, peso: Optional[int] = None) -> int:
+        """Aplica latência e limite de peso. Retorna o instante atual da simulação."""
+        if self.latencia or self.variacao_latencia:
+            time.sleep(max(0.0, self.latencia + random.uniform(-self.variacao_latencia, self.variacao_latencia)))
+        agora = self.relogio.agora_ms()
+        peso = PESOS[nome] if peso is None else peso
+        with self._trava:
+            while self._pesos and self._pesos[0][0] <= agora - 60000:
+                self._peso_minuto -= self._pesos.popleft()[1]
+            if self.limite_peso_minuto is not None and self._peso_minuto + peso > self.limite_peso_minuto:
+                raise ErroExchangeSimulada(429, -1003, f"Too much request weight used; current limit is "
+                                                       f"{self.limite_peso_minuto} request weight per 1 MINUTE.")
+            self._pesos.append((agora, peso))
+            self._peso_minuto += peso
+            if self._listas_oco:
+                self._processar_ordens_oco(agora)
+        return agora
+
+    def peso_usado(self) -> int:
+        """Peso consumido no último minuto da simulação (cabeçalho X-MBX-USED-WEIGHT-1M)."""
+        return self._peso_minuto
+
+    def _faixa_precos(self, symbol: str, desde: int, ate: int) -> Tuple[float, float]:
+        """Menor e maior preço do caminho interpolado entre dois instantes."""
+        candles, tempos = self._candles[symbol], self._tempos[symbol]
+        precos = [self.preco(symbol, desde), self.preco(symbol, ate)]
+        # Vértices do caminho: aberturas dos candles iniciados no trecho e fechamentos dos encerrados nele
+        i0 = int(np.searchsorted(tempos, desde, side="right"))
+        i1 = int(np.searchsorted(tempos, ate, side="right"))
+        if i1 > i0:
+            precos.extend(candles["open"][i0:i1].tolist())
+            precos.extend(candles["close"][max(0, i0 - 1):i1 - 1].tolist())
+        return min(precos), max(precos)
+
+    def _processar_ordens_oco(self, agora: int) -> None:
+        # Chamado com a trava adquirida
+        for id_lista, lista in list(self._listas_oco.items()):
+            if agora <= lista["verificado_ate"]:
+                continue
+            minima, maxima = self._faixa_precos(lista["symbol"], lista["verificado_ate"], agora)
+            lista["verificado_ate"] = agora
+            limite, stop = (self._ordens_por_id[i] for i in lista["ordens"])
+            if minima <= float(stop["stopPrice"]):
+                self._executar_perna_oco(id_lista, stop, limite, agora)
+            elif maxima >= float(limite["price"]):
+                self._executar_perna_oco(id_lista, limite, stop, agora)
+
+    def _executar_perna_oco(self, id_lista: int, ordem: dict, outra: dict, agora: int) -> None:
+        filtros = self.filtros[ordem["symbol"]]
+        quantidade, preco = Decimal(ordem["origQty"]), Decimal(ordem["price"])
+        valor = quantidade * preco
+        self.bloqueados[filtros.base] -= quantidade
+        self.saldos[filtros.quote] = self.saldos.get(filtros.quote, Decimal(0)) + valor - valor * self.taxa
+        ordem.update(status="FILLED", executedQty=ordem["origQty"],
+                     cummulativeQuoteQty=formatar_decimal(valor), updateTime=agora)
+        outra.update(status="EXPIRED", updateTime=agora)
+        del self._listas_oco[id_lista]
+        logging.info(f"Exchange simulada: OCO {id_lista} executada ({ordem['type']}) "
+                     f"{ordem['origQty']} {ordem['symbol']} a {ordem['price']}")
+
+    def _nova_ordem(self, symbol: str, side: str, type: str, quantidade: Decimal, preco: Decimal,
+                    agora: int, id_lista: int = -1, **campos) -> dict:
+        # Chamado com a trava adquirida
+        ordem = {
+            "symbol": symbol,
+            "orderId": self._proximo_id,
+            "orderListId": id_lista,
+            "clientOrderId": f"simulada_{self._proximo_id}",
+            "transactTime": agora,
+            "price": formatar_decimal(preco),
+            "origQty": formatar_decimal(quantidade),
+            "executedQty": "0",
+            "cummulativeQuoteQty": "0",
+            "status": "NEW",
+            "timeInForce": "GTC",
+            "type": type,
+            "side": side,
+            **campos,
+        }
+        self._ordens_por_id[self._proximo_id] = ordem
+        self._proximo_id += 1
+        return ordem
+
+    def _validar_simbolo(self, symbol: str) -> np.ndarray:
+        if symbol not in self._candles:
+            raise ErroExchangeSimulada(400, -1121, "Invalid symbol.")
+        return self._candles[symbol]
+
+    def preco(self, symbol: str, agora: Optional[int] = None) -> float:
+        """Preço do símbolo no instante da simulação."""
+        candles = self._validar_simbolo(symbol)
+        agora = self.relogio.agora_ms() if agora is None else agora
+        i = int(np.searchsorted(self._tempos[symbol], agora, side="right")) - 1
+        if i < 0:
+            return float(candles["open"][0])
+        if i >= len(candles) - 1 and agora > candles["close_time"][-1]:
+            return float(candles["close"][-1])
+        fracao = (agora - candles["open_time"][i]) / self._duracao
+        return float(candles["open"][i] + (candles["close"][i] - candles["open"][i]) * fracao)
+
+    # Subconjunto da API do binance.client.Client
+
+    def ping(self) -> dict:
+        return {}
+
+    def get_server_time(self) -> dict:
+        return {"serverTime": self.relogio.agora_ms()}
+
+    def get_account(self, omitZeroBalances=False, **kwargs) -> dict:
+        self._chamada("get_account")
+        omitir = str(omitZeroBalances).lower() == "true"
+        with self._trava:
+            ativos = list(self.saldos) + [a for a in self.bloqueados if a not in self.saldos]
+            saldos = [
+                {"asset": ativo, "free": formatar_decimal(self.saldos.get(ativo, Decimal(0))),
+                 "locked": formatar_decimal(self.bloqueados.get(ativo, Decimal(0)))}
+                for ativo in ativos
+                if not (omitir and self.saldos.get(ativo, 0) == 0 and self.bloqueados.get(ativo, 0) == 0)
+            ]
+        return {"makerCommission": 10, "takerCommission": 10, "canTrade": True, "balances": saldos}
+
+    def get_symbol_ticker(self, symbol: Optional[str] = None, symbols=None, **kwargs):
+        if symbol is not None:
+            agora = self._chamada("get_symbol_ticker")
+            return {"symbol": symbol, "price": _formatar(self.preco(symbol, agora))}
+        agora = self._chamada("get_symbol_ticker_varios")
+        if symbols is None:
+            simbolos = list(self._candles)
+        else:
+            simbolos = json.loads(symbols) if isinstance(symbols, str) else list(symbols)
+        return [{"symbol": s, "price": _formatar(self.preco(s, agora))} for s in simbolos]
+
+    def get_klines(self, symbol: str, interval: str, limit: int = 500, startTime: Optional[int] = None,
+                   endTime: Optional[int] = None, **kwargs) -> list:
+        agora = self._chamada("get_klines")
+        if interval != self.intervalo:
+            raise ErroExchangeSimulada(400, -1120, f"Invalid interval: only {self.intervalo} is simulated.")
+        candles = self._validar_simbolo(symbol)
+        tempos = self._tempos[symbol]
+        limit = min(int(limit), 1000)
+
+        # Só existem os candles já abertos no instante da simulação
+        fim = int(np.searchsorted(tempos, agora, side="right"))
+        if endTime is not None:
+            fim = min(fim, int(np.searchsorted(tempos, int(endTime), side="right")))
+        if startTime is not None:
+            inicio = int(np.searchsorted(tempos, int(startTime), side="left"))
+            fim = min(fim, inicio + limit)
+        else:
+            inicio = max(0, fim - limit)
+
+        resultado = []
+        for i in range(inicio, fim):
+            c = candles[i]
+            abertura, maxima, minima, fechamento = float(c["open"]), float(c["high"]), float(c["low"]), float(c["close"])
+            volume = float(c["volume"])
+            if agora <= c["close_time"]:
+                # Candle em formação: fecha no preço atual, com volume proporcional ao tempo decorrido
+                fracao = (agora - int(c["open_time"])) / self._duracao
+                fechamento = abertura + (fechamento - abertura) * fracao
+                maxima = max(abertura, fechamento)
+                minima = min(abertura, fechamento)
+                volume *= fracao
+            resultado.append([
+                int(c["open_time"]), _formatar(abertura), _formatar(maxima), _formatar(minima),
+                _formatar(fechamento), _formatar(volume), int(c["close_time"]),
+                _formatar(volume * fechamento), int(c["trades"]), _formatar(volume / 2),
+                _formatar(volume * fechamento / 2), "0",
+            ])
+        return resultado
+
+    def get_exchange_info(self, **kwargs) -> dict:
+        agora = self._chamada("get_exchange_info")
+        return {
+            "timezone": "UTC",
+            "serverTime": agora,
+            "symbols": [_info_simbolo(f) for f in self.filtros.values()],
+        }
+
+    def get_symbol_info(self, symbol: str) -> Optional[dict]:
+        self._chamada("get_symbol_info")
+        filtros = self.filtros.get(symbol)
+        return _info_simbolo(filtros) if filtros else None
+
+    def create_order(self, symbol: str, side: str, type: str, quantity=None, quoteOrderQty=None, **kwargs) -> dict:
+        agora = self._chamada("create_order")
+        self._validar_simbolo(symbol)
+        if type != "MARKET":
+            raise ErroExchangeSimulada(400, -1116, "Invalid orderType: only MARKET is simulated.")
+        if side not in ("BUY", "SELL"):
+            raise ErroExchangeSimulada(400, -1117, "Invalid side.")
+
+        filtros = self.filtros[symbol]
+        preco = self.preco(symbol, agora) * (1 + self.slippage if side == "BUY" else 1 - self.slippage)
+        preco = Decimal(_formatar(preco))
+        if quantity is not None:
+            quantidade = Decimal(str(quantity))
+        elif quoteOrderQty is not None and side == "BUY":
+            quantidade = filtros.quantizar_quantidade(Decimal(str(quoteOrderQty)) / preco)
+        else:
+            raise ErroExchangeSimulada(400, -1102, "Mandatory parameter 'quantity' was not sent.")
+
+        if (quantidade < filtros.min_qty or quantidade > filtros.max_qty or
+                filtros.quantizar_quantidade(quantidade) != quantidade):
+            raise ErroExchangeSimulada(400, -1013, "Filter failure: LOT_SIZE")
+        valor = quantidade * preco
+        if valor < filtros.min_notional:
+            raise ErroExchangeSimulada(400, -1013, "Filter failure: NOTIONAL")
+
+        with self._trava:
+            if side == "BUY":
+                gasto, ativo_gasto = valor, filtros.quote
+                comissao, ativo_recebido, recebido = quantidade * self.taxa, filtros.base, quantidade
+            else:
+                gasto, ativo_gasto = quantidade, filtros.base
+                comissao, ativo_recebido, recebido = valor * self.taxa, filtros.quote, valor
+            if self.saldos.get(ativo_gasto, Decimal(0)) < gasto:
+                raise ErroExchangeSimulada(400, -2010, "Account has insufficient balance for requested action.")
+            self.saldos[ativo_gasto] -= gasto
+            self.saldos[ativo_recebido] = self.saldos.get(ativo_recebido, Decimal(0)) + recebido - comissao
+
+            ordem = self._nova_ordem(
+                symbol, side, type, quantidade, Decimal(0), agora,
+                executedQty=formatar_decimal(quantidade),
+                cummulativeQuoteQty=formatar_decimal(valor),
+                status="FILLED",
+                fills=[{
+                    "price": formatar_decimal(preco),
+                    "qty": formatar_decimal(quantidade),
+                    "commission": formatar_decimal(comissao),
+                    "commissionAsset": ativo_recebido,
+                }],
+            )
+            if "newClientOrderId" in kwargs:
+                ordem["clientOrderId"] = kwargs["newClientOrderId"]
+            self.ordens.append(ordem)
+        logging.info(f"Exchange simulada: {side} {formatar_decimal(quantidade)} {symbol} a {formatar_decimal(preco)}")
+        return dict(ordem)
+
+    def create_oco_order(self, symbol: str, side: str, quantity, aboveType: str, belowType: str,
+                         abovePrice=None, belowStopPrice=None, belowPrice=None, belowTimeInForce=None,
+                         **kwargs) -> dict:
+        """OCO de venda (orderList/oco): LIMIT_MAKER acima do preço e STOP_LOSS(_LIMIT) abaixo."""
+        agora = self._chamada("create_oco_order")
+        self._validar_simbolo(symbol)
+        if side != "SELL":
+            raise ErroExchangeSimulada(400, -1117, "Invalid side: only SELL OCO orders are simulated.")
+        if aboveType != "LIMIT_MAKER" or belowType not in ("STOP_LOSS", "STOP_LOSS_LIMIT"):
+            raise ErroExchangeSimulada(400, -1116, "Invalid orderType: only LIMIT_MAKER above and "
+                                                   "STOP_LOSS/STOP_LOSS_LIMIT below are simulated.")
+        if abovePrice is None or belowStopPrice is None:
+            raise ErroExchangeSimulada(400, -1102, "Mandatory parameter 'abovePrice'/'belowStopPrice' was not sent.")
+
+        filtros = self.filtros[symbol]
+        quantidade = Decimal(str(quantity))
+        preco_limite, gatilho = Decimal(str(abovePrice)), Decimal(str(belowStopPrice))
+        preco_stop = Decimal(str(belowPrice)) if belowPrice is not None else gatilho
+        if (quantidade < filtros.min_qty or quantidade > filtros.max_qty or
+                filtros.quantizar_quantidade(quantidade) != quantidade):
+            raise ErroExchangeSimulada(400, -1013, "Filter failure: LOT_SIZE")
+        if any(filtros.quantizar_preco(p) != p for p in (preco_limite, gatilho, preco_stop)):
+            raise ErroExchangeSimulada(400, -1013, "Filter failure: PRICE_FILTER")
+        if preco_stop * quantidade < filtros.min_notional:
+            raise ErroExchangeSimulada(400, -1013, "Filter failure: NOTIONAL")
+        atual = Decimal(_formatar(self.preco(symbol, agora)))
+        if not preco_limite > atual > gatilho:
+            raise ErroExchangeSimulada(400, -2010, "The relationship of the prices for the orders is not correct.")
+
+        with self._trava:
+            if self.saldos.get(filtros.base, Decimal(0)) < quantidade:
+                raise ErroExchangeSimulada(400, -2010, "Account has insufficient balance for requested action.")
+            self.saldos[filtros.base] -= quantidade
+            self.bloqueados[filtros.base] = self.bloqueados.get(filtros.base, Decimal(0)) + quantidade
+
+            id_lista = self._proximo_id_lista
+            self._proximo_id_lista += 1
+            limite = self._nova_ordem(symbol, side, "LIMIT_MAKER", quantidade, preco_limite, agora, id_lista)
+            stop = self._nova_ordem(symbol, side, belowType, quantidade, preco_stop, agora, id_lista,
+                                    stopPrice=formatar_decimal(gatilho),
+                                    timeInForce=belowTimeInForce or "GTC")
+            self._listas_oco[id_lista] = {"symbol": symbol, "ordens": [limite["orderId"], stop["orderId"]],
+                                          "verificado_ate": agora}
+            relatorios = [dict(limite), dict(stop)]
+        logging.info(f"Exchange simulada: OCO {id_lista} {formatar_decimal(quantidade)} {symbol} "
+                     f"alvo {formatar_decimal(preco_limite)} / stop {formatar_decimal(gatilho)}")
+        return {
+            "orderListId": id_lista,
+            "contingencyType": "OCO",
+            "listStatusType": "EXEC_STARTED",
+            "listOrderStatus": "EXECUTING",
+            "listClientOrderId": f"simulada_lista_{id_lista}",
+            "transactionTime": agora,
+            "symbol": symbol,
+            "orders": [{"symbol": symbol, "orderId": o["orderId"], "clientOrderId": o["clientOrderId"]}
+                       for o in relatorios],
+            "orderReports": relatorios,
+        }
+
+    def get_open_orders(self, symbol: Optional[str] = None, **kwargs) -> list:
+        self._chamada("get_open_orders")
+        with self._trava:
+            return [
+                dict(self._ordens_por_id[i])
+                for lista in self._listas_oco.values() if symbol is None or lista["symbol"] == symbol
+                for i in lista["ordens"]
+            ]
+
+    def get_order(self, symbol: str, orderId, **kwargs) -> dict:
+        self._chamada("get_order")
+        with self._trava:
+            ordem = self._ordens_por_id.get(int(orderId))
+            if ordem is None or ordem["symbol"] != symbol:
+                raise ErroExchangeSimulada(400, -2013, "Order does not exist.")
+            return dict(ordem)
+
+    def cancel_order(self, symbol: str, orderId, **kwargs) -> dict:
+        """Cancela a ordem; numa OCO, cancela a lista inteira e devolve o saldo bloqueado."""
+        agora = self._chamada("cancel_order")
+        with self._trava:
+            ordem = self._ordens_por_id.get(int(orderId))
+            if ordem is None or ordem["symbol"] != symbol or ordem["status"] != "NEW":
+                raise ErroExchangeSimulada(400, -2011, "Unknown order sent.")
+            lista = self._listas_oco.pop(ordem["orderListId"], None)
+            ids = lista["ordens"] if lista else [ordem["orderId"]]
+            for i in ids:
+                self._ordens_por_id[i].update(status="CANCELED", updateTime=agora)
+            if lista:
+                base = self.filtros[symbol].base
+                quantidade = Decimal(ordem["origQty"])
+                self.bloqueados[base] -= quantidade
+                self.saldos[base] = self.saldos.get(base, Decimal(0)) + quantidade
+            return dict(ordem)
+
+
+class FonteSimulada(FontePrecos):
+    """Fonte de preços para o MotorStopTakeProfit que consulta a exchange simulada.
+
+    Emite um tick por símbolo a cada `intervalo` segundos do relógio da simulação.
+    """
+
+    def __init__(self, exchange: ExchangeSimulada, simbolos: Iterable[str], intervalo: float = 1.0):
+        self.exchange = exchange
+        self.simbolos = list(simbolos)
+        self.intervalo = intervalo
+        self._parar = threading.Event()
+        self._thread = None
+
+    def iniciar(self, ao_receber: CallbackPreco) -> None:
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._executar, args=(ao_receber,), daemon=True)
+        self._thread.start()
+
+    def _executar(self, ao_receber: CallbackPreco) -> None:
+        while not self._parar.is_set():
+            agora = self.exchange.relogio.agora_ms()
+            for simbolo in self.simbolos:
+                ao_receber(simbolo, self.exchange.preco(simbolo, agora), agora)
+            self.exchange.relogio.dormir(self.intervalo)
+
+    def parar(self) -> None:
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class ServidorExchangeSimulada:
+    """Servidor HTTP local com os endpoints REST da Binance usados pelo bot.
+
+    Aponte um `binance.client.Client` para `url` com `criar_cliente_local`.
+    Assinaturas e chaves de API são aceitas sem verificação.
+    """
+
+    def __init__(self, exchange: ExchangeSimulada, host: str = "127.0.0.1", porta: int = 0):
+        self.exchange = exchange
+        self._servidor = ThreadingHTTPServer((host, porta), self._criar_manipulador())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, porta = self._servidor.server_address[:2]
+        return f"http://{host}:{porta}/api"
+
+    def iniciar(self) -> str:
+        self._thread = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+        self._thread.start()
+        logging.info(f"Exchange simulada ouvindo em {self.url}")
+        return self.url
+
+    def parar(self) -> None:
+        self._servidor.shutdown()
+        self._servidor.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _criar_manipulador(self):
+        exchange = self.exchange
+
+        rotas = {
+            ("GET", "/api/v3/ping"): lambda p: exchange.ping(),
+            ("GET", "/api/v3/time"): lambda p: exchange.get_server_time(),
+            ("GET", "/api/v3/account"): lambda p: exchange.get_account(**p),
+            ("GET", "/api/v3/ticker/price"): lambda p: exchange.get_symbol_ticker(**p),
+            ("GET", "/api/v3/klines"): lambda p: exchange.get_klines(**p),
+            ("GET", "/api/v3/exchangeInfo"): lambda p: (
+                {"symbols": [exchange.get_symbol_info(p["symbol"])]} if "symbol" in p
+                else exchange.get_exchange_info()
+            ),
+            ("POST", "/api/v3/order"): lambda p: exchange.create_order(**p),
+            ("POST", "/api/v3/orderList/oco"): lambda p: exchange.create_oco_order(**p),
+            ("GET", "/api/v3/openOrders"): lambda p: exchange.get_open_orders(**p),
+            ("GET", "/api/v3/order"): lambda p: exchange.get_order(**p),
+            ("DELETE", "/api/v3/order"): lambda p: exchange.cancel_order(**p),
+        }
+
+        class Manipulador(BaseHTTPRequestHandler):
+            def _responder(self, metodo):
+                url = urlparse(self.path)
+                parametros = dict(parse_qsl(url.query))
+                tamanho = int(self.headers.get("Content-Length") or 0)
+                if tamanho:
+                    parametros.update(parse_qsl(self.rfile.read(tamanho).decode()))
+                for chave in ("timestamp", "signature", "recvWindow"):
+                    parametros.pop(chave, None)
+
+                rota = rotas.get((metodo, url.path))
+                try:
+                    if rota is None:
+                        raise ErroExchangeSimulada(404, -1000, f"Unknown endpoint {metodo} {url.path}")
+                    status, corpo = 200, rota(parametros)
+                except ErroExchangeSimulada as e:
+                    status, corpo = e.status_code, {"code": e.code, "msg": e.message}
+                except (TypeError, ValueError, KeyError) as e:
+                    status, corpo = 400, {"code": -1102, "msg": str(e)}
+
+                dados = json.dumps(corpo).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(dados)))
+                self.send_header("X-MBX-USED-WEIGHT-1M", str(exchange.peso_usado()))
+                self.end_headers()
+                self.wfile.write(dados)
+
+            def do_GET(self):
+                self._responder("GET")
+
+            def do_POST(self):
+                self._responder("POST")
+
+            def do_DELETE(self):
+                self._responder("DELETE")
+
+            def log_message(self, formato, *args):
+                logging.debug("Exchange simulada: " + formato % args)
+
+        return Manipulador
+
+
+def criar_cliente_local(url: str, api_key: str = "simulada", api_secret: str = "simulada"):
+    """Cria um binance.client.Client cujas chamadas REST vão para o servidor local."""
+    from binance.client import Client
+
+    # API_URL precisa estar definido antes do __init__, que já faz um ping
+    ClienteLocal = type("ClienteLocal", (Client,), {"API_URL": url})
+    return ClienteLocal(api_key, api_secret)
+
+
+def criar_exchange(simbolos: Iterable[str], intervalo: str, armazem=None, velocidade: Optional[float] = 1.0,
+                   candles_sinteticos: int = 5000, semente: Optional[int] = None, **opcoes) -> ExchangeSimulada:
+    """Monta uma exchange com os candles gravados no armazém ou, na falta deles, sintéticos."""
+    candles = {}
+    for i, simbolo in enumerate(simbolos):
+        gravados = armazem.ler(simbolo, intervalo) if armazem is not None else None
+        if gravados is not None and len(gravados) > 1:
+            candles[simbolo] = gravados
+        else:
+            candles[simbolo] = gerar_candles_sinteticos(
+                candles_sinteticos, intervalo, preco_inicial=float(10 ** (i % 5)),
+                semente=None if semente is None else semente + i
+            )
+    primeiro = min(int(c["open_time"][min(1000, len(c) - 1)]) for c in candles.values())
+    return ExchangeSimulada(candles, intervalo, relogio=RelogioSimulado(primeiro, velocidade), **opcoes)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    argumentos = argparse.ArgumentParser(description="Servidor local que simula a API REST da Binance")
+    argumentos.add_argument("--simbolos", type=int, default=100, help="Quantidade de símbolos sintéticos")
+    argumentos.add_argument("--intervalo", default="1h")
+    argumentos.add_argument("--velocidade", type=float, default=60.0, help="Aceleração do relógio")
+    argumentos.add_argument("--latencia", type=float, default=0.0, help="Latência por chamada em segundos")
+    argumentos.add_argument("--porta", type=int, default=8765)
+    opcoes = argumentos.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    exchange = criar_exchange(
+        simbolos_sinteticos(opcoes.simbolos), opcoes.intervalo,
+        velocidade=opcoes.velocidade, latencia=opcoes.latencia, semente=0
+    )
+    servidor = ServidorExchangeSimulada(exchange, porta=opcoes.porta)
+    servidor.iniciar()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        servidor.parar()
@@ -0,0 +1,105 @@
+# execucao_ordens.py - tempos e qualidade de execução das ordens (preço médio, taxas, slippage)
+
+from decimal import Decimal
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+PERCENTIS = (50, 95, 99)
+
+
+def analisar_ordem(ordem: dict, tipo: str, preco_referencia: float, ativo_base: str, ativo_quote: str,
+                   tempo_sinal: Optional[int] = None, tempo_envio: Optional[int] = None,
+                   tempo_resposta: Optional[int] = None) -> dict:
+    """Resume a execução de uma ordem a partir da resposta da Binance.
+
+    `tipo` é "compra" ou "venda"; `preco_referencia` é o preço que motivou a
+    ordem (ticker do ciclo, tick do monitor ou preço de disparo da OCO). Os
+    tempos locais estão em ms no relógio do bot; `tempo_ack` e `tempo_execucao`
+    vêm da exchange (transactTime / updateTime) e podem ter deriva de relógio.
+
+    O slippage é positivo quando a execução foi pior que a referência
+    (compra mais cara ou venda mais barata), em pontos-base.
+    """
+    quantidade = Decimal(ordem.get("executedQty") or "0")
+    valor = Decimal(ordem.get("cummulativeQuoteQty") or "0")
+    taxas: Dict[str, float] = {}
+    for fill in ordem.get("fills", []):
+        ativo = fill.get("commissionAsset")
+        if ativo:
+            taxas[ativo] = taxas.get(ativo, 0.0) + float(fill["commission"])
+    if not quantidade and ordem.get("fills"):
+        quantidade = sum(Decimal(f["qty"]) for f in ordem["fills"])
+        valor = sum(Decimal(f["qty"]) * Decimal(f["price"]) for f in ordem["fills"])
+
+    preco_medio = float(valor / quantidade) if quantidade else None
+    # Taxas convertidas para o ativo de cotação; outras moedas (ex.: BNB) ficam só em `taxas`
+    taxa_quote = taxas.get(ativo_quote, 0.0)
+    if preco_medio is not None:
+        taxa_quote += taxas.get(ativo_base, 0.0) * preco_medio
+
+    slippage_bps = None
+    if preco_medio is not None and preco_referencia:
+        relativo = preco_medio / preco_referencia - 1
+        slippage_bps = (relativo if tipo == "compra" else -relativo) * 10000
+
+    tempo_ack = ordem.get("transactTime")
+    tempo_execucao = ordem.get("updateTime") or tempo_ack
+    return {
+        "tempo_sinal": tempo_sinal,
+        "tempo_envio": tempo_envio,
+        "tempo_ack": tempo_ack,
+        "tempo_resposta": tempo_resposta,
+        "tempo_execucao": tempo_execucao,
+        "latencia_ms": tempo_resposta - tempo_sinal if tempo_resposta is not None and tempo_sinal is not None else None,
+        "ida_e_volta_ms": tempo_resposta - tempo_envio if tempo_resposta is not None and tempo_envio is not None else None,
+        "preco_referencia": preco_referencia,
+        "preco_medio": preco_medio,
+        "quantidade": format(quantidade.normalize(), "f"),
+        "valor": float(valor),
+        "taxas": taxas,
+        "taxa_quote": taxa_quote,
+        "slippage_bps": slippage_bps,
+        "status": ordem.get("status"),
+        "id_ordem": ordem.get("orderId"),
+    }
+
+
+def _percentis(valores: list) -> Optional[Dict[str, float]]:
+    if not valores:
+        return None
+    resultado = np.percentile(np.asarray(valores, dtype=np.float64), PERCENTIS)
+    return {f"p{p}": float(v) for p, v in zip(PERCENTIS, resultado)}
+
+
+def estatisticas_execucao(operacoes: Iterable[dict]) -> Dict[str, dict]:
+    """Latência sinal→resposta, ida e volta e slippage (p50/p95/p99) por moeda.
+
+    Considera só as operações que registraram `execucao`; percentis ficam
+    None quando nenhuma ordem da moeda tem aquela medida.
+    """
+    por_moeda: Dict[str, Dict[str, list]] = {}
+    ordens: Dict[str, int] = {}
+    for operacao in operacoes:
+        execucao = operacao.get("execucao")
+        if not execucao:
+            continue
+        moeda = operacao["moeda"]
+        ordens[moeda] = ordens.get(moeda, 0) + 1
+        medidas = por_moeda.setdefault(moeda, {
+            "latencia_ms": [], "ida_e_volta_ms": [], "slippage_bps": [], "taxa_quote": []
+        })
+        for chave, valores in medidas.items():
+            if execucao.get(chave) is not None:
+                valores.append(execucao[chave])
+
+    return {
+        moeda: {
+            "ordens": ordens[moeda],
+            "latencia_ms": _percentis(medidas["latencia_ms"]),
+            "ida_e_volta_ms": _percentis(medidas["ida_e_volta_ms"]),
+            "slippage_bps": _percentis(medidas["slippage_bps"]),
+            "taxas_quote": float(sum(medidas["taxa_quote"])),
+        }
+        for moeda, medidas in por_moeda.items()
+    }
@@ -0,0 +1,157 @@
+# filtros_simbolos.py - registro em cache dos filtros de negociação da Binance
+
+import os
+import json
+import time
+import logging
+import threading
+import traceback
+from dataclasses import dataclass, asdict
+from decimal import Decimal, ROUND_DOWN
+from typing import Callable, Dict, Optional
+
+
+@dataclass(frozen=True)
+class FiltrosSimbolo:
+    """Filtros LOT_SIZE, NOTIONAL e PRICE_FILTER de um símbolo, em Decimal."""
+    symbol: str
+    base: str
+    quote: str
+    min_qty: Decimal
+    max_qty: Decimal
+    step_size: Decimal
+    min_notional: Decimal
+    tick_size: Decimal
+    min_price: Decimal
+    max_price: Decimal
+
+    @classmethod
+    def de_info(cls, info: dict) -> "FiltrosSimbolo":
+        """Monta os filtros a partir de um item de `exchangeInfo['symbols']`."""
+        filtros = {f['filterType']: f for f in info['filters']}
+        lot = filtros.get('LOT_SIZE', {})
+        notional = filtros.get('NOTIONAL') or filtros.get('MIN_NOTIONAL') or {}
+        preco = filtros.get('PRICE_FILTER', {})
+        return cls(
+            symbol=info['symbol'],
+            base=info.get('baseAsset', ''),
+            quote=info.get('quoteAsset', ''),
+            min_qty=Decimal(lot.get('minQty', '0')),
+            max_qty=Decimal(lot.get('maxQty', '0')),
+            step_size=Decimal(lot.get('stepSize', '0')),
+            min_notional=Decimal(notional.get('minNotional', '0')),
+            tick_size=Decimal(preco.get('tickSize', '0')),
+            min_price=Decimal(preco.get('minPrice', '0')),
+            max_price=Decimal(preco.get('maxPrice', '0')),
+        )
+
+    @classmethod
+    def de_dict(cls, dados: dict) -> "FiltrosSimbolo":
+        return cls(**{k: (v if k in ('symbol', 'base', 'quote') else Decimal(v)) for k, v in dados.items()})
+
+    def para_dict(self) -> dict:
+        return {k: (v if isinstance(v, str) else str(v)) for k, v in asdict(self).items()}
+
+    def quantizar_quantidade(self, quantidade: Decimal) -> Decimal:
+        """Arredonda a quantidade para baixo até o múltiplo de stepSize mais próximo."""
+        return _quantizar(quantidade, self.step_size)
+
+    def quantizar_preco(self, preco: Decimal) -> Decimal:
+        """Arredonda o preço para baixo até o múltiplo de tickSize mais próximo."""
+        return _quantizar(preco, self.tick_size)
+
+
+def _quantizar(valor: Decimal, passo: Decimal) -> Decimal:
+    if passo <= 0:
+        return valor
+    multiplos = (valor / passo).to_integral_value(rounding=ROUND_DOWN)
+    return (multiplos * passo).quantize(passo.normalize(), rounding=ROUND_DOWN)
+
+
+def formatar_decimal(valor: Decimal) -> str:
+    """Formata um Decimal sem notação científica e sem zeros à direita."""
+    texto = format(valor, 'f')
+    if '.' in texto:
+        texto = texto.rstrip('0').rstrip('.')
+    return texto
+
+
+class RegistroFiltros:
+    """Registro de filtros de todos os símbolos, carregado uma vez do exchangeInfo.
+
+    Os filtros ficam em memória e são recarregados após `ttl` segundos. Uma
+    cópia em disco permite iniciar o processo sem consultar a Binance.
+    """
+
+    def __init__(self, buscar_exchange_info: Callable[[], dict], arquivo_cache: str,
+                 ttl: float = 6 * 60 * 60, intervalo_minimo: float = 60):
+        self._buscar_exchange_info = buscar_exchange_info
+        self.arquivo_cache = arquivo_cache
+        self.ttl = ttl
+        # Intervalo mínimo entre consultas ao exchangeInfo (peso alto na Binance)
+        self.intervalo_minimo = intervalo_minimo
+        self._filtros: Dict[str, FiltrosSimbolo] = {}
+        self._carregado_em = 0.0
+        self._ultima_tentativa = 0.0
+        self._trava = threading.Lock()
+
+    def obter(self, symbol: str) -> Optional[FiltrosSimbolo]:
+        """Filtros do símbolo ou None se ele não existir na Binance."""
+        with self._trava:
+            if not self._filtros:
+                self._carregar_cache()
+            agora = time.time()
+            expirado = agora - self._carregado_em > self.ttl
+            # Símbolo ausente pode ter sido listado depois da última carga
+            if (expirado or symbol not in self._filtros) and agora - self._ultima_tentativa >= self.intervalo_minimo:
+                self._atualizar()
+            return self._filtros.get(symbol)
+
+    def atualizar(self) -> None:
+        """Força o recarregamento dos filtros a partir da Binance."""
+        with self._trava:
+            self._atualizar()
+
+    def _carregar_cache(self) -> None:
+        if not os.path.exists(self.arquivo_cache):
+            return
+        try:
+            with open(self.arquivo_cache, "r") as f:
+                conteudo = json.load(f)
+            self._filtros = {d['symbol']: FiltrosSimbolo.de_dict(d) for d in conteudo['simbolos']}
+            self._carregado_em = conteudo['carregado_em']
+            logging.info(f"Filtros de {len(self._filtros)} símbolos carregados do cache {self.arquivo_cache}")
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logging.warning(f"Cache de filtros inválido ({e}). Será recarregado da Binance.")
+            self._filtros = {}
+            self._carregado_em = 0.0
+
+    def _atualizar(self) -> None:
+        self._ultima_tentativa = time.time()
+        try:
+            info = self._buscar_exchange_info()
+            filtros = {}
+            for simbolo in info['symbols']:
+                if simbolo.get('status', 'TRADING') != 'TRADING':
+                    continue
+                filtros[simbolo['symbol']] = FiltrosSimbolo.de_info(simbolo)
+        except Exception as e:
+            # Mantém os filtros anteriores; tenta de novo na próxima consulta
+            logging.error(f"Erro ao atualizar filtros de símbolos: {e}")
+            logging.error(traceback.format_exc())
+            return
+
+        self._filtros = filtros
+        self._carregado_em = time.time()
+        logging.info(f"Filtros de {len(filtros)} símbolos atualizados a partir do exchangeInfo")
+
+        try:
+            temporario = self.arquivo_cache + ".tmp"
+            with open(temporario, "w") as f:
+                json.dump({
+                    "carregado_em": self._carregado_em,
+                    "simbolos": [filtro.para_dict() for filtro in filtros.values()]
+                }, f)
+            os.replace(temporario, self.arquivo_cache)
+        except OSError as e:
+            logging.warning(f"Não foi possível gravar o cache de filtros: {e}")
@@ -0,0 +1,173 @@
+# graficos.py - renderização dos gráficos dos símbolos fora do ciclo de decisão
+
+import os
+import io
+import time
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+import pandas as pd
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+# Colunas usadas no desenho; o restante do DataFrame não é copiado para o trabalhador
+COLUNAS_GRAFICO = ("close_time", "close", "media_curta", "media_longa", "rsi")
+
+# (preço de compra, stop-loss, take-profit) da posição aberta
+Posicao = Tuple[float, float, float]
+
+
+class RenderizadorGraficos:
+    """Gera os PNGs dos símbolos em segundo plano com a API orientada a objetos do Agg.
+
+    `agendar` só copia as colunas necessárias e retorna; o desenho acontece em
+    um pool de threads, reaproveitando uma Figure por símbolo. Se o último
+    candle e os limites da posição não mudaram desde o último gráfico, nada é
+    redesenhado. Pedidos para um símbolo que ainda não começou a ser desenhado
+    são agrupados: só o mais recente é renderizado.
+
+    O PNG mais recente de cada símbolo fica em memória (`ultimo_png`) e também
+    é gravado em `pasta` para os processos que leem o arquivo (bot do Discord).
+    """
+
+    def __init__(self, pasta: str, janela_curta: int, janela_longa: int,
+                 limites_rsi: Optional[Tuple[float, float]] = None,
+                 ao_renderizar: Optional[Callable[[str, str, bytes], None]] = None,
+                 max_workers: int = 2):
+        self.pasta = pasta
+        self.janela_curta = janela_curta
+        self.janela_longa = janela_longa
+        self.limites_rsi = limites_rsi  # (sobrevenda, sobrecompra); None desativa o painel de RSI
+        self.ao_renderizar = ao_renderizar
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="graficos")
+        self._trava = threading.Lock()
+        self._travas_simbolo: Dict[str, threading.Lock] = {}
+        self._figuras: Dict[str, Figure] = {}
+        self._pendentes: Dict[str, tuple] = {}
+        self._chaves: Dict[str, tuple] = {}
+        self._png: Dict[str, bytes] = {}
+        os.makedirs(pasta, exist_ok=True)
+
+    def caminho(self, simbolo: str) -> str:
+        return os.path.join(self.pasta, f"grafico_{simbolo}.png")
+
+    def ultimo_png(self, simbolo: str) -> Optional[bytes]:
+        """Bytes do gráfico mais recente do símbolo, ou None se ainda não foi gerado."""
+        with self._trava:
+            return self._png.get(simbolo)
+
+    def agendar(self, simbolo: str, df: pd.DataFrame, posicao: Optional[Posicao] = None) -> bool:
+        """Agenda o gráfico do símbolo; retorna False se ele já está atualizado."""
+        if df.empty:
+            return False
+        chave = (df["close_time"].iloc[-1], float(df["close"].iloc[-1]), posicao)
+        colunas = [c for c in COLUNAS_GRAFICO if c in df.columns]
+        with self._trava:
+            if self._chaves.get(simbolo) == chave:
+                return False
+            self._chaves[simbolo] = chave
+            ja_agendado = simbolo in self._pendentes
+            self._pendentes[simbolo] = (df[colunas].copy(), posicao)
+            if simbolo not in self._travas_simbolo:
+                self._travas_simbolo[simbolo] = threading.Lock()
+        if not ja_agendado:
+            self._executor.submit(self._trabalhar, simbolo)
+        return True
+
+    def _trabalhar(self, simbolo: str) -> None:
+        # A Figure do símbolo é desenhada por um trabalhador de cada vez
+        with self._travas_simbolo[simbolo]:
+            with self._trava:
+                pendente = self._pendentes.pop(simbolo, None)
+            if pendente is None:
+                return
+            df, posicao = pendente
+            inicio = time.perf_counter()
+            try:
+                png = self._desenhar(simbolo, df, posicao)
+                caminho = self.caminho(simbolo)
+                # Grava em arquivo temporário e troca, para o leitor nunca ver um PNG pela metade
+                temporario = f"{caminho}.tmp"
+                with open(temporario, "wb") as f:
+                    f.write(png)
+                os.replace(temporario, caminho)
+            except Exception as e:
+                logging.error(f"Erro ao gerar gráfico para {simbolo}: {e}")
+                logging.error(traceback.format_exc())
+                with self._trava:
+                    # Permite nova tentativa no próximo ciclo, mesmo sem mudança nos dados
+                    self._chaves.pop(simbolo, None)
+                return
+            with self._trava:
+                self._png[simbolo] = png
+            logging.info(f"Gráfico de {simbolo} salvo em {caminho} ({(time.perf_counter() - inicio) * 1000:.0f} ms)")
+
+        if self.ao_renderizar is not None:
+            try:
+                self.ao_renderizar(simbolo, caminho, png)
+            except Exception as e:
+                logging.error(f"Erro ao publicar gráfico de {simbolo}: {e}")
+
+    def _desenhar(self, simbolo: str, df: pd.DataFrame, posicao: Optional[Posicao]) -> bytes:
+        figura = self._figuras.get(simbolo)
+        if figura is None:
+            figura = Figure(figsize=(12, 8))
+            FigureCanvasAgg(figura)
+            self._figuras[simbolo] = figura
+        figura.clear()
+
+        usar_rsi = self.limites_rsi is not None and "rsi" in df.columns
+        # Subplot principal para preço e médias
+        ax1 = figura.add_subplot(2, 1, 1)
+        ax1.plot(df["close_time"], df["close"], label="Preço", color="blue")
+        ax1.plot(df["close_time"], df["media_curta"], label=f"Média {self.janela_curta}", linestyle="--", color="green")
+        ax1.plot(df["close_time"], df["media_longa"], label=f"Média {self.janela_longa}", linestyle="--", color="red")
+
+        # Linhas de compra, stop-loss e take-profit se estiver em posição
+        if posicao is not None:
+            preco_compra, stop_loss, take_profit = posicao
+            ax1.axhline(y=preco_compra, color="black", linestyle="-", alpha=0.5, label=f"Preço de Compra: {preco_compra:.2f}")
+            ax1.axhline(y=stop_loss, color="red", linestyle=":", alpha=0.5, label=f"Stop-Loss: {stop_loss:.2f}")
+            ax1.axhline(y=take_profit, color="green", linestyle=":", alpha=0.5, label=f"Take-Profit: {take_profit:.2f}")
+
+        ax1.set_title(f"{simbolo} - Análise Técnica")
+        ax1.set_ylabel("Preço (USDT)")
+        ax1.grid(True)
+        ax1.legend()
+
+        # Subplot para RSI
+        if usar_rsi:
+            sobrevenda, sobrecompra = self.limites_rsi
+            ax2 = figura.add_subplot(2, 1, 2, sharex=ax1)
+            ax2.plot(df["close_time"], df["rsi"], label="RSI", color="purple")
+            ax2.axhline(y=sobrecompra, color="red", linestyle="--", alpha=0.5)
+            ax2.axhline(y=sobrevenda, color="green", linestyle="--", alpha=0.5)
+            ax2.set_ylabel("RSI")
+            ax2.set_ylim(0, 100)
+            ax2.grid(True)
+            ax2.legend()
+
+        figura.tight_layout()
+        saida = io.BytesIO()
+        figura.savefig(saida, format="png")
+        return saida.getvalue()
+
+    def aguardar(self, timeout: Optional[float] = None) -> bool:
+        """Espera os gráficos agendados terminarem; retorna False se o prazo acabou."""
+        limite = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._trava:
+                simbolos = list(self._travas_simbolo.items())
+                pendente = bool(self._pendentes)
+            ocupado = pendente or any(trava.locked() for _, trava in simbolos)
+            if not ocupado:
+                return True
+            if limite is not None and time.monotonic() >= limite:
+                return False
+            time.sleep(0.05)
+
+    def encerrar(self) -> None:
+        self._executor.shutdown(wait=True)
@@ -1,35 +1,136 @@
 # indicadores.py - cálculo de indicadores técnicos
 
+from typing import Dict, Iterable
+
 import pandas as pd
 import numpy as np
 
 
+# Kernels vetorizados: recebem fechamentos em um array 1-D (um símbolo) ou
+# 2-D (símbolos x candles, em ordem cronológica) e retornam arrays do mesmo
+# formato. Históricos mais curtos devem ser preenchidos com NaN à esquerda.
+
+def _como_matriz(fechamentos) -> np.ndarray:
+    return np.atleast_2d(np.asarray(fechamentos, dtype=np.float64))
+
+
+def _mesmo_formato(resultado: np.ndarray, fechamentos) -> np.ndarray:
+    return resultado[0] if np.ndim(fechamentos) == 1 else resultado
+
+
+def empilhar_fechamentos(series: Iterable, tamanho: int = None) -> np.ndarray:
+    """Monta a matriz símbolos x candles alinhada à direita (candle mais recente na última coluna)."""
+    series = [np.asarray(s, dtype=np.float64) for s in series]
+    if tamanho is None:
+        tamanho = max((len(s) for s in series), default=0)
+    matriz = np.full((len(series), tamanho), np.nan)
+    for i, s in enumerate(series):
+        s = s[-tamanho:] if tamanho else s[:0]
+        matriz[i, tamanho - len(s):] = s
+    return matriz
+
+
+def media_movel_matriz(fechamentos, janela: int) -> np.ndarray:
+    """Média móvel simples, equivalente a `rolling(janela).mean()` em cada linha."""
+    x = _como_matriz(fechamentos)
+    simbolos, candles = x.shape
+    resultado = np.full_like(x, np.nan)
+    if janela < 1 or candles < janela:
+        return _mesmo_formato(resultado, fechamentos)
+
+    faltantes = np.isnan(x)
+    # Centraliza cada linha no último preço para reduzir o erro da soma acumulada
+    referencia = np.nan_to_num(x[:, -1:])
+    valores = np.where(faltantes, 0.0, x - referencia)
+
+    soma = np.zeros((simbolos, candles + 1))
+    np.cumsum(valores, axis=1, out=soma[:, 1:])
+    nans = np.zeros((simbolos, candles + 1), dtype=np.int64)
+    np.cumsum(faltantes, axis=1, out=nans[:, 1:])
+
+    soma_janela = soma[:, janela:] - soma[:, :-janela]
+    completa = (nans[:, janela:] - nans[:, :-janela]) == 0
+    resultado[:, janela - 1:] = np.where(completa, soma_janela / janela + referencia, np.nan)
+    return _mesmo_formato(resultado, fechamentos)
+
+
+def ema_matriz(fechamentos, periodo: int) -> np.ndarray:
+    """Média exponencial, equivalente a `ewm(span=periodo, adjust=False).mean()` em cada linha.
+
+    A recursão roda no kernel do pandas, com um símbolo por coluna.
+    """
+    x = _como_matriz(fechamentos)
+    if x.shape[1] == 0:
+        return _mesmo_formato(np.empty_like(x), fechamentos)
+    resultado = pd.DataFrame(x.T).ewm(span=periodo, adjust=False).mean().to_numpy().T
+    return _mesmo_formato(resultado, fechamentos)
+
+
+def rsi_matriz(fechamentos, periodo: int = 14, primeiro_delta_zero: bool = False) -> np.ndarray:
+    """RSI com médias simples de ganhos e perdas.
+
+    Com `primeiro_delta_zero=True` o primeiro candle conta como variação zero
+    em vez de NaN, liberando o primeiro valor do RSI um candle antes.
+    """
+    x = _como_matriz(fechamentos)
+    delta = np.full_like(x, np.nan)
+    delta[:, 1:] = np.diff(x, axis=1)
+    if primeiro_delta_zero:
+        delta[:, 0] = 0.0
+
+    with np.errstate(invalid="ignore"):
+        ganho = np.where(delta > 0, delta, 0.0)
+        perda = -np.where(delta < 0, delta, 0.0)
+    ganho[np.isnan(delta)] = np.nan
+    perda[np.isnan(delta)] = np.nan
+
+    media_ganho = media_movel_matriz(ganho, periodo)
+    media_perda = media_movel_matriz(perda, periodo)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = media_ganho / media_perda
+        rsi = 100 - (100 / (1 + rs))
+    return _mesmo_formato(rsi, fechamentos)
+
+
+def macd_matriz(fechamentos, rapida: int = 12, lenta: int = 26, sinal: int = 9) -> Dict[str, np.ndarray]:
+    """Linhas de MACD, sinal e histograma."""
+    macd = ema_matriz(fechamentos, rapida) - ema_matriz(fechamentos, lenta)
+    linha_sinal = ema_matriz(macd, sinal)
+    return {
+        'macd': macd,
+        'signal': linha_sinal,
+        'histograma': macd - linha_sinal
+    }
+
+
+def indicadores_matriz(fechamentos, janela_curta: int = 7, janela_longa: int = 40,
+                       periodo_rsi: int = 14, primeiro_delta_zero: bool = True) -> Dict[str, np.ndarray]:
+    """Todos os indicadores usados pelo bot para vários símbolos de uma vez."""
+    x = np.asarray(fechamentos, dtype=np.float64)
+    resultado = {
+        'media_curta': media_movel_matriz(x, janela_curta),
+        'media_longa': media_movel_matriz(x, janela_longa),
+        'rsi': rsi_matriz(x, periodo_rsi, primeiro_delta_zero),
+        'ema21': ema_matriz(x, 21),
+    }
+    resultado.update(macd_matriz(x))
+    return resultado
+
+
+def _fechamentos(df: pd.DataFrame) -> np.ndarray:
+    return df['close'].to_numpy(dtype=np.float64)
+
+
 def calcular_rsi(df: pd.DataFrame, periodo: int = 14) -> pd.Series:
-    delta = df['close'].diff()
-    ganho = delta.clip(lower=0)
-    perda = -delta.clip(upper=0)
-    media_ganho = ganho.rolling(window=periodo).mean()
-    media_perda = perda.rolling(window=periodo).mean()
-    rs = media_ganho / media_perda
-    rsi = 100 - (100 / (1 + rs))
-    return rsi
+    return pd.Series(rsi_matriz(_fechamentos(df), periodo), index=df.index, name='close')
 
 
 def calcular_ema(df: pd.DataFrame, periodo: int = 21) -> pd.Series:
-    return df['close'].ewm(span=periodo, adjust=False).mean()
+    return pd.Series(ema_matriz(_fechamentos(df), periodo), index=df.index, name='close')
 
 
 def calcular_macd(df: pd.DataFrame) -> pd.DataFrame:
-    ema12 = df['close'].ewm(span=12, adjust=False).mean()
-    ema26 = df['close'].ewm(span=26, adjust=False).mean()
-    macd = ema12 - ema26
-    signal = macd.ewm(span=9, adjust=False).mean()
-    histograma = macd - signal
-    return pd.DataFrame({
-        'macd': macd,
-        'signal': signal,
-        'histograma': histograma
-    })
+    return pd.DataFrame(macd_matriz(_fechamentos(df)), index=df.index)
 
 
 def adicionar_indicadores(df: pd.DataFrame) -> pd.DataFrame:
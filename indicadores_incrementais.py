@@ -0,0 +1,362 @@
+# indicadores_incrementais.py - indicadores técnicos atualizados em O(1) por candle
+
+import math
+from collections import deque
+from typing import Dict, Iterable, Optional
+
+NAN = float("nan")
+
+
+class MediaMovel:
+    """Média móvel simples com buffer circular, equivalente a `indicadores.media_movel_matriz`.
+
+    A soma da janela é atualizada a cada candle e recalculada do zero a cada
+    `periodo` candles, para que o erro de arredondamento não se acumule; o
+    resultado difere do kernel vetorizado só na ordem das somas (~1e-12
+    relativo). A média é NaN até haver `periodo` valores, e um NaN na
+    janela a invalida enquanto estiver nela.
+    """
+
+    def __init__(self, periodo: int):
+        if periodo < 1:
+            raise ValueError("periodo deve ser maior que zero")
+        self.periodo = periodo
+        self._janela: deque = deque(maxlen=periodo)
+        self._soma = 0.0
+        self._faltantes = 0
+        self._desde_recalculo = 0
+        self.valor = NAN
+
+    def _calcular(self, valor: float, aplicar: bool) -> float:
+        soma, faltantes = self._soma, self._faltantes
+        cheia = len(self._janela) == self.periodo
+        if cheia:
+            antigo = self._janela[0]
+            if math.isnan(antigo):
+                faltantes -= 1
+            else:
+                soma -= antigo
+        if math.isnan(valor):
+            faltantes += 1
+        else:
+            soma += valor
+
+        desde_recalculo = self._desde_recalculo + 1
+        if desde_recalculo >= self.periodo:
+            janela = list(self._janela)[1 if cheia else 0:] + [valor]
+            soma = math.fsum(v for v in janela if not math.isnan(v))
+            desde_recalculo = 0
+
+        preenchida = cheia or len(self._janela) + 1 == self.periodo
+        resultado = soma / self.periodo if preenchida and faltantes == 0 else NAN
+
+        if aplicar:
+            self._janela.append(valor)
+            self._soma, self._faltantes = soma, faltantes
+            self._desde_recalculo = desde_recalculo
+            self.valor = resultado
+        return resultado
+
+    def atualizar(self, valor: float) -> float:
+        """Adiciona o valor de um candle fechado e retorna a média atualizada."""
+        return self._calcular(float(valor), aplicar=True)
+
+    def previa(self, valor: float) -> float:
+        """Média que resultaria de `valor` (ex.: candle em formação), sem alterar o estado."""
+        return self._calcular(float(valor), aplicar=False)
+
+    def para_dict(self) -> dict:
+        return {
+            "periodo": self.periodo,
+            "janela": list(self._janela),
+            "soma": self._soma,
+            "faltantes": self._faltantes,
+            "desde_recalculo": self._desde_recalculo,
+            "valor": self.valor,
+        }
+
+    @classmethod
+    def de_dict(cls, dados: dict) -> "MediaMovel":
+        media = cls(dados["periodo"])
+        media._janela.extend(dados["janela"])
+        media._soma = dados["soma"]
+        media._faltantes = dados["faltantes"]
+        media._desde_recalculo = dados["desde_recalculo"]
+        media.valor = dados["valor"]
+        return media
+
+
+class MediaExponencial:
+    """Média exponencial, equivalente a `indicadores.ema_matriz` (`ewm(span=periodo, adjust=False)`)."""
+
+    def __init__(self, periodo: int):
+        if periodo < 1:
+            raise ValueError("periodo deve ser maior que zero")
+        self.periodo = periodo
+        self._alfa = 2.0 / (periodo + 1)
+        self._fator_antigo = 1.0 - self._alfa
+        self.valor = NAN
+
+    def _calcular(self, valor: float) -> float:
+        if math.isnan(valor):
+            return self.valor
+        if math.isnan(self.valor):
+            return valor
+        return self._fator_antigo * self.valor + self._alfa * valor
+
+    def atualizar(self, valor: float) -> float:
+        self.valor = self._calcular(float(valor))
+        return self.valor
+
+    def previa(self, valor: float) -> float:
+        return self._calcular(float(valor))
+
+    def para_dict(self) -> dict:
+        return {"periodo": self.periodo, "valor": self.valor}
+
+    @classmethod
+    def de_dict(cls, dados: dict) -> "MediaExponencial":
+        media = cls(dados["periodo"])
+        media.valor = dados["valor"]
+        return media
+
+
+class MediaWilder:
+    """Suavização de Wilder (alfa = 1/periodo) iniciada pela média simples dos primeiros valores."""
+
+    def __init__(self, periodo: int):
+        if periodo < 1:
+            raise ValueError("periodo deve ser maior que zero")
+        self.periodo = periodo
+        self._soma_inicial = 0.0
+        self._contagem = 0
+        self.valor = NAN
+
+    def _calcular(self, valor: float):
+        if math.isnan(valor):
+            return self._soma_inicial, self._contagem, self.valor
+        if self._contagem < self.periodo:
+            soma, contagem = self._soma_inicial + valor, self._contagem + 1
+            return soma, contagem, (soma / contagem if contagem == self.periodo else NAN)
+        return self._soma_inicial, self._contagem, (self.valor * (self.periodo - 1) + valor) / self.periodo
+
+    def atualizar(self, valor: float) -> float:
+        self._soma_inicial, self._contagem, self.valor = self._calcular(float(valor))
+        return self.valor
+
+    def previa(self, valor: float) -> float:
+        return self._calcular(float(valor))[2]
+
+    def para_dict(self) -> dict:
+        return {"periodo": self.periodo, "soma_inicial": self._soma_inicial,
+                "contagem": self._contagem, "valor": self.valor}
+
+    @classmethod
+    def de_dict(cls, dados: dict) -> "MediaWilder":
+        media = cls(dados["periodo"])
+        media._soma_inicial = dados["soma_inicial"]
+        media._contagem = dados["contagem"]
+        media.valor = dados["valor"]
+        return media
+
+
+def _rsi(media_ganho: float, media_perda: float) -> float:
+    # Mesma semântica de `indicadores.rsi_matriz`: x/0 -> RSI 100, 0/0 -> NaN
+    if math.isnan(media_ganho) or math.isnan(media_perda):
+        return NAN
+    if media_perda == 0:
+        return NAN if media_ganho == 0 else 100.0
+    return 100 - (100 / (1 + media_ganho / media_perda))
+
+
+class RSI:
+    """RSI incremental.
+
+    `metodo="simples"` usa médias móveis simples de ganhos e perdas, como
+    `indicadores.rsi_matriz`; com `primeiro_delta_zero=True` o primeiro
+    candle conta como variação zero, como `bot_trading.calcular_indicadores`.
+    `metodo="wilder"` usa a suavização clássica de Wilder.
+    """
+
+    def __init__(self, periodo: int = 14, metodo: str = "simples", primeiro_delta_zero: bool = False):
+        if metodo not in ("simples", "wilder"):
+            raise ValueError(f"Método de RSI desconhecido: {metodo}")
+        self.periodo = periodo
+        self.metodo = metodo
+        self.primeiro_delta_zero = primeiro_delta_zero
+        media = MediaMovel if metodo == "simples" else MediaWilder
+        self._ganhos = media(periodo)
+        self._perdas = media(periodo)
+        self._fechamento_anterior = None
+        self.valor = NAN
+
+    def _variacoes(self, fechamento: float):
+        if self._fechamento_anterior is None:
+            delta = 0.0 if self.primeiro_delta_zero else NAN
+        else:
+            delta = fechamento - self._fechamento_anterior
+        if math.isnan(delta):
+            return NAN, NAN
+        return max(delta, 0.0), max(-delta, 0.0)
+
+    def atualizar(self, fechamento: float) -> float:
+        fechamento = float(fechamento)
+        ganho, perda = self._variacoes(fechamento)
+        self._fechamento_anterior = fechamento
+        self.valor = _rsi(self._ganhos.atualizar(ganho), self._perdas.atualizar(perda))
+        return self.valor
+
+    def previa(self, fechamento: float) -> float:
+        ganho, perda = self._variacoes(float(fechamento))
+        return _rsi(self._ganhos.previa(ganho), self._perdas.previa(perda))
+
+    def para_dict(self) -> dict:
+        return {
+            "periodo": self.periodo,
+            "metodo": self.metodo,
+            "primeiro_delta_zero": self.primeiro_delta_zero,
+            "ganhos": self._ganhos.para_dict(),
+            "perdas": self._perdas.para_dict(),
+            "fechamento_anterior": self._fechamento_anterior,
+            "valor": self.valor,
+        }
+
+    @classmethod
+    def de_dict(cls, dados: dict) -> "RSI":
+        rsi = cls(dados["periodo"], dados["metodo"], dados["primeiro_delta_zero"])
+        media = MediaMovel if rsi.metodo == "simples" else MediaWilder
+        rsi._ganhos = media.de_dict(dados["ganhos"])
+        rsi._perdas = media.de_dict(dados["perdas"])
+        rsi._fechamento_anterior = dados["fechamento_anterior"]
+        rsi.valor = dados["valor"]
+        return rsi
+
+
+class MACD:
+    """MACD, linha de sinal e histograma, equivalentes a `indicadores.macd_matriz`."""
+
+    def __init__(self, rapida: int = 12, lenta: int = 26, sinal: int = 9):
+        self._rapida = MediaExponencial(rapida)
+        self._lenta = MediaExponencial(lenta)
+        self._sinal = MediaExponencial(sinal)
+        self.macd = NAN
+        self.sinal = NAN
+        self.histograma = NAN
+
+    def atualizar(self, fechamento: float) -> Dict[str, float]:
+        self.macd = self._rapida.atualizar(fechamento) - self._lenta.atualizar(fechamento)
+        self.sinal = self._sinal.atualizar(self.macd)
+        self.histograma = self.macd - self.sinal
+        return self.valores()
+
+    def previa(self, fechamento: float) -> Dict[str, float]:
+        macd = self._rapida.previa(fechamento) - self._lenta.previa(fechamento)
+        sinal = self._sinal.previa(macd)
+        return {"macd": macd, "signal": sinal, "histograma": macd - sinal}
+
+    def valores(self) -> Dict[str, float]:
+        return {"macd": self.macd, "signal": self.sinal, "histograma": self.histograma}
+
+    def para_dict(self) -> dict:
+        return {
+            "rapida": self._rapida.para_dict(),
+            "lenta": self._lenta.para_dict(),
+            "sinal": self._sinal.para_dict(),
+            "valores": self.valores(),
+        }
+
+    @classmethod
+    def de_dict(cls, dados: dict) -> "MACD":
+        macd = cls()
+        macd._rapida = MediaExponencial.de_dict(dados["rapida"])
+        macd._lenta = MediaExponencial.de_dict(dados["lenta"])
+        macd._sinal = MediaExponencial.de_dict(dados["sinal"])
+        macd.macd = dados["valores"]["macd"]
+        macd.sinal = dados["valores"]["signal"]
+        macd.histograma = dados["valores"]["histograma"]
+        return macd
+
+
+class IndicadoresSimbolo:
+    """Conjunto de indicadores de um símbolo, alimentado candle a candle.
+
+    Produz as mesmas colunas de `indicadores.indicadores_matriz` (media_curta,
+    media_longa, rsi, ema21, macd, signal, histograma). Os valores só
+    coincidem, a menos do arredondamento, se ambos forem alimentados a
+    partir do mesmo primeiro candle.
+    """
+
+    def __init__(self, janela_curta: int = 7, janela_longa: int = 40, periodo_rsi: int = 14,
+                 metodo_rsi: str = "simples", primeiro_delta_zero: bool = True):
+        self.media_curta = MediaMovel(janela_curta)
+        self.media_longa = MediaMovel(janela_longa)
+        self.rsi = RSI(periodo_rsi, metodo_rsi, primeiro_delta_zero)
+        self.ema21 = MediaExponencial(21)
+        self.macd = MACD()
+        self.ultimo_open_time: Optional[int] = None
+
+    def atualizar(self, fechamento: float, open_time: Optional[int] = None) -> Dict[str, float]:
+        """Processa um candle fechado e retorna os valores atualizados."""
+        if open_time is not None:
+            if self.ultimo_open_time is not None and open_time <= self.ultimo_open_time:
+                # Candle já processado (ex.: reenvio após reconexão)
+                return self.valores()
+            self.ultimo_open_time = open_time
+        self.media_curta.atualizar(fechamento)
+        self.media_longa.atualizar(fechamento)
+        self.rsi.atualizar(fechamento)
+        self.ema21.atualizar(fechamento)
+        self.macd.atualizar(fechamento)
+        return self.valores()
+
+    def aquecer(self, fechamentos: Iterable[float], open_times: Optional[Iterable[int]] = None) -> Dict[str, float]:
+        """Alimenta o histórico de candles fechados em sequência."""
+        if open_times is None:
+            for fechamento in fechamentos:
+                self.atualizar(fechamento)
+        else:
+            for fechamento, open_time in zip(fechamentos, open_times):
+                self.atualizar(fechamento, int(open_time))
+        return self.valores()
+
+    def previa(self, fechamento: float) -> Dict[str, float]:
+        """Valores com o candle em formação no preço informado, sem alterar o estado."""
+        valores = {
+            "media_curta": self.media_curta.previa(fechamento),
+            "media_longa": self.media_longa.previa(fechamento),
+            "rsi": self.rsi.previa(fechamento),
+            "ema21": self.ema21.previa(fechamento),
+        }
+        valores.update(self.macd.previa(fechamento))
+        return valores
+
+    def valores(self) -> Dict[str, float]:
+        valores = {
+            "media_curta": self.media_curta.valor,
+            "media_longa": self.media_longa.valor,
+            "rsi": self.rsi.valor,
+            "ema21": self.ema21.valor,
+        }
+        valores.update(self.macd.valores())
+        return valores
+
+    def para_dict(self) -> dict:
+        return {
+            "media_curta": self.media_curta.para_dict(),
+            "media_longa": self.media_longa.para_dict(),
+            "rsi": self.rsi.para_dict(),
+            "ema21": self.ema21.para_dict(),
+            "macd": self.macd.para_dict(),
+            "ultimo_open_time": self.ultimo_open_time,
+        }
+
+    @classmethod
+    def de_dict(cls, dados: dict) -> "IndicadoresSimbolo":
+        indicadores = cls()
+        indicadores.media_curta = MediaMovel.de_dict(dados["media_curta"])
+        indicadores.media_longa = MediaMovel.de_dict(dados["media_longa"])
+        indicadores.rsi = RSI.de_dict(dados["rsi"])
+        indicadores.ema21 = MediaExponencial.de_dict(dados["ema21"])
+        indicadores.macd = MACD.de_dict(dados["macd"])
+        indicadores.ultimo_open_time = dados["ultimo_open_time"]
+        return indicadores
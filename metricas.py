@@ -0,0 +1,260 @@
+# metricas.py - métricas dos módulos no formato de texto do Prometheus, servidas em /metrics
+
+import math
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Limites padrão dos histogramas de duração, em segundos
+LIMITES_DURACAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+TIPO_CONTEUDO = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _formatar_valor(valor: float) -> str:
+    if math.isinf(valor):
+        return "+Inf" if valor > 0 else "-Inf"
+    if float(valor).is_integer():
+        return str(int(valor))
+    return repr(float(valor))
+
+
+def _formatar_rotulos(nomes: Iterable[str], valores: Iterable[str], extra: str = "") -> str:
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Tuple[str, ...] = ()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._trava = threading.Lock()
+        self._valores: dict = {}
+
+    def _chave(self, rotulos: Dict[str, str]) -> Tuple[str, ...]:
+        if set(rotulos) != set(self.rotulos):
+            raise ValueError(f"Métrica {self.nome} espera os rótulos {self.rotulos}, recebeu {tuple(rotulos)}")
+        return tuple(str(rotulos[nome]) for nome in self.rotulos)
+
+    def _amostras(self) -> List[str]:
+        raise NotImplementedError
+
+    def exportar(self) -> str:
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} {self.tipo}"]
+        linhas.extend(self._amostras())
+        return "\n".join(linhas)
+
+
+class Contador(_Metrica):
+    """Valor que só cresce (chamadas, erros, ciclos)."""
+
+    tipo = "counter"
+
+    def inc(self, valor: float = 1.0, **rotulos) -> None:
+        if valor < 0:
+            raise ValueError("Contadores só podem crescer")
+        chave = self._chave(rotulos)
+        with self._trava:
+            self._valores[chave] = self._valores.get(chave, 0.0) + valor
+
+    def _amostras(self) -> List[str]:
+        with self._trava:
+            itens = sorted(self._valores.items())
+        return [f"{self.nome}{_formatar_rotulos(self.rotulos, chave)} {_formatar_valor(valor)}" for chave, valor in itens]
+
+
+class Medidor(_Metrica):
+    """Valor instantâneo que sobe e desce (patrimônio, posições, peso usado)."""
+
+    tipo = "gauge"
+
+    def definir(self, valor: float, **rotulos) -> None:
+        chave = self._chave(rotulos)
+        with self._trava:
+            self._valores[chave] = float(valor)
+
+    def inc(self, valor: float = 1.0, **rotulos) -> None:
+        chave = self._chave(rotulos)
+        with self._trava:
+            self._valores[chave] = self._valores.get(chave, 0.0) + valor
+
+    def _amostras(self) -> List[str]:
+        with self._trava:
+            itens = sorted(self._valores.items())
+        return [f"{self.nome}{_formatar_rotulos(self.rotulos, chave)} {_formatar_valor(valor)}" for chave, valor in itens]
+
+
+class Histograma(_Metrica):
+    """Distribuição de durações em faixas cumulativas (_bucket, _sum e _count)."""
+
+    tipo = "histogram"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Tuple[str, ...] = (),
+                 limites: Iterable[float] = LIMITES_DURACAO):
+        super().__init__(nome, ajuda, rotulos)
+        self.limites = tuple(sorted(limites)) + (math.inf,)
+
+    def observar(self, valor: float, **rotulos) -> None:
+        chave = self._chave(rotulos)
+        with self._trava:
+            contagens, soma = self._valores.get(chave, ([0] * len(self.limites), 0.0))
+            for i, limite in enumerate(self.limites):
+                if valor <= limite:
+                    contagens[i] += 1
+                    break
+            self._valores[chave] = (contagens, soma + valor)
+
+    @contextmanager
+    def medir(self, **rotulos):
+        """Observa a duração do bloco `with`, inclusive quando ele termina com exceção."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **rotulos)
+
+    def _amostras(self) -> List[str]:
+        with self._trava:
+            itens = sorted((chave, (list(contagens), soma)) for chave, (contagens, soma) in self._valores.items())
+        linhas = []
+        for chave, (contagens, soma) in itens:
+            acumulado = 0
+            for limite, contagem in zip(self.limites, contagens):
+                acumulado += contagem
+                le = f'le="{_formatar_valor(limite)}"'
+                linhas.append(f"{self.nome}_bucket{_formatar_rotulos(self.rotulos, chave, le)} {acumulado}")
+            rotulos = _formatar_rotulos(self.rotulos, chave)
+            linhas.append(f"{self.nome}_sum{rotulos} {_formatar_valor(soma)}")
+            linhas.append(f"{self.nome}_count{rotulos} {acumulado}")
+        return linhas
+
+
+class RegistroMetricas:
+    """Métricas de um processo. Pedir de novo uma métrica já criada devolve a mesma instância.
+
+    Funções registradas com `ao_coletar` rodam antes de cada exportação, para
+    atualizar medidores que são lidos de outro componente (ex.: peso da API).
+    """
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self._metricas: Dict[str, _Metrica] = {}
+        self._coletores: List[Callable[[], None]] = []
+
+    def _obter(self, classe, nome: str, ajuda: str, rotulos: Tuple[str, ...], **kwargs):
+        with self._trava:
+            metrica = self._metricas.get(nome)
+            if metrica is None:
+                metrica = classe(nome, ajuda, tuple(rotulos), **kwargs)
+                self._metricas[nome] = metrica
+            elif not isinstance(metrica, classe) or metrica.rotulos != tuple(rotulos):
+                raise ValueError(f"Métrica {nome} já registrada com outro tipo ou rótulos")
+            return metrica
+
+    def contador(self, nome: str, ajuda: str, rotulos: Tuple[str, ...] = ()) -> Contador:
+        return self._obter(Contador, nome, ajuda, rotulos)
+
+    def medidor(self, nome: str, ajuda: str, rotulos: Tuple[str, ...] = ()) -> Medidor:
+        return self._obter(Medidor, nome, ajuda, rotulos)
+
+    def histograma(self, nome: str, ajuda: str, rotulos: Tuple[str, ...] = (),
+                   limites: Iterable[float] = LIMITES_DURACAO) -> Histograma:
+        return self._obter(Histograma, nome, ajuda, rotulos, limites=limites)
+
+    def ao_coletar(self, funcao: Callable[[], None]) -> None:
+        with self._trava:
+            self._coletores.append(funcao)
+
+    def exportar(self) -> str:
+        with self._trava:
+            coletores = list(self._coletores)
+            metricas = [self._metricas[nome] for nome in sorted(self._metricas)]
+        for coletor in coletores:
+            try:
+                coletor()
+            except Exception as e:
+                logging.error(f"Erro ao coletar métricas: {e}")
+        return "\n".join(metrica.exportar() for metrica in metricas) + "\n"
+
+
+# Registro único do processo, compartilhado por todos os módulos carregados nele
+REGISTRO = RegistroMetricas()
+
+# Métricas gravadas por mais de um módulo, declaradas só aqui
+metrica_requisicao_binance = REGISTRO.histograma(
+    "binance_requisicao_duracao_segundos", "Duração das chamadas REST à Binance, sem a espera na fila", ("endpoint",))
+metrica_envio_discord = REGISTRO.histograma(
+    "discord_envio_duracao_segundos", "Duração do envio de mensagens ao Discord", ("modulo",))
+metrica_erros_discord = REGISTRO.contador("discord_envio_erros_total", "Envios ao Discord que falharam", ("modulo",))
+
+
+class ServidorMetricas:
+    """Servidor HTTP local que responde GET /metrics com o conteúdo do registro."""
+
+    def __init__(self, registro: RegistroMetricas = REGISTRO, host: str = "127.0.0.1", porta: int = 9101):
+        self.registro = registro
+        self._servidor = ThreadingHTTPServer((host, porta), self._criar_manipulador())
+        self._servidor.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, porta = self._servidor.server_address[:2]
+        return f"http://{host}:{porta}/metrics"
+
+    def iniciar(self) -> str:
+        self._thread = threading.Thread(target=self._servidor.serve_forever, name="metricas", daemon=True)
+        self._thread.start()
+        logging.info(f"Métricas disponíveis em {self.url}")
+        return self.url
+
+    def parar(self) -> None:
+        self._servidor.shutdown()
+        self._servidor.server_close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _criar_manipulador(self):
+        registro = self.registro
+
+        class Manipulador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                corpo = registro.exportar().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", TIPO_CONTEUDO)
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def log_message(self, formato, *args):
+                logging.debug(f"Métricas: {formato % args}")
+
+        return Manipulador
+
+
+def iniciar_servidor_metricas(porta: Optional[int], host: str = "127.0.0.1") -> Optional[ServidorMetricas]:
+    """Inicia o servidor de métricas do processo; None ou 0 desativa. Falhas só são registradas no log."""
+    if not porta:
+        return None
+    try:
+        servidor = ServidorMetricas(REGISTRO, host, porta)
+        servidor.iniciar()
+        return servidor
+    except OSError as e:
+        logging.error(f"Não foi possível abrir o servidor de métricas na porta {porta}: {e}")
+        return None
@@ -0,0 +1,184 @@
+# monitor_tempo_real.py - stop-loss / take-profit avaliados a cada atualização de preço
+
+import json
+import time
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+# Callback chamado pela fonte a cada preço recebido: (symbol, preco, timestamp_ms)
+CallbackPreco = Callable[[str, float, int], None]
+
+
+class FontePrecos:
+    """Interface das fontes de preço consumidas pelo MotorStopTakeProfit."""
+
+    def iniciar(self, ao_receber: CallbackPreco) -> None:
+        raise NotImplementedError
+
+    def parar(self) -> None:
+        raise NotImplementedError
+
+
+class FonteBinance(FontePrecos):
+    """Preços em tempo real via WebSocket da Binance (bookTicker ou trade)."""
+
+    def __init__(self, simbolos: Iterable[str], api_key: Optional[str] = None,
+                 api_secret: Optional[str] = None, tipo: str = "bookTicker"):
+        self.simbolos = list(simbolos)
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.tipo = tipo
+        self._gerenciador = None
+
+    def iniciar(self, ao_receber: CallbackPreco) -> None:
+        from binance import ThreadedWebsocketManager
+
+        def tratar_mensagem(msg):
+            try:
+                if msg.get("e") == "error":
+                    logging.error(f"Erro no WebSocket de preços: {msg}")
+                elif self.tipo == "bookTicker":
+                    # Posições compradas são vendidas no melhor bid
+                    ao_receber(msg["s"], float(msg["b"]), int(time.time() * 1000))
+                else:
+                    ao_receber(msg["s"], float(msg["p"]), int(msg["T"]))
+            except Exception as e:
+                logging.error(f"Erro ao processar mensagem do WebSocket: {e}")
+                logging.error(traceback.format_exc())
+
+        self._gerenciador = ThreadedWebsocketManager(api_key=self.api_key, api_secret=self.api_secret)
+        self._gerenciador.start()
+        for simbolo in self.simbolos:
+            if self.tipo == "bookTicker":
+                self._gerenciador.start_symbol_book_ticker_socket(callback=tratar_mensagem, symbol=simbolo)
+            else:
+                self._gerenciador.start_trade_socket(callback=tratar_mensagem, symbol=simbolo)
+        logging.info(f"WebSocket de preços ({self.tipo}) iniciado para {', '.join(self.simbolos)}")
+
+    def parar(self) -> None:
+        if self._gerenciador is not None:
+            self._gerenciador.stop()
+            self._gerenciador = None
+
+
+class FonteGravada(FontePrecos):
+    """Reproduz um fluxo de preços gravado em JSON Lines ({"s": ..., "p": ..., "t": ...}).
+
+    Com `tempo_real=True` respeita o intervalo original entre os ticks; caso
+    contrário reproduz o arquivo o mais rápido possível (útil em testes).
+    """
+
+    def __init__(self, caminho: str, tempo_real: bool = False, em_thread: bool = False):
+        self.caminho = caminho
+        self.tempo_real = tempo_real
+        self.em_thread = em_thread
+        self._parar = threading.Event()
+        self._thread = None
+
+    def iniciar(self, ao_receber: CallbackPreco) -> None:
+        self._parar.clear()
+        if self.em_thread:
+            self._thread = threading.Thread(target=self._reproduzir, args=(ao_receber,), daemon=True)
+            self._thread.start()
+        else:
+            self._reproduzir(ao_receber)
+
+    def _reproduzir(self, ao_receber: CallbackPreco) -> None:
+        anterior = None
+        with open(self.caminho, "r") as f:
+            for linha in f:
+                if self._parar.is_set():
+                    break
+                if not linha.strip():
+                    continue
+                tick = json.loads(linha)
+                timestamp = int(tick["t"])
+                if self.tempo_real and anterior is not None and timestamp > anterior:
+                    time.sleep((timestamp - anterior) / 1000)
+                anterior = timestamp
+                ao_receber(tick["s"], float(tick["p"]), timestamp)
+
+    def parar(self) -> None:
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class MotorStopTakeProfit:
+    """Avalia stop-loss, take-profit e alta semanal +5% a cada tick em O(1).
+
+    Os limites de cada símbolo são pré-calculados em `definir`, de modo que cada
+    tick custa uma consulta ao dicionário e duas comparações. Ao disparar, o
+    símbolo é desarmado e `ao_disparar(symbol, preco, motivo)` é executado em
+    uma thread separada para não bloquear a fonte de preços.
+    """
+
+    def __init__(self, ao_disparar: Callable[[str, float, str], None]):
+        self.ao_disparar = ao_disparar
+        # symbol -> (stop_loss, alvo, motivo do alvo)
+        self._limites: Dict[str, Tuple[float, float, str]] = {}
+        self._trava = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="monitor_stops")
+        self._fonte: Optional[FontePrecos] = None
+
+    def definir(self, symbol: str, stop_loss: float, take_profit: float, ultima_alta: float = 0) -> None:
+        """Arma (ou atualiza) os limites de uma posição aberta."""
+        alvo, motivo = take_profit, "Take-Profit"
+        if ultima_alta > 0 and ultima_alta * 1.05 < take_profit:
+            alvo, motivo = ultima_alta * 1.05, "Alta Semanal +5%"
+        with self._trava:
+            self._limites[symbol] = (stop_loss, alvo, motivo)
+
+    def remover(self, symbol: str) -> None:
+        """Desarma o símbolo (posição encerrada)."""
+        with self._trava:
+            self._limites.pop(symbol, None)
+
+    def limites(self, symbol: str) -> Optional[Tuple[float, float, str]]:
+        return self._limites.get(symbol)
+
+    def processar(self, symbol: str, preco: float, timestamp: int = 0) -> Optional[str]:
+        """Avalia um tick. Retorna o motivo do disparo ou None."""
+        limites = self._limites.get(symbol)
+        if limites is None:
+            return None
+
+        stop_loss, alvo, motivo_alvo = limites
+        if preco <= stop_loss:
+            motivo = "Stop-Loss"
+        elif preco >= alvo:
+            motivo = motivo_alvo
+        else:
+            return None
+
+        with self._trava:
+            # Outro tick pode ter disparado o mesmo símbolo em paralelo
+            if self._limites.get(symbol) is not limites:
+                return None
+            del self._limites[symbol]
+
+        logging.info(f"{motivo} disparado em tempo real para {symbol} a {preco:.2f} USDT")
+        self._executor.submit(self._executar_disparo, symbol, preco, motivo)
+        return motivo
+
+    def _executar_disparo(self, symbol: str, preco: float, motivo: str) -> None:
+        try:
+            self.ao_disparar(symbol, preco, motivo)
+        except Exception as e:
+            logging.error(f"Erro ao executar {motivo} de {symbol}: {e}")
+            logging.error(traceback.format_exc())
+
+    def iniciar(self, fonte: FontePrecos) -> None:
+        """Conecta o motor a uma fonte de preços."""
+        self._fonte = fonte
+        fonte.iniciar(self.processar)
+
+    def parar(self) -> None:
+        if self._fonte is not None:
+            self._fonte.parar()
+            self._fonte = None
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,276 @@
+# notificacoes_discord.py - fila de notificações do Discord com prioridade, agrupamento e limite por canal
+
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+import threading
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from metricas import REGISTRO
+
+# Prioridades: menor valor sai primeiro
+PRIORIDADE_ORDEM = 0     # Execuções e resultados de operações: enviadas sem esperar a janela
+PRIORIDADE_ALERTA = 1    # Alertas de proximidade de stop-loss/take-profit
+PRIORIDADE_RESUMO = 2    # Resumo de saldo do ciclo
+PRIORIDADE_GRAFICO = 3   # Gráficos
+NOMES_PRIORIDADES = {PRIORIDADE_ORDEM: "ordem", PRIORIDADE_ALERTA: "alerta",
+                     PRIORIDADE_RESUMO: "resumo", PRIORIDADE_GRAFICO: "grafico"}
+
+# Limites do Discord: texto e anexos por mensagem, e 5 mensagens a cada 5 s por canal
+LIMITE_TEXTO = 2000
+LIMITE_ANEXOS = 10
+MENSAGENS_POR_JANELA = 5
+JANELA_LIMITE = 5.0
+
+SEPARADOR = "\n\n"
+
+metrica_notificacoes = REGISTRO.contador(
+    "discord_notificacoes_total", "Notificações recebidas pela fila do Discord, por destino", ("modulo", "resultado"))
+metrica_fila = REGISTRO.medidor("discord_fila_tamanho", "Notificações aguardando envio", ("modulo",))
+metrica_espera = REGISTRO.histograma(
+    "discord_notificacao_espera_segundos", "Tempo entre a notificação e o envio ao Discord", ("modulo", "prioridade"))
+
+
+def dividir_texto(texto: str, limite: int = LIMITE_TEXTO) -> List[str]:
+    """Divide `texto` em partes de até `limite` caracteres, quebrando de preferência no fim de uma linha."""
+    partes = []
+    while len(texto) > limite:
+        corte = texto.rfind("\n", 0, limite + 1)
+        if corte <= 0:
+            corte = limite
+        partes.append(texto[:corte])
+        texto = texto[corte:].lstrip("\n")
+    if texto or not partes:
+        partes.append(texto)
+    return partes
+
+
+@dataclass(order=True)
+class Notificacao:
+    """Mensagem na fila; `anexos` são pares (nome do arquivo, bytes ou caminho em disco)."""
+    prioridade: int
+    sequencia: int
+    canal: int = field(compare=False)
+    texto: str = field(compare=False)
+    anexos: Tuple[Tuple[str, object], ...] = field(compare=False, default=())
+    criada_em: float = field(compare=False, default_factory=time.monotonic)
+
+
+class LimitadorCanal:
+    """Janela deslizante de `mensagens` envios a cada `janela` segundos, com pausa após um 429."""
+
+    def __init__(self, mensagens: int = MENSAGENS_POR_JANELA, janela: float = JANELA_LIMITE):
+        self.mensagens = mensagens
+        self.janela = janela
+        self._envios: List[float] = []
+        self._pausado_ate = 0.0
+
+    def espera(self, agora: float) -> float:
+        """Segundos até o próximo envio ser permitido (0 = pode enviar)."""
+        self._envios = [t for t in self._envios if agora - t < self.janela]
+        espera = max(0.0, self._pausado_ate - agora)
+        if len(self._envios) >= self.mensagens:
+            espera = max(espera, self._envios[0] + self.janela - agora)
+        return espera
+
+    def registrar(self, agora: float) -> None:
+        self._envios.append(agora)
+
+    def pausar(self, segundos: float, agora: float) -> None:
+        self._pausado_ate = max(self._pausado_ate, agora + segundos)
+
+
+class FilaNotificacoes:
+    """Fila limitada de notificações enviadas por uma tarefa no loop do cliente Discord.
+
+    `notificar` pode ser chamado de qualquer thread. Mensagens de
+    PRIORIDADE_ORDEM saem assim que o limite do canal permite; as demais
+    esperam `janela_agrupamento` segundos para que as geradas no mesmo ciclo
+    sigam juntas em uma única mensagem (até LIMITE_TEXTO caracteres e
+    LIMITE_ANEXOS anexos); um texto maior que LIMITE_TEXTO é dividido em
+    várias mensagens, com os anexos na última. Notificações com `chave` (ex.:
+    ("proximidade_stop", "BTCUSDT")) repetidas dentro de `intervalo_repeticao`
+    são descartadas.
+    Com a fila cheia, sai a notificação menos prioritária e mais recente.
+
+    `enviar(canal, texto, anexos)` faz o envio de fato; exceções com
+    `retry_after` (429 do Discord) pausam o canal e devolvem o lote à fila.
+    """
+
+    def __init__(self, enviar: Callable[[int, str, Tuple[Tuple[str, object], ...]], Awaitable[None]],
+                 capacidade: int = 200, janela_agrupamento: float = 2.0, intervalo_repeticao: float = 3600.0,
+                 modulo: str = "trading"):
+        self.enviar = enviar
+        self.capacidade = capacidade
+        self.janela_agrupamento = janela_agrupamento
+        self.intervalo_repeticao = intervalo_repeticao
+        self.modulo = modulo
+        self._trava = threading.Lock()
+        self._fila: List[Notificacao] = []
+        self._sequencia = itertools.count()
+        self._ultimas: Dict[Hashable, float] = {}
+        self._limitadores: Dict[int, LimitadorCanal] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._evento: Optional[asyncio.Event] = None
+        self._tarefa = None
+
+    # Produção (qualquer thread)
+
+    def notificar(self, canal: int, texto: str, anexos: Tuple[Tuple[str, object], ...] = (),
+                  prioridade: int = PRIORIDADE_RESUMO, chave: Optional[Hashable] = None) -> bool:
+        """Enfileira a notificação; retorna False se ela (ou parte dela) foi descartada (repetida ou fila cheia)."""
+        agora = time.monotonic()
+        partes = dividir_texto(texto)
+        with self._trava:
+            if chave is not None:
+                ultima = self._ultimas.get(chave)
+                if ultima is not None and agora - ultima < self.intervalo_repeticao:
+                    metrica_notificacoes.inc(modulo=self.modulo, resultado="repetida")
+                    return False
+                self._ultimas[chave] = agora
+
+            enfileiradas = 0
+            for i, parte in enumerate(partes):
+                anexos_parte = tuple(anexos) if i == len(partes) - 1 else ()
+                notificacao = Notificacao(prioridade, next(self._sequencia), canal, parte, anexos_parte, agora)
+                enfileiradas += self._enfileirar(notificacao)
+            metrica_fila.definir(len(self._fila), modulo=self.modulo)
+        if enfileiradas:
+            metrica_notificacoes.inc(enfileiradas, modulo=self.modulo, resultado="enfileirada")
+            self._acordar()
+        return enfileiradas == len(partes)
+
+    def _enfileirar(self, notificacao: Notificacao) -> bool:
+        # Chamado com a trava; com a fila cheia, descarta a menos prioritária e mais recente
+        if len(self._fila) < self.capacidade:
+            heapq.heappush(self._fila, notificacao)
+            return True
+        descartada = max(self._fila)
+        if notificacao > descartada:
+            descartada = notificacao
+        else:
+            self._fila.remove(descartada)
+            heapq.heapify(self._fila)
+            heapq.heappush(self._fila, notificacao)
+        metrica_notificacoes.inc(modulo=self.modulo, resultado="descartada")
+        logging.warning(f"Fila do Discord cheia ({self.capacidade}): notificação "
+                        f"{NOMES_PRIORIDADES.get(descartada.prioridade, descartada.prioridade)} descartada")
+        return descartada is not notificacao
+
+    def _acordar(self) -> None:
+        if self._loop is not None and self._evento is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._evento.set)
+            except RuntimeError:
+                # Loop já encerrado: as notificações pendentes são perdidas com ele
+                pass
+
+    # Consumo (loop do Discord)
+
+    def iniciar(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Inicia a tarefa de envio no loop do cliente Discord (uma vez por loop)."""
+        if self._loop is loop and self._tarefa is not None and not self._tarefa.done():
+            return
+        self._loop = loop
+        self._tarefa = asyncio.run_coroutine_threadsafe(self._consumir(), loop)
+
+    def pendentes(self) -> int:
+        with self._trava:
+            return len(self._fila)
+
+    def _limitador(self, canal: int) -> LimitadorCanal:
+        if canal not in self._limitadores:
+            self._limitadores[canal] = LimitadorCanal()
+        return self._limitadores[canal]
+
+    async def _aguardar(self, timeout: Optional[float]) -> None:
+        try:
+            await asyncio.wait_for(self._evento.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._evento.clear()
+
+    async def _consumir(self) -> None:
+        self._evento = asyncio.Event()
+        while True:
+            with self._trava:
+                cabeca = self._fila[0] if self._fila else None
+            if cabeca is None:
+                await self._aguardar(None)
+                continue
+
+            agora = time.monotonic()
+            espera = self._limitador(cabeca.canal).espera(agora)
+            if cabeca.prioridade > PRIORIDADE_ORDEM:
+                espera = max(espera, cabeca.criada_em + self.janela_agrupamento - agora)
+            if espera > 0:
+                # Uma notificação nova (ex.: execução de ordem) encerra a espera antes do prazo
+                await self._aguardar(espera)
+                continue
+
+            lote = self._retirar_lote()
+            await self._enviar_lote(lote)
+
+    def _retirar_lote(self) -> List[Notificacao]:
+        """Retira a cabeça da fila e as notificações do mesmo canal que cabem na mesma mensagem."""
+        agora = time.monotonic()
+        with self._trava:
+            lote = [heapq.heappop(self._fila)]
+            tamanho = len(lote[0].texto)
+            anexos = len(lote[0].anexos)
+            adiadas = []
+            while self._fila:
+                proxima = heapq.heappop(self._fila)
+                # Execuções não esperam as notificações comuns; as comuns só entram quando já venceram a janela
+                compativel = (proxima.canal == lote[0].canal and
+                              (proxima.prioridade == PRIORIDADE_ORDEM or
+                               proxima.criada_em + self.janela_agrupamento <= agora))
+                if not compativel:
+                    adiadas.append(proxima)
+                    continue
+                if (tamanho + len(SEPARADOR) + len(proxima.texto) > LIMITE_TEXTO or
+                        anexos + len(proxima.anexos) > LIMITE_ANEXOS):
+                    adiadas.append(proxima)
+                    break
+                lote.append(proxima)
+                tamanho += len(SEPARADOR) + len(proxima.texto)
+                anexos += len(proxima.anexos)
+            for notificacao in adiadas:
+                heapq.heappush(self._fila, notificacao)
+            metrica_fila.definir(len(self._fila), modulo=self.modulo)
+        return lote
+
+    async def _enviar_lote(self, lote: List[Notificacao]) -> None:
+        canal = lote[0].canal
+        texto = SEPARADOR.join(notificacao.texto for notificacao in lote)
+        anexos = tuple(anexo for notificacao in lote for anexo in notificacao.anexos)
+        limitador = self._limitador(canal)
+        limitador.registrar(time.monotonic())
+        try:
+            await self.enviar(canal, texto, anexos)
+        except Exception as e:
+            retry_after = getattr(e, "retry_after", None)
+            if retry_after is None and getattr(e, "status", None) == 429:
+                retry_after = JANELA_LIMITE
+            if retry_after is not None:
+                logging.warning(f"Limite do Discord atingido no canal {canal}: aguardando {float(retry_after):.1f}s")
+                limitador.pausar(float(retry_after), time.monotonic())
+                with self._trava:
+                    for notificacao in lote:
+                        heapq.heappush(self._fila, notificacao)
+                    metrica_fila.definir(len(self._fila), modulo=self.modulo)
+                return
+            metrica_notificacoes.inc(len(lote), modulo=self.modulo, resultado="erro")
+            logging.error(f"Erro ao enviar notificações ao Discord: {e}")
+            return
+
+        agora = time.monotonic()
+        for notificacao in lote:
+            metrica_espera.observar(agora - notificacao.criada_em, modulo=self.modulo,
+                                    prioridade=NOMES_PRIORIDADES.get(notificacao.prioridade, str(notificacao.prioridade)))
+        metrica_notificacoes.inc(len(lote), modulo=self.modulo, resultado="enviada")
+        if len(lote) > 1:
+            logging.debug(f"{len(lote)} notificações agrupadas em uma mensagem do Discord")
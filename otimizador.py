@@ -0,0 +1,233 @@
+# otimizador.py - varredura paralela dos parâmetros da estratégia com validação walk-forward
+
+import os
+import csv
+import time
+import logging
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from dataclasses import replace
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from armazenamento_candles import DTYPE_CANDLE
+from backtest import ParametrosBacktest, executar_backtest, calcular_drawdown
+
+# Parâmetros varridos por padrão (nomes iguais aos do CONFIG)
+GRADE_PADRAO = {
+    "janela_media_curta": [5, 7, 9, 12, 15, 20],
+    "janela_media_longa": [25, 30, 40, 50, 60, 80, 100],
+    "percentual_stop_loss": [0.02, 0.03, 0.04, 0.05, 0.07],
+    "percentual_take_profit": [0.03, 0.05, 0.07, 0.1],
+    "limite_rsi_sobrevenda": [25, 30, 35],
+    "limite_rsi_sobrecompra": [65, 70, 75, 80],
+}
+
+METRICAS = ("retorno", "retorno_drawdown")
+
+# Estado de cada processo de trabalho: candles anexados à memória compartilhada
+_candles_trabalhador: Dict[str, np.ndarray] = {}
+_memorias_trabalhador: List[shared_memory.SharedMemory] = []
+
+
+def gerar_combinacoes(grade: Mapping[str, Sequence]) -> List[dict]:
+    """Produto cartesiano da grade, descartando média curta >= média longa."""
+    nomes = list(grade)
+    combinacoes = []
+    for valores in itertools.product(*(grade[nome] for nome in nomes)):
+        combinacao = dict(zip(nomes, valores))
+        if combinacao.get("janela_media_curta", 0) >= combinacao.get("janela_media_longa", float("inf")):
+            continue
+        combinacoes.append(combinacao)
+    return combinacoes
+
+
+def dividir_blocos(candles_por_moeda: Mapping[str, np.ndarray], blocos: int) -> List[Tuple[int, int]]:
+    """Divide o período total em `blocos` intervalos de open_time [inicio, fim) de mesma duração."""
+    if not any(len(c) for c in candles_por_moeda.values()):
+        raise ValueError("Nenhum candle disponível para a otimização")
+    inicio = min(int(c["open_time"][0]) for c in candles_por_moeda.values() if len(c))
+    fim = max(int(c["open_time"][-1]) for c in candles_por_moeda.values() if len(c)) + 1
+    limites = np.linspace(inicio, fim, blocos + 1).astype(np.int64)
+    return [(int(limites[i]), int(limites[i + 1])) for i in range(blocos)]
+
+
+class CandlesCompartilhados:
+    """Candles de todas as moedas copiados uma vez para memória compartilhada.
+
+    Os processos de trabalho anexam os blocos pelo nome e leem os arrays
+    estruturados diretamente deles, sem cópia por processo.
+    """
+
+    def __init__(self, candles_por_moeda: Mapping[str, np.ndarray]):
+        self.descritores: Dict[str, Tuple[str, int]] = {}
+        self._memorias: List[shared_memory.SharedMemory] = []
+        try:
+            for moeda, candles in candles_por_moeda.items():
+                candles = np.ascontiguousarray(candles, dtype=DTYPE_CANDLE)
+                memoria = shared_memory.SharedMemory(create=True, size=max(candles.nbytes, 1))
+                self._memorias.append(memoria)
+                np.ndarray(len(candles), dtype=DTYPE_CANDLE, buffer=memoria.buf)[:] = candles
+                self.descritores[moeda] = (memoria.name, len(candles))
+        except Exception:
+            self.liberar()
+            raise
+
+    def liberar(self) -> None:
+        for memoria in self._memorias:
+            memoria.close()
+            memoria.unlink()
+        self._memorias = []
+
+    def __enter__(self) -> "CandlesCompartilhados":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.liberar()
+
+
+def _iniciar_trabalhador(descritores: Mapping[str, Tuple[str, int]]) -> None:
+    # Cada backtest registra um resumo; nos trabalhadores isso seria só ruído
+    logging.getLogger().setLevel(logging.WARNING)
+    for moeda, (nome, tamanho) in descritores.items():
+        memoria = shared_memory.SharedMemory(name=nome)
+        _memorias_trabalhador.append(memoria)
+        _candles_trabalhador[moeda] = np.ndarray(tamanho, dtype=DTYPE_CANDLE, buffer=memoria.buf)
+
+
+def avaliar_bloco(candles_por_moeda: Mapping[str, np.ndarray], parametros: ParametrosBacktest,
+                  inicio: int, fim: int) -> Tuple[float, float]:
+    """Retorno (%) e drawdown máximo (%) entre os open_time [inicio, fim).
+
+    Os candles anteriores ao bloco entram como aquecimento dos indicadores,
+    mas o patrimônio é medido só a partir do primeiro candle do bloco.
+    """
+    aquecimento = max(parametros.janela_media_longa, parametros.periodo_rsi, parametros.janela_alta_semanal) + 1
+    fatias = {}
+    for moeda, candles in candles_por_moeda.items():
+        tempos = candles["open_time"]
+        a, b = np.searchsorted(tempos, [inicio, fim])
+        fatias[moeda] = candles[max(0, a - aquecimento):b]
+
+    resultado = executar_backtest(fatias, parametros)
+    dentro = resultado.tempos >= inicio
+    if not dentro.any():
+        return 0.0, 0.0
+    patrimonio = resultado.patrimonio[dentro]
+    retorno = (patrimonio[-1] / patrimonio[0] - 1) * 100
+    return float(retorno), float(calcular_drawdown(patrimonio).min() * 100)
+
+
+def pontuar(retorno: float, drawdown: float, metrica: str) -> float:
+    if metrica == "retorno":
+        return retorno
+    if metrica == "retorno_drawdown":
+        # Retorno por unidade de drawdown (1% mínimo para não premiar blocos sem operações)
+        return retorno / max(abs(drawdown), 1.0)
+    raise ValueError(f"Métrica desconhecida: {metrica}")
+
+
+def _avaliar_lote(combinacoes: List[dict], base: ParametrosBacktest,
+                  blocos: List[Tuple[int, int]]) -> List[List[Tuple[float, float]]]:
+    resultados = []
+    for combinacao in combinacoes:
+        parametros = replace(base, **combinacao)
+        resultados.append([avaliar_bloco(_candles_trabalhador, parametros, inicio, fim) for inicio, fim in blocos])
+    return resultados
+
+
+def otimizar(candles_por_moeda: Mapping[str, np.ndarray], grade: Mapping[str, Sequence] = GRADE_PADRAO,
+             base: ParametrosBacktest = ParametrosBacktest(), blocos: int = 5,
+             metrica: str = "retorno_drawdown", processos: Optional[int] = None) -> dict:
+    """Avalia todas as combinações da grade em cada bloco de tempo, em paralelo.
+
+    Retorna um dicionário com:
+    - "ranking": uma linha por combinação, ordenada pela pontuação média
+      dos blocos fora da amostra (todos menos o primeiro);
+    - "walk_forward": para cada bloco i, a melhor combinação no bloco i e
+      a pontuação que ela obteve no bloco i + 1.
+    """
+    if metrica not in METRICAS:
+        raise ValueError(f"Métrica desconhecida: {metrica}")
+    combinacoes = gerar_combinacoes(grade)
+    if not combinacoes:
+        return {"ranking": [], "walk_forward": []}
+    intervalos = dividir_blocos(candles_por_moeda, blocos)
+    processos = processos or os.cpu_count() or 1
+    # Lotes pequenos o bastante para equilibrar a carga entre os processos
+    tamanho_lote = max(1, len(combinacoes) // (processos * 8))
+    lotes = [combinacoes[i:i + tamanho_lote] for i in range(0, len(combinacoes), tamanho_lote)]
+
+    inicio = time.perf_counter()
+    with CandlesCompartilhados(candles_por_moeda) as compartilhados:
+        with ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_trabalhador,
+                                 initargs=(compartilhados.descritores,)) as executor:
+            futuros = [executor.submit(_avaliar_lote, lote, base, intervalos) for lote in lotes]
+            avaliacoes = [avaliacao for futuro in futuros for avaliacao in futuro.result()]
+    logging.info(f"{len(combinacoes)} combinações x {blocos} blocos avaliadas em "
+                 f"{time.perf_counter() - inicio:.1f}s com {processos} processo(s)")
+
+    pontuacoes = np.array([[pontuar(r, d, metrica) for r, d in avaliacao] for avaliacao in avaliacoes])
+
+    ranking = []
+    for combinacao, avaliacao, pontos in zip(combinacoes, avaliacoes, pontuacoes):
+        fora_amostra = pontos[1:] if blocos > 1 else pontos
+        linha = dict(combinacao)
+        for i, (retorno, drawdown) in enumerate(avaliacao):
+            linha[f"retorno_bloco_{i + 1}"] = round(retorno, 4)
+            linha[f"drawdown_bloco_{i + 1}"] = round(drawdown, 4)
+        linha["pontuacao_media"] = float(fora_amostra.mean())
+        linha["pontuacao_pior_bloco"] = float(fora_amostra.min())
+        ranking.append(linha)
+    ranking.sort(key=lambda linha: linha["pontuacao_media"], reverse=True)
+
+    walk_forward = []
+    for i in range(blocos - 1):
+        melhor = int(np.argmax(pontuacoes[:, i]))
+        walk_forward.append({
+            "bloco_treino": i + 1,
+            "bloco_teste": i + 2,
+            **combinacoes[melhor],
+            "pontuacao_treino": float(pontuacoes[melhor, i]),
+            "pontuacao_teste": float(pontuacoes[melhor, i + 1]),
+            "retorno_teste": avaliacoes[melhor][i + 1][0],
+        })
+
+    return {"ranking": ranking, "walk_forward": walk_forward}
+
+
+def salvar_tabela(linhas: List[dict], caminho: str) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+    with open(caminho, "w", newline="", encoding="utf-8") as f:
+        if not linhas:
+            return
+        escritor = csv.DictWriter(f, fieldnames=list(linhas[0]))
+        escritor.writeheader()
+        escritor.writerows(linhas)
+
+
+if __name__ == "__main__":
+    from bot_trading import CONFIG, BASE_DIR, armazem_candles
+
+    argumentos = argparse.ArgumentParser(description="Varredura de parâmetros da estratégia sobre os candles gravados")
+    argumentos.add_argument("--blocos", type=int, default=5, help="Blocos de tempo para a validação walk-forward")
+    argumentos.add_argument("--processos", type=int, default=None, help="Processos de trabalho (padrão: todos os núcleos)")
+    argumentos.add_argument("--metrica", default="retorno_drawdown", choices=METRICAS)
+    argumentos.add_argument("--saida", default=os.path.join(BASE_DIR, "otimizacao"), help="Pasta dos resultados")
+    opcoes = argumentos.parse_args()
+
+    candles = {moeda: armazem_candles.ler(moeda, CONFIG["periodo_candle"]) for moeda in CONFIG["moedas"]}
+    resultado = otimizar(
+        candles,
+        base=ParametrosBacktest.de_config(CONFIG),
+        blocos=opcoes.blocos,
+        metrica=opcoes.metrica,
+        processos=opcoes.processos
+    )
+    salvar_tabela(resultado["ranking"], os.path.join(opcoes.saida, "ranking.csv"))
+    salvar_tabela(resultado["walk_forward"], os.path.join(opcoes.saida, "walk_forward.csv"))
+    for linha in resultado["ranking"][:10]:
+        print(linha)
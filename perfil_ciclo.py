@@ -0,0 +1,157 @@
+# perfil_ciclo.py - modo de perfilamento do ciclo: tempo, cProfile e memória por etapa
+
+import os
+import io
+import json
+import time
+import pstats
+import logging
+import cProfile
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+# Variável de ambiente que liga o modo: "1" (só tempos), "cprofile", "tracemalloc" ou combinações
+# separadas por vírgula, ex.: BOT_PERFIL=cprofile,tracemalloc
+VARIAVEL_AMBIENTE = "BOT_PERFIL"
+OPCOES = ("tempo", "cprofile", "tracemalloc")
+
+
+def ler_opcoes(valor: Optional[str]) -> Optional[set]:
+    """Converte o valor de BOT_PERFIL (ou de --perfil) no conjunto de opções; None = desativado."""
+    if valor is None:
+        return None
+    valor = valor.strip().lower()
+    if valor in ("", "0", "false", "nao", "não", "off"):
+        return None
+    opcoes = {"tempo"}
+    for opcao in valor.split(","):
+        opcao = opcao.strip()
+        if opcao in ("1", "true", "sim", "on", "tempo"):
+            continue
+        if opcao == "tudo":
+            opcoes.update(OPCOES)
+        elif opcao in OPCOES:
+            opcoes.add(opcao)
+        else:
+            raise ValueError(f"Opção de perfil desconhecida: {opcao} (use {', '.join(OPCOES)} ou tudo)")
+    return opcoes
+
+
+class PerfilCiclo:
+    """Mede cada etapa de um ciclo e grava o detalhamento em `pasta`.
+
+    `etapa(nome)` usa perf_counter_ns; com "cprofile" cada etapa ganha um
+    cProfile próprio, gravado como `<ciclo>_<etapa>.prof` (abra com
+    `python -m pstats` ou snakeviz); com "tracemalloc" registra o crescimento
+    e o pico de memória de cada etapa e grava as maiores alocações do ciclo.
+    Etapas aninhadas contam no tempo da externa e não abrem um segundo cProfile.
+
+    Ao final de cada ciclo a tabela é enviada ao log e uma linha JSON com os
+    tempos é acrescentada a `ciclos.jsonl`, para comparar ciclos entre si.
+    """
+
+    def __init__(self, pasta: str, opcoes: Iterable[str] = ("tempo",), top_funcoes: int = 15):
+        self.pasta = pasta
+        self.opcoes = set(opcoes)
+        self.top_funcoes = top_funcoes
+        self.usar_cprofile = "cprofile" in self.opcoes
+        self.usar_tracemalloc = "tracemalloc" in self.opcoes
+        self._ciclo: Optional[str] = None
+        self._inicio_ns = 0
+        self._etapas: Dict[str, dict] = {}
+        self._perfis: Dict[str, cProfile.Profile] = {}
+        self._profundidade = 0
+        os.makedirs(pasta, exist_ok=True)
+
+    def iniciar_ciclo(self) -> None:
+        self._ciclo = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        self._etapas = {}
+        self._perfis = {}
+        self._profundidade = 0
+        if self.usar_tracemalloc and not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+        self._inicio_ns = time.perf_counter_ns()
+
+    @contextmanager
+    def etapa(self, nome: str):
+        externa = self._profundidade == 0
+        self._profundidade += 1
+        perfil = None
+        if self.usar_cprofile and externa:
+            perfil = self._perfis.setdefault(nome, cProfile.Profile())
+            perfil.enable()
+        if self.usar_tracemalloc and externa:
+            memoria_antes = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        inicio = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            decorrido = time.perf_counter_ns() - inicio
+            if perfil is not None:
+                perfil.disable()
+            medida = self._etapas.setdefault(nome, {"ns": 0, "chamadas": 0, "memoria": 0, "pico": 0})
+            medida["ns"] += decorrido
+            medida["chamadas"] += 1
+            if self.usar_tracemalloc and externa:
+                atual, pico = tracemalloc.get_traced_memory()
+                medida["memoria"] += atual - memoria_antes
+                medida["pico"] = max(medida["pico"], pico - memoria_antes)
+            self._profundidade -= 1
+
+    def finalizar_ciclo(self) -> str:
+        """Fecha o ciclo: registra a tabela no log, grava os perfis e retorna a tabela."""
+        total_ns = time.perf_counter_ns() - self._inicio_ns
+        tabela = self._tabela(total_ns)
+        logging.info(f"Perfil do ciclo {self._ciclo}:\n{tabela}")
+
+        try:
+            self._gravar(total_ns)
+        except OSError as e:
+            logging.error(f"Erro ao gravar o perfil do ciclo em {self.pasta}: {e}")
+        return tabela
+
+    def _tabela(self, total_ns: int) -> str:
+        cabecalho = f"{'etapa':<20} {'ms':>10} {'%':>6} {'vezes':>6}"
+        if self.usar_tracemalloc:
+            cabecalho += f" {'memória Δ KiB':>14} {'pico KiB':>10}"
+        linhas: List[str] = [cabecalho, "-" * len(cabecalho)]
+        medido = 0
+        for nome, medida in self._etapas.items():
+            medido += medida["ns"]
+            linha = (f"{nome:<20} {medida['ns'] / 1e6:>10.2f} {medida['ns'] / total_ns * 100 if total_ns else 0:>6.1f} "
+                     f"{medida['chamadas']:>6}")
+            if self.usar_tracemalloc:
+                linha += f" {medida['memoria'] / 1024:>14.1f} {medida['pico'] / 1024:>10.1f}"
+            linhas.append(linha)
+        fora = total_ns - medido
+        linhas.append(f"{'(fora das etapas)':<20} {fora / 1e6:>10.2f} {fora / total_ns * 100 if total_ns else 0:>6.1f}")
+        linhas.append(f"{'total':<20} {total_ns / 1e6:>10.2f} {100.0:>6.1f}")
+        return "\n".join(linhas)
+
+    def _gravar(self, total_ns: int) -> None:
+        registro = {
+            "ciclo": self._ciclo,
+            "total_ms": total_ns / 1e6,
+            "etapas": {nome: {"ms": m["ns"] / 1e6, "chamadas": m["chamadas"],
+                              **({"memoria_kib": m["memoria"] / 1024, "pico_kib": m["pico"] / 1024}
+                                 if self.usar_tracemalloc else {})}
+                       for nome, m in self._etapas.items()},
+        }
+        with open(os.path.join(self.pasta, "ciclos.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+        for nome, perfil in self._perfis.items():
+            caminho = os.path.join(self.pasta, f"{self._ciclo}_{nome}.prof")
+            perfil.dump_stats(caminho)
+            saida = io.StringIO()
+            pstats.Stats(perfil, stream=saida).sort_stats("cumulative").print_stats(self.top_funcoes)
+            logging.debug(f"cProfile da etapa {nome} ({caminho}):\n{saida.getvalue()}")
+
+        if self.usar_tracemalloc:
+            maiores = tracemalloc.take_snapshot().statistics("lineno")[:self.top_funcoes * 2]
+            with open(os.path.join(self.pasta, f"{self._ciclo}_memoria.txt"), "w", encoding="utf-8") as f:
+                for estatistica in maiores:
+                    f.write(f"{estatistica}\n")
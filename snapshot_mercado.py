@@ -0,0 +1,132 @@
+# snapshot_mercado.py - fotografia imutável do mercado compartilhada pelas etapas do ciclo
+
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, replace
+from functools import partial
+from types import MappingProxyType
+from typing import Callable, ContextManager, Dict, Iterable, Mapping, Optional, Tuple
+
+import pandas as pd
+
+from filtros_simbolos import FiltrosSimbolo
+
+
+@dataclass(frozen=True)
+class SnapshotMercado:
+    """Saldos, preços, candles, indicadores e filtros obtidos uma única vez por ciclo.
+
+    `saldo` tem os saldos livres, usados para dimensionar ordens; `saldo_total`
+    soma os bloqueados em ordens abertas (ex.: OCO) e é o usado no patrimônio.
+    As etapas do ciclo apenas leem o snapshot; após uma ordem executada o ciclo
+    gera uma nova instância com `com_saldo` em vez de alterar esta.
+    """
+    saldo: Mapping[str, float]
+    saldo_total: Mapping[str, float]
+    precos: Mapping[str, float]
+    candles: Mapping[str, pd.DataFrame]
+    indicadores: Mapping[str, pd.DataFrame]
+    filtros: Mapping[str, Optional[FiltrosSimbolo]]
+    criado_em: float
+
+    def com_saldo(self, saldo: Mapping[str, float], saldo_total: Mapping[str, float]) -> "SnapshotMercado":
+        """Retorna uma cópia do snapshot com os saldos (livres e totais) atualizados."""
+        return replace(self, saldo=MappingProxyType(dict(saldo)), saldo_total=MappingProxyType(dict(saldo_total)))
+
+
+async def coletar_dados_async(
+    moedas: Iterable[str],
+    buscar_saldo: Callable[[], Tuple[dict, dict]],
+    buscar_precos: Callable[[], dict],
+    buscar_candles: Callable[..., pd.DataFrame],
+    buscar_filtros: Callable[[str], Optional[FiltrosSimbolo]],
+    limite_candles: int = 168,
+    max_concorrencia: int = 32,
+) -> Tuple[Tuple[dict, dict], dict, Dict[str, pd.DataFrame], Dict[str, Optional[FiltrosSimbolo]]]:
+    """Executa todas as buscas do ciclo ao mesmo tempo no loop asyncio atual.
+
+    As funções de busca são as síncronas do bot (cliente Binance por HTTP
+    bloqueante); cada uma roda em um pool de threads próprio, e um semáforo
+    limita a `max_concorrencia` as requisições em voo. O peso por minuto
+    continua sendo controlado pelo agendador de requisições do bot.
+    """
+    moedas = list(moedas)
+    loop = asyncio.get_running_loop()
+    semaforo = asyncio.Semaphore(max_concorrencia)
+
+    with ThreadPoolExecutor(max_workers=max_concorrencia, thread_name_prefix="snapshot") as executor:
+        async def em_thread(funcao, *args, **kwargs):
+            async with semaforo:
+                return await loop.run_in_executor(executor, partial(funcao, *args, **kwargs))
+
+        saldo, precos, *resultados = await asyncio.gather(
+            em_thread(buscar_saldo),
+            em_thread(buscar_precos),
+            *(em_thread(buscar_candles, m, limit=limite_candles) for m in moedas),
+            *(em_thread(buscar_filtros, m) for m in moedas),
+        )
+
+    candles = dict(zip(moedas, resultados[:len(moedas)]))
+    filtros = dict(zip(moedas, resultados[len(moedas):]))
+    return saldo, precos, candles, filtros
+
+
+def construir_snapshot(
+    moedas: Iterable[str],
+    buscar_saldo: Callable[[], Tuple[dict, dict]],
+    buscar_precos: Callable[[], dict],
+    buscar_candles: Callable[..., pd.DataFrame],
+    calcular_indicadores: Callable[[pd.DataFrame], pd.DataFrame],
+    buscar_filtros: Callable[[str], Optional[FiltrosSimbolo]],
+    limite_candles: int = 168,
+    limite_indicadores: int = 100,
+    max_concorrencia: int = 32,
+    medir_etapa: Optional[Callable[[str], ContextManager]] = None,
+) -> SnapshotMercado:
+    """Busca todos os dados do ciclo em paralelo e monta um SnapshotMercado.
+
+    `limite_candles` cobre a maior janela usada no ciclo (alta semanal); os
+    indicadores são calculados sobre os últimos `limite_indicadores` candles,
+    a mesma janela usada pelas estratégias. A coleta roda em um loop asyncio
+    próprio (`coletar_dados_async`), por isso esta função não deve ser
+    chamada de dentro de um loop em execução.
+
+    `buscar_saldo` retorna o par (saldos livres, saldos totais).
+
+    `medir_etapa(nome)`, se informado, envolve a coleta ("coleta_dados") e o
+    cálculo dos indicadores ("indicadores") para as métricas e o perfil do ciclo.
+    """
+    moedas = list(moedas)
+    medir_etapa = medir_etapa or (lambda nome: nullcontext())
+    inicio = time.perf_counter()
+
+    with medir_etapa("coleta_dados"):
+        (saldo, saldo_total), precos, candles, filtros = asyncio.run(coletar_dados_async(
+            moedas, buscar_saldo, buscar_precos, buscar_candles, buscar_filtros,
+            limite_candles=limite_candles, max_concorrencia=max_concorrencia
+        ))
+    logging.debug(f"Coleta do snapshot concluída em {time.perf_counter() - inicio:.2f}s")
+
+    indicadores = {}
+    with medir_etapa("indicadores"):
+        for moeda, df in candles.items():
+            if df.empty:
+                indicadores[moeda] = df
+                continue
+            janela = df.tail(limite_indicadores).reset_index(drop=True)
+            indicadores[moeda] = calcular_indicadores(janela)
+
+    logging.info(f"Snapshot de mercado montado em {time.perf_counter() - inicio:.2f}s para {len(moedas)} moeda(s)")
+
+    return SnapshotMercado(
+        saldo=MappingProxyType(dict(saldo)),
+        saldo_total=MappingProxyType(dict(saldo_total)),
+        precos=MappingProxyType(dict(precos)),
+        candles=MappingProxyType(candles),
+        indicadores=MappingProxyType(indicadores),
+        filtros=MappingProxyType(filtros),
+        criado_em=time.time(),
+    )
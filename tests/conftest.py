@@ -0,0 +1,6 @@
+# conftest.py - os módulos do bot ficam na raiz do repositório
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,65 @@
+# test_estado_bot.py - gravação incremental das operações e consultas do histórico
+
+import pytest
+
+from estado_bot import EstadoBot
+
+MOEDAS = ["BTCUSDT", "SOLUSDT"]
+
+
+def operacao(i, tipo="compra", execucao=None):
+    op = {"timestamp": f"2025-01-01 00:{i:02d}:00", "moeda": MOEDAS[i % 2], "tipo": tipo,
+          "quantidade": "1", "preco": 10.0 + i, "valor_total": 10.0 + i, "motivo": "teste"}
+    if execucao:
+        op["execucao"] = execucao
+    return op
+
+
+@pytest.fixture
+def estado(tmp_path):
+    estado = EstadoBot(str(tmp_path / "estado.sqlite3"), MOEDAS)
+    yield estado
+    estado.fechar()
+
+
+def test_carregar_nao_le_o_historico(estado):
+    dados = estado.carregar()
+    dados["posicoes"]["BTCUSDT"] = True
+    dados["historico_operacoes"] += [operacao(0), operacao(1, "venda")]
+    estado.salvar(dados)
+
+    recarregados = estado.carregar()
+    assert recarregados["posicoes"]["BTCUSDT"] is True
+    assert recarregados["historico_operacoes"] == []
+    assert [op["id"] for op in dados["historico_operacoes"]] == [1, 2]
+
+
+def test_salvar_insere_so_as_operacoes_sem_id(estado):
+    dados = estado.carregar()
+    dados["historico_operacoes"].append(operacao(0))
+    estado.salvar(dados)
+    estado.salvar(dados)
+    dados["historico_operacoes"].append(operacao(1, "venda"))
+    estado.salvar(dados)
+    assert estado.totais_operacoes() == {"compra": (1, 10.0), "venda": (1, 11.0)}
+
+
+def test_consultas_do_historico(estado):
+    dados = estado.carregar()
+    dados["historico_operacoes"] += [operacao(i, "compra" if i % 2 == 0 else "venda") for i in range(20)]
+    estado.salvar(dados)
+
+    assert [op["id"] for op in estado.ultimas_operacoes(3)] == [18, 19, 20]
+    assert [op["timestamp"] for op in estado.operacoes_desde("2025-01-01 00:17:00")] == [
+        "2025-01-01 00:17:00", "2025-01-01 00:18:00", "2025-01-01 00:19:00"]
+
+
+def test_execucoes_incrementais(estado):
+    dados = estado.carregar()
+    dados["historico_operacoes"] += [operacao(0, execucao={"latencia_ms": 5.0}), operacao(1)]
+    estado.salvar(dados)
+    assert estado.execucoes() == [{"moeda": "BTCUSDT", "execucao": {"latencia_ms": 5.0}}]
+
+    dados["historico_operacoes"].append(operacao(2, execucao={"latencia_ms": 7.0}))
+    estado.salvar(dados)
+    assert [e["execucao"]["latencia_ms"] for e in estado.execucoes()] == [5.0, 7.0]
@@ -0,0 +1,73 @@
+# test_gatilho_tempo_real.py - venda disparada pelo monitor quando a OCO da compra não pôde ser colocada
+
+from decimal import Decimal
+
+import pytest
+
+import bot_trading as bt
+from armazenamento_candles import ArmazemCandles
+from estado_bot import EstadoBot
+from monitor_tempo_real import MotorStopTakeProfit
+
+MOEDA = "BTCUSDT"
+
+
+@pytest.fixture
+def bot(tmp_path, monkeypatch):
+    for chave, valor in {"exchange_simulada": True, "ordens_oco": True, "discord_enabled": False,
+                         "monitor_tempo_real": False, "velocidade_simulacao": None, "moedas": [MOEDA],
+                         "pasta_candles": str(tmp_path / "candles"), "pasta_graficos": str(tmp_path / "graficos"),
+                         "arquivo_filtros": str(tmp_path / "filtros_simbolos.json")}.items():
+        monkeypatch.setitem(bt.CONFIG, chave, valor)
+    estado = EstadoBot(str(tmp_path / "estado.sqlite3"), [MOEDA])
+    monkeypatch.setattr(bt, "estado_bot", estado)
+    monkeypatch.setattr(bt, "armazem_candles", ArmazemCandles(str(tmp_path / "candles")))
+    monkeypatch.setattr(bt, "cliente_binance", None)
+    monkeypatch.setattr(bt, "saldo_ultimo_ciclo", {})
+    monkeypatch.setattr(bt.registro_filtros, "arquivo_cache", bt.registro_filtros.arquivo_cache)
+    monkeypatch.setattr(bt, "mostrar_grafico", lambda *args, **kwargs: None)
+    assert bt.inicializar_exchange_simulada()
+    yield bt
+    estado.fechar()
+
+
+def test_stop_apos_falha_da_oco_vende_a_quantidade_comprada(bot, monkeypatch):
+    exchange = bot.cliente_binance
+
+    def oco_recusada(**kwargs):
+        raise RuntimeError("OCO recusada")
+    monkeypatch.setattr(exchange, "create_oco_order", oco_recusada)
+
+    # Compra no próprio ciclo, como a estratégia faria com um sinal
+    def comprar(dados, saldo_usdt, snapshot):
+        preco = snapshot.precos[MOEDA]
+        quantidade = bot.ajustar_quantidade(MOEDA, 100 / preco, 100, preco, snapshot.filtros[MOEDA])
+        return bot.executar_compra(MOEDA, quantidade, preco, dados, motivo="teste")[1]
+    monkeypatch.setattr(bot, "executar_estrategia_balanceada", comprar)
+    monkeypatch.setattr(bot, "verificar_sinais_venda", lambda dados, snapshot: dados)
+
+    motor = MotorStopTakeProfit(bot.vender_por_gatilho)
+    monkeypatch.setattr(bot, "motor_stops", motor)
+    assert bot.executar_ciclo()
+
+    dados = bot.carregar_dados()
+    assert dados["posicoes"][MOEDA] and not dados["ordens_oco"][MOEDA]
+    stop_loss, _, _ = motor.limites(MOEDA)
+    compra = bot.estado_bot.ultimas_operacoes(1)[0]
+    assert compra["tipo"] == "compra"
+
+    # Recebido na compra: a quantidade comprada menos a taxa, cobrada no próprio ativo
+    base = bot.ativo_base(MOEDA)
+    recebido = bot.indexar_saldos(exchange.get_account())[0][base]
+    assert recebido == pytest.approx(float(compra["quantidade"]), rel=0.002)
+
+    # Tick abaixo do stop: o motor desarma o símbolo e vende em outra thread
+    assert motor.processar(MOEDA, stop_loss * 0.99) == "Stop-Loss"
+    motor.parar()
+
+    venda = bot.estado_bot.ultimas_operacoes(1)[0]
+    assert venda["tipo"] == "venda"
+    filtros = bot.obter_filtros(MOEDA)
+    assert Decimal(venda["quantidade"]) == filtros.quantizar_quantidade(Decimal(str(recebido)))
+    assert bot.indexar_saldos(exchange.get_account())[0].get(base, 0.0) < float(filtros.step_size)
+    assert not bot.carregar_dados()["posicoes"][MOEDA]
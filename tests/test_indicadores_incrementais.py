@@ -0,0 +1,81 @@
+# test_indicadores_incrementais.py - paridade dos indicadores incrementais com os kernels vetorizados
+
+import json
+
+import numpy as np
+import pytest
+
+from indicadores import indicadores_matriz, media_movel_matriz, rsi_matriz
+from indicadores_incrementais import IndicadoresSimbolo, MediaMovel, RSI
+
+# As somas seguem ordens diferentes (acumulada centralizada x janela móvel);
+# a diferença esperada é de arredondamento, bem abaixo desta tolerância
+TOLERANCIA = dict(rtol=1e-9, atol=1e-9)
+
+COLUNAS = ("media_curta", "media_longa", "rsi", "ema21", "macd", "signal", "histograma")
+
+
+def fechamentos(candles, semente=0, preco=30000.0):
+    rng = np.random.default_rng(semente)
+    return preco * np.exp(np.cumsum(rng.normal(0, 0.01, candles)))
+
+
+def alimentar(indicadores, valores):
+    serie = {coluna: [] for coluna in COLUNAS}
+    for valor in valores:
+        for coluna, resultado in indicadores.atualizar(valor).items():
+            serie[coluna].append(resultado)
+    return {coluna: np.array(valores) for coluna, valores in serie.items()}
+
+
+@pytest.mark.parametrize("preco", [0.0004, 1.0, 30000.0])
+def test_indicadores_simbolo_igual_aos_kernels(preco):
+    x = fechamentos(3000, preco=preco)
+    esperado = indicadores_matriz(x)
+    obtido = alimentar(IndicadoresSimbolo(), x)
+    for coluna in COLUNAS:
+        np.testing.assert_allclose(obtido[coluna], esperado[coluna], err_msg=coluna, **TOLERANCIA)
+
+
+@pytest.mark.parametrize("primeiro_delta_zero", [False, True])
+def test_rsi_igual_ao_kernel(primeiro_delta_zero):
+    x = fechamentos(500, semente=1)
+    # Trecho sem variação: perdas e ganhos zerados (RSI NaN) e só ganhos (RSI 100)
+    x[200:230] = x[199]
+    x[300:320] = x[299] + np.arange(20)
+    rsi = RSI(14, primeiro_delta_zero=primeiro_delta_zero)
+    obtido = np.array([rsi.atualizar(v) for v in x])
+    np.testing.assert_allclose(obtido, rsi_matriz(x, 14, primeiro_delta_zero), **TOLERANCIA)
+
+
+def test_media_movel_com_nan_igual_ao_kernel():
+    x = fechamentos(200, semente=2)
+    x[:5] = np.nan
+    x[50] = np.nan
+    media = MediaMovel(7)
+    obtido = np.array([media.atualizar(v) for v in x])
+    np.testing.assert_allclose(obtido, media_movel_matriz(x, 7), **TOLERANCIA)
+
+
+def test_previa_nao_altera_estado():
+    x = fechamentos(300, semente=3)
+    indicadores = IndicadoresSimbolo()
+    indicadores.aquecer(x[:-1])
+    antes = indicadores.valores()
+    previa = indicadores.previa(x[-1])
+    assert indicadores.valores() == antes
+    depois = indicadores.atualizar(x[-1])
+    for coluna in COLUNAS:
+        assert previa[coluna] == pytest.approx(depois[coluna], rel=1e-12, nan_ok=True)
+
+
+def test_estado_serializado_continua_igual():
+    x = fechamentos(400, semente=4)
+    continuo = IndicadoresSimbolo()
+    continuo.aquecer(x)
+
+    restaurado = IndicadoresSimbolo()
+    restaurado.aquecer(x[:250])
+    restaurado = IndicadoresSimbolo.de_dict(json.loads(json.dumps(restaurado.para_dict())))
+    restaurado.aquecer(x[250:])
+    assert restaurado.valores() == continuo.valores()